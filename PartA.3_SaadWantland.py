@@ -1,4 +1,5 @@
 from session_helper_neo4j import create_session
+from query_metrics_neo4j import instrument, metrics
 
 def load_review_nodes(session):
     session.run("""
@@ -47,7 +48,7 @@ def load_affiliation_as_property(session):
 
 def main():
     # Execute all transformations
-    session = create_session()
+    session = instrument(create_session())
     print("Loading reviews as nodes...")
     session.execute_write(load_review_nodes)
 
@@ -61,6 +62,7 @@ def main():
     session.execute_write(set_paper_final_decision)
 
     session.close()
+    metrics.print_summary()
     print("Graph evolution completed.")
 
 if __name__ == '__main__':
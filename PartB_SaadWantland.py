@@ -1,25 +1,22 @@
-import pprint
+from citation_metrics_neo4j import ensure_materialized
 from session_helper_neo4j import create_session
+from query_metrics_neo4j import instrument, metrics, print_query_results
 
-def print_query_results(records, summary):
-    pp = pprint.PrettyPrinter(indent=4)
-    print("The query `{}` returned {} records in {} ms.".format(
-        summary.query, len(records), summary.result_available_after))
-    for record in records:
-        pp.pprint(record.data())
-        print()
+# The citation counts, h-indexes and journal citation windows are node properties precomputed by
+# citation_metrics_neo4j when the graph is loaded. Ties are ordered on a key, so analytics_engine returns the same
+# rows.
 
-# Query 1: Top 3 most cited papers per conference/workshop
+# Query 1: Top 3 most cited papers per conference/workshop, all the editions of a venue together
 def query_top3_cited_papers_conference(session):
     result = session.run(
         """
-        MATCH (venue)<-[:PUBLISHED_IN]-(p:Paper)<-[:RELATED]-(citing:Paper)
-        WHERE venue:Conference
-        WITH venue, p, COUNT(citing) AS citations
-        ORDER BY venue.Venue, citations DESC
-        WITH venue, COLLECT(p)[..3] AS topPapers 
+        MATCH (venue:Conference)<-[:PUBLISHED_IN]-(p:Paper)
+        WHERE p.citationCount > 0
+        WITH venue.VenueID AS venueId, venue.Venue AS venueName, p
+        ORDER BY venueName, p.citationCount DESC, p.PaperID
+        WITH venueId, venueName, COLLECT(p)[..3] AS topPapers
         RETURN 
-            venue.Venue AS venueName,
+            venueName,
             topPapers[0].Title AS topCitedPaper1,
             topPapers[1].Title AS topCitedPaper2,
             topPapers[2].Title AS topCitedPaper3
@@ -28,35 +25,32 @@ def query_top3_cited_papers_conference(session):
     return list(result), result.consume()
 
 # Query 2: Authors publishing in same conference/workshop in at least 4 editions
-# This query doesn't work as we only have 2 ediitons of each conference/workshop, we need more data here
+# Every paper is published in one edition, whose year is the edition year
 def query_authors_published_same_venue_4editions(session):
     result = session.run(
         """
         MATCH (a:Author)-[:AUTHOR_OF]->(p:Paper)-[:PUBLISHED_IN]->(v)
         WHERE v:Conference OR v:Workshop
-        WITH a.Name AS author, v.Venue AS venueName, COLLECT(DISTINCT p.Year) AS years
+        WITH a.Name AS author, v.Venue AS venueName, COLLECT(DISTINCT v.Year) AS years
         WITH author, venueName, SIZE(years) AS editions
         WHERE editions >= 4
         RETURN author, venueName, editions
-        ORDER BY editions DESC
+        ORDER BY editions DESC, author, venueName
         """
     )
     return list(result), result.consume()
 
-# Query 3: Impact factor of journals
-# in this query, journal is None, why?
+# Query 3: Impact factor of journals, per journal (all its editions) and year
 def query_impact_factor(session):
     result = session.run(
         """
-        MATCH (citing:Paper)-[:RELATED]->(cited:Paper)-[:PUBLISHED_IN]->(j:Journal)
-        WHERE citing.Year = j.Year + 1 OR citing.Year = j.Year + 2
-        WITH j, COUNT(cited) AS citationCount
-        MATCH (p:Paper)-[:PUBLISHED_IN]->(j)
-        WHERE p.Year = j.Year OR p.Year = j.Year - 1
-        WITH j.Venue AS journal, j.Year AS year, citationCount, COUNT(p) AS pubCount
-        WHERE pubCount > 0
+        MATCH (j:Journal)
+        UNWIND [[j.Year + 1, j.citationsNextYear], [j.Year + 2, j.citationsSecondYear]] AS window
+        WITH j.VenueID AS venueId, j.Venue AS journal, window[0] AS year,
+             SUM(window[1]) AS citationCount, SUM(j.paperCount) AS pubCount
+        WHERE citationCount > 0 AND pubCount > 0
         RETURN journal, year, ROUND(toFloat(citationCount) / pubCount, 3) AS impactFactor
-        ORDER BY impactFactor DESC
+        ORDER BY impactFactor DESC, journal, year
         LIMIT 10
         """
     )
@@ -65,26 +59,22 @@ def query_impact_factor(session):
 # It is calculated by dividing the number of citations in the current year to articles published in the previous two years by the number of articles published in those two years.
 # example: Papers published in "X" journal during 2019-2020 were cited, on average, 12.456 times in 2021-2022.
 
-# Query 4: H-Index per author
+# Query 4: H-Index per author, read in order from the index on Author.hIndex
 def query_h_index(session):
     result = session.run(
         """
-        MATCH (a:Author)-[:AUTHOR_OF]->(p:Paper)<-[:RELATED]-(citing:Paper)
-        WITH a, p, COUNT(citing) AS citationCount
-        ORDER BY citationCount DESC
-        WITH a.Name AS author, COLLECT(citationCount) AS citations
-        WITH author, citations,
-             REDUCE(h = 0, i IN RANGE(0, SIZE(citations)-1) |
-                CASE WHEN citations[i] >= i+1 THEN i+1 ELSE h END) AS hIndex
-        RETURN author, hIndex
-        ORDER BY hIndex DESC
+        MATCH (a:Author)
+        WHERE a.hIndex > 0
+        RETURN a.Name AS author, a.hIndex AS hIndex
+        ORDER BY hIndex DESC, author
         LIMIT 10
         """
     )
     return list(result), result.consume()
 
 def main():
-    session = create_session()
+    session = instrument(create_session())
+    ensure_materialized(session)
 
     # Run and print all query results
     records, summary = session.execute_read(query_top3_cited_papers_conference)
@@ -104,6 +94,7 @@ def main():
     print_query_results(records, summary)
 
     session.close()
+    metrics.print_summary()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
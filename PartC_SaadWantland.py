@@ -1,14 +1,6 @@
-import pprint
+from citation_metrics_neo4j import ensure_materialized
 from session_helper_neo4j import create_session
-
-# Helper to print query results
-def print_query_results(records, summary):
-    pp = pprint.PrettyPrinter(indent=4)
-    print("The query `{}` returned {} records in {} ms.".format(
-        summary.query, len(records), summary.result_available_after))
-    for record in records:
-        pp.pprint(record.data())
-        print()
+from query_metrics_neo4j import instrument, metrics, print_query_results
 
 # Stage 1: Define the Databases research community and link relevant keywords
 def stage1_define_community(session):
@@ -24,30 +16,32 @@ def stage1_define_community(session):
     summary = result.consume()
     print_query_results(records, summary)
 
-# Stage 2: Identify publication venues strongly tied to the Databases community
+# Stage 2: Identify publication venues strongly tied to the Databases community. The share of community papers is
+# computed over all the editions of a venue, which are all marked.
 def stage2_mark_database_venues(session):
     result = session.run("""
-        MATCH (rc:ResearchCommunity {name: "Databases"})<-[:BELONGS_TO]-(k:Keyword)<-[:ABOUT]-(p:Paper)
-        WITH DISTINCT p
-        MATCH (p)-[:PUBLISHED_IN]->(v)
+        MATCH (p:Paper)-[:PUBLISHED_IN]->(v)
         WHERE v:Conference OR v:Journal OR v:Workshop
-        WITH v, COUNT(DISTINCT p) AS communityPapers
-        MATCH (p2:Paper)-[:PUBLISHED_IN]->(v)
-        WITH v, communityPapers, COUNT(DISTINCT p2) AS totalPapers
-        WHERE toFloat(communityPapers)/toFloat(totalPapers) >= 0.9
-        SET v:DatabaseVenue
-        RETURN v.Venue AS venueName, communityPapers, totalPapers;
+        WITH v, p, EXISTS {
+            (p)-[:ABOUT]->(:Keyword)-[:BELONGS_TO]->(:ResearchCommunity {name: "Databases"})
+        } AS inCommunity
+        WITH v, COUNT(DISTINCT p) AS papers, COUNT(DISTINCT CASE WHEN inCommunity THEN p END) AS communityPapers
+        WITH CASE WHEN v:Conference THEN 'Conference' WHEN v:Journal THEN 'Journal' ELSE 'Workshop' END AS kind,
+             v.VenueID AS venueId, COLLECT(v) AS editions,
+             SUM(communityPapers) AS communityPapers, SUM(papers) AS totalPapers
+        WHERE communityPapers > 0 AND toFloat(communityPapers)/toFloat(totalPapers) >= 0.9
+        FOREACH (edition IN editions | SET edition:DatabaseVenue)
+        RETURN editions[0].Venue AS venueName, SIZE(editions) AS editions, communityPapers, totalPapers;
     """)
     records = list(result)
     summary = result.consume()
     print_query_results(records, summary)
 
-# Stage 3: Identify top 100 cited papers in database venues
+# Stage 3: Identify top 100 cited papers in database venues, from the precomputed citation counts
 def stage3_mark_top100_papers(session):
     result = session.run("""
-        MATCH (p:Paper)-[:PUBLISHED_IN]->(v:DatabaseVenue)
-        OPTIONAL MATCH (other:Paper)-[:RELATED]->(p)
-        WITH p, COUNT(other) AS citationCount
+        MATCH (p:Paper)-[:PUBLISHED_IN]->(:DatabaseVenue)
+        WITH DISTINCT p, p.citationCount AS citationCount
         ORDER BY citationCount DESC
         LIMIT 100
         SET p:TopPaper
@@ -73,7 +67,8 @@ def stage4_mark_reviewers_and_gurus(session):
     print_query_results(records, summary)
 
 def main():
-    session = create_session()
+    session = instrument(create_session())
+    ensure_materialized(session)
     # Execute all stages with outputs
     print("\nStage 1: Defining research community and linking keywords...")
     session.execute_write(stage1_define_community)
@@ -89,6 +84,7 @@ def main():
 
     print("\nAll stages executed successfully.")
     session.close()
+    metrics.print_summary()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
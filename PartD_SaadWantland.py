@@ -1,37 +1,38 @@
-import pprint
-from session_helper_neo4j import create_session
-
-# Printing query results and summary 
-def print_query_results(records, summary):
-    pp = pprint.PrettyPrinter(indent=4)
-    print("The query `{}` returned {} records in {} ms.".format(
-        summary.query, len(records), summary.result_available_after))
-    for record in records:
-        pp.pprint(record.data())
-        print()
+import argparse
+import graph_algorithms
+from gds_projections_neo4j import ProjectionManager
+from session_helper_neo4j import create_session, clean_session
+from query_metrics_neo4j import instrument, metrics, print_query_results
+
+# Projections of the algorithms, kept in the catalog by the projection manager. Betweenness (undirected) and PageRank
+# (natural) share the citation graph, which projects RELATED in both orientations.
+KEYWORD_GRAPH = {
+    'nodes': ['Paper', 'Keyword'],
+    'relationships': {'ABOUT': {'type': 'ABOUT', 'orientation': 'UNDIRECTED'}},
+}
+CITATION_GRAPH = {
+    'nodes': ['Paper'],
+    'relationships': {
+        'RELATED': {'type': 'RELATED', 'orientation': 'NATURAL'},
+        'RELATED_UNDIRECTED': {'type': 'RELATED', 'orientation': 'UNDIRECTED'},
+    },
+}
+projections = ProjectionManager()
 
 # Algorithm 1: Node Similarity
 def query_simulate_node_similarity_algorithm(session):
-    print('Dropping the graph from cypher catalog, only if exists')
-    session.run("CALL gds.graph.drop('myGraph1',false);")
-
-    print('Project the graph')
-    session.run("""
-        CALL gds.graph.project('myGraph1', ['Paper','Keyword'], {
-            ABOUT: {
-                type: 'ABOUT',
-                orientation: 'UNDIRECTED'
-            }
-        });
-    """)
-
-    print('Running the node similarity algorithm and writing results')
-    session.run("""
-        CALL gds.nodeSimilarity.write('myGraph1', {
-            writeRelationshipType: 'SIMILAR',
-            writeProperty: 'score'
-        });
-    """)
+    graph = projections.get(session, KEYWORD_GRAPH)
+    if not projections.has_relationship_type(session, graph, 'SIMILAR'):
+        print('Running the node similarity algorithm')
+        session.run("""
+            CALL gds.nodeSimilarity.mutate($graph, {
+                mutateRelationshipType: 'SIMILAR',
+                mutateProperty: 'score'
+            });
+        """, graph=graph)
+
+    print('Writing the SIMILAR relationships')
+    session.run("CALL gds.graph.relationship.write($graph, 'SIMILAR', 'score');", graph=graph)
 
     print('Fetching top results from SIMILAR relationships')
     result = session.run("""
@@ -46,61 +47,64 @@ def query_simulate_node_similarity_algorithm(session):
 
 # Algorithm 2: Betweenness Centrality
 def query_simulate_betweeneness_centrality_algorithm(session):
-    print('Dropping the graph from cypher catalog, only if exists')
-    session.run("CALL gds.graph.drop('myGraph2',false);")
-
-    print('Projecting the graph')
-    session.run("""
-        CALL gds.graph.project('myGraph2', 'Paper', {
-            RELATED: {type: 'RELATED', orientation: 'UNDIRECTED'}
-        });
-    """)
-
-    print('Running the betweenness centrality algorithm for the stored graph')
-    session.run("""
-        CALL gds.betweenness.write('myGraph2', {
-            writeProperty: 'betweenness'
-        });
-    """)
+    graph = projections.get(session, CITATION_GRAPH)
+    # The scores are written when computed, and stay valid until a load changes the graph (and the projection)
+    if not projections.has_node_property(session, graph, 'Paper', 'betweenness'):
+        print('Running the betweenness centrality algorithm for the stored graph')
+        session.run("""
+            CALL gds.betweenness.mutate($graph, {
+                relationshipTypes: ['RELATED_UNDIRECTED'],
+                mutateProperty: 'betweenness'
+            });
+        """, graph=graph)
+        session.run("CALL gds.graph.nodeProperties.write($graph, ['betweenness'], ['Paper']);", graph=graph)
 
     result = session.run("""
-        CALL gds.betweenness.stream('myGraph2')
-        YIELD nodeId, score
+        CALL gds.graph.nodeProperty.stream($graph, 'betweenness', ['Paper'])
+        YIELD nodeId, propertyValue
         RETURN gds.util.asNode(nodeId).Title AS Title, 
-               score
+               propertyValue AS score
         ORDER BY score DESC, Title
         LIMIT 5;
-    """)
+    """, graph=graph)
     records = list(result)
     summary = result.consume()
     return records, summary
 
 # Algorithm 3: PageRank
 def query_simulate_pagerank_algorithm(session):
-    print('Dropping PageRank graph if it exists')
-    session.run("CALL gds.graph.drop('pagerankGraph', false);")
+    graph = projections.get(session, CITATION_GRAPH)
+    if not projections.has_node_property(session, graph, 'Paper', 'pagerank'):
+        print('Running PageRank algorithm')
+        session.run("""
+            CALL gds.pageRank.mutate($graph, {
+                relationshipTypes: ['RELATED'],
+                mutateProperty: 'pagerank'
+            });
+        """, graph=graph)
 
-    print('Projecting the graph for PageRank')
-    session.run("""
-        CALL gds.graph.project('pagerankGraph', 'Paper', {
-            RELATED: {type: 'RELATED', orientation: 'NATURAL'}
-        });
-    """)
-
-    print('Running PageRank algorithm')
     result = session.run("""
-        CALL gds.pageRank.stream('pagerankGraph')
-        YIELD nodeId, score
-        RETURN gds.util.asNode(nodeId).Title AS Title, score
+        CALL gds.graph.nodeProperty.stream($graph, 'pagerank', ['Paper'])
+        YIELD nodeId, propertyValue
+        RETURN gds.util.asNode(nodeId).Title AS Title, propertyValue AS score
         ORDER BY score DESC
         LIMIT 5;
-    """)
+    """, graph=graph)
     records = list(result)
     summary = result.consume()
     return records, summary
 
-def main():
-    session = create_session()
+def main(drop_projections=False):
+    session = instrument(create_session())
+    if graph_algorithms.gds_version(session) is None:
+        # Same algorithms on the preprocessed files, with the results written back like the GDS write procedures
+        print('The Graph Data Science library is not installed, running graph_algorithms instead')
+        session.close()
+        graph_algorithms.main(write=True)
+        return
+    # SIMILAR relationships of a previous run would otherwise be written a second time (the projection keeps them)
+    clean_session(session, rel_types=['SIMILAR'])
+
     print('Algorithm 1 - Node Similarity..........')
     records, summary = session.execute_write(query_simulate_node_similarity_algorithm)
     print_query_results(records, summary)
@@ -113,7 +117,14 @@ def main():
     records, summary = session.execute_write(query_simulate_pagerank_algorithm)
     print_query_results(records, summary)
 
+    if drop_projections:
+        projections.drop_all(session)
     session.close()
+    metrics.print_summary()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the PartD graph algorithms')
+    parser.add_argument('--drop-projections', action='store_true',
+                        help='Drop the cached GDS projections afterwards to free the heap they hold')
+    args = parser.parse_args()
+    main(args.drop_projections)
\ No newline at end of file
@@ -0,0 +1,318 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import data_preprocessing as dp
+
+DATA_DIR = 'data'
+VENUE_KINDS = {
+    'conference': ('nodes_conference.csv', 'ConferenceID', 'rel_published_in_conference.csv'),
+    'workshop': ('nodes_workshop.csv', 'WorkshopID', 'rel_published_in_workshop.csv'),
+    'journal': ('nodes_journal.csv', 'JournalID', 'rel_published_in_journal.csv'),
+}
+
+# In-process version of the PartB queries for batch reporting, without a database. The preprocessed files are read
+# into integer-indexed arrays (node i of a label is row i of its node file) and every relationship type into a CSR
+# adjacency, then the queries are vectorized group-bys over them. The graph is the one load_data_neo4j would load:
+# the first row of a duplicated node key wins and relationships with a missing endpoint are left out. The rows are
+# returned like the records of the PartB queries, in the same order (their ORDER BY has tie breakers for this).
+
+# === CSR ===
+
+# Compressed sparse rows of a relationship type: the targets of source i are indices[indptr[i]:indptr[i + 1]]
+class CSR:
+    def __init__(self, sources, targets, n):
+        sources = np.asarray(sources, dtype=np.int64)
+        self.n = n
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+        self.indices = np.asarray(targets, dtype=np.int64)[np.argsort(sources, kind='stable')]
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    # Source of every entry of `indices`
+    def rows(self):
+        return np.repeat(np.arange(self.n), self.degrees())
+
+    def transpose(self, n):
+        return CSR(self.indices, self.rows(), n)
+
+    # Targets of every source of `sources` (with repetitions): (position in `sources`, target) of every pair
+    def expand(self, sources):
+        counts = self.degrees()[sources]
+        which = np.repeat(np.arange(len(sources)), counts)
+        starts = np.repeat(self.indptr[sources] - (np.cumsum(counts) - counts), counts)
+        return which, self.indices[starts + np.arange(len(which))]
+
+
+# === GRAPH ===
+
+def read(data_dir, file, columns):
+    frame = dp.read_frame(data_dir, file, columns)
+    for column in frame.columns:
+        if column not in ('Year', 'Volume', 'Score'):
+            frame[column] = frame[column].astype(object)
+    return frame
+
+# Nodes of a file, one per key (the first row, like MERGE and the bulk import)
+def read_nodes(data_dir, file, key, columns):
+    return read(data_dir, file, [key] + columns).dropna(subset=[key]).drop_duplicates(key).reset_index(drop=True)
+
+# CSR of a relationship file between two node ID arrays, without the rows missing an endpoint
+def read_relationships(data_dir, file, source, target, source_ids, target_ids):
+    rows = read(data_dir, file, [source, target])
+    sources = pd.Index(source_ids).get_indexer(rows[source])
+    targets = pd.Index(target_ids).get_indexer(rows[target])
+    keep = (sources >= 0) & (targets >= 0)
+    return CSR(sources[keep], targets[keep], len(source_ids))
+
+def years(values):
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+class Graph:
+    def __init__(self, data_dir=DATA_DIR):
+        dp.require_edition_keys(data_dir)
+        papers = read_nodes(data_dir, 'nodes_papers.csv', 'PaperID', ['Title', 'Year'])
+        authors = read_nodes(data_dir, 'nodes_authors.csv', 'AuthorID', ['Name'])
+        self.paper_ids = papers['PaperID'].to_numpy()
+        self.titles = papers['Title'].to_numpy()
+        self.paper_years = years(papers['Year'])
+        self.author_names = authors['Name'].to_numpy()
+        # Rank of every PaperID in string order, the tie breaker of the queries
+        self.paper_ranks = np.argsort(np.argsort(self.paper_ids.astype(str), kind='stable'))
+
+        self.cites = read_relationships(data_dir, 'rel_related.csv', 'PaperID', 'RelatedToPaperID',
+                                        self.paper_ids, self.paper_ids)
+        self.citations = np.bincount(self.cites.indices, minlength=len(self.paper_ids))
+        self.authored = read_relationships(data_dir, 'rel_author_of.csv', 'AuthorID', 'PaperID',
+                                           authors['AuthorID'].to_numpy(), self.paper_ids)
+        # Per venue kind: edition venue codes, venue names, years and the paper -> edition CSR
+        self.editions = {}
+        self.published = {}
+        for kind, (file, key, rel_file) in VENUE_KINDS.items():
+            editions = read_nodes(data_dir, file, key, ['VenueID', 'Venue', 'Year'])
+            self.editions[kind] = {
+                'venue': pd.factorize(editions['VenueID'])[0],
+                'name': editions['Venue'].to_numpy(),
+                'year': years(editions['Year']),
+            }
+            self.published[kind] = read_relationships(data_dir, rel_file, 'PaperID', key, self.paper_ids,
+                                                      editions[key].to_numpy())
+
+# Unique int64 key of each row of integer columns (each below 2 ** bits)
+def pack(*columns, bits=21):
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        key = (key << bits) | np.asarray(column, dtype=np.int64)
+    return key
+
+# Values of the sorted unique `keys` at `queries`, 0 for the queries that are not keys
+def lookup(keys, values, queries):
+    if len(keys) == 0:
+        return np.zeros(len(queries))
+    position = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+    return np.where(keys[position] == queries, values[position], 0)
+
+# ROUND(x, 3) of Cypher (half up)
+def round_half_up(values, digits=3):
+    scale = 10 ** digits
+    return np.floor(np.asarray(values) * scale + 0.5) / scale
+
+def records(frame):
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict('records')
+
+
+# === QUERIES ===
+
+# Query 1: Top 3 most cited papers per conference, all the editions of a venue together
+def top3_cited_papers_conference(graph):
+    editions = graph.editions['conference']
+    published = graph.published['conference']
+    papers, venues = published.rows(), editions['venue'][published.indices]
+    cited = graph.citations[papers] > 0
+    papers, venues, names = papers[cited], venues[cited], editions['name'][published.indices][cited]
+    order = np.lexsort((graph.paper_ranks[papers], -graph.citations[papers], venues))
+    papers, venues, names = papers[order], venues[order], names[order]
+    first = np.flatnonzero(np.r_[True, venues[1:] != venues[:-1]])
+    rank = np.arange(len(venues)) - np.repeat(first, np.diff(np.r_[first, len(venues)]))
+    top = pd.DataFrame({'venue': venues, 'rank': rank, 'title': graph.titles[papers]})
+    top = top[top['rank'] < 3].pivot(index='venue', columns='rank', values='title').reindex(columns=range(3))
+    result = pd.DataFrame({'venueName': names[first]}, index=venues[first])
+    for i in range(3):
+        result[f'topCitedPaper{i + 1}'] = top[i]
+    return records(result.sort_values('venueName', kind='stable'))
+
+# Query 2: Authors publishing in the same conference/workshop in at least 4 editions (distinct edition years)
+def authors_published_same_venue_4editions(graph):
+    author_names, names = pd.factorize(pd.Series(graph.author_names), use_na_sentinel=False)
+    authors, venue_names, edition_years = [], [], []
+    for kind in ('conference', 'workshop'):
+        editions = graph.editions[kind]
+        which, edition = graph.published[kind].expand(graph.authored.indices)
+        authors.append(author_names[graph.authored.rows()[which]])
+        venue_names.append(editions['name'][edition])
+        edition_years.append(editions['year'][edition])
+    venue_codes, venues = pd.factorize(pd.Series(np.concatenate(venue_names)), use_na_sentinel=False)
+    edition_years = np.concatenate(edition_years)
+    known = ~np.isnan(edition_years)
+    # (author name, venue name) pair codes, then the distinct years of every pair
+    pairs = np.concatenate(authors)[known].astype(np.int64) * len(venues) + venue_codes[known]
+    year_codes, year_values = pd.factorize(edition_years[known])
+    triples = np.unique(pairs * len(year_values) + year_codes)
+    pairs, editions = np.unique(triples // max(len(year_values), 1), return_counts=True)
+    keep = editions >= 4
+    result = pd.DataFrame({
+        'author': names[pairs[keep] // len(venues)],
+        'venueName': venues[pairs[keep] % len(venues)],
+        'editions': editions[keep],
+    })
+    return records(result.sort_values(['editions', 'author', 'venueName'], ascending=[False, True, True],
+                                      na_position='last', kind='stable'))
+
+# Query 3: Impact factor of journals per journal and year: citations in year Y to the papers of the editions of Y-1
+# and Y-2, over those papers
+def impact_factor(graph, limit=10):
+    editions = graph.editions['journal']
+    published = graph.published['journal']
+    paper_count = np.bincount(published.indices, minlength=len(editions['venue']))
+
+    # Citing year of every citation of a journal paper, kept when it is one or two years after the edition
+    which, edition = published.expand(graph.cites.indices)
+    citing_years = graph.paper_years[graph.cites.rows()[which]]
+    window = citing_years - editions['year'][edition]
+    cited = (window == 1) | (window == 2)
+    citation_keys, citation_counts = np.unique(
+        pack(editions['venue'][edition[cited]], citing_years[cited].astype(np.int64)), return_counts=True)
+
+    # Papers of the editions of Y-1 and Y-2 for every (journal, Y)
+    dated = ~np.isnan(editions['year'])
+    venues = np.tile(editions['venue'][dated], 2)
+    windows = np.concatenate([editions['year'][dated] + 1, editions['year'][dated] + 2]).astype(np.int64)
+    paper_keys, inverse = np.unique(pack(venues, windows), return_inverse=True)
+    paper_counts = np.bincount(inverse, weights=np.tile(paper_count[dated], 2))
+
+    pub_counts = lookup(paper_keys, paper_counts, citation_keys)
+    keep = pub_counts > 0
+    venue_names = pd.Series(editions['name']).groupby(editions['venue']).first()
+    result = pd.DataFrame({
+        'journal': venue_names.reindex(citation_keys[keep] >> 21).to_numpy(),
+        'year': citation_keys[keep] & ((1 << 21) - 1),
+        'impactFactor': round_half_up(citation_counts[keep] / pub_counts[keep]),
+    })
+    result = result.sort_values(['impactFactor', 'journal', 'year'], ascending=[False, True, True],
+                                na_position='last', kind='stable')
+    return records(result.head(limit))
+
+# Query 4: H-index per author, the number of positions i (from 1) of their papers sorted by citations with at least
+# i citations
+def h_index(graph, limit=10):
+    authored = graph.authored
+    authors = authored.rows()
+    citations = graph.citations[authored.indices]
+    order = np.lexsort((-citations, authors))
+    rank = np.arange(len(authors)) - authored.indptr[authors[order]]
+    h = np.bincount(authors[order], weights=citations[order] >= rank + 1, minlength=authored.n).astype(np.int64)
+    result = pd.DataFrame({'author': graph.author_names, 'hIndex': h})
+    result = result[result['hIndex'] > 0].sort_values(['hIndex', 'author'], ascending=[False, True],
+                                                      na_position='last', kind='stable')
+    return records(result.head(limit))
+
+QUERIES = [
+    top3_cited_papers_conference,
+    authors_published_same_venue_4editions,
+    impact_factor,
+    h_index,
+]
+
+
+# === CROSS-CHECK ===
+
+# Engine query -> PartB query returning the same rows
+def cypher_queries():
+    import PartB_SaadWantland as part_b
+    return {
+        'top3_cited_papers_conference': part_b.query_top3_cited_papers_conference,
+        'authors_published_same_venue_4editions': part_b.query_authors_published_same_venue_4editions,
+        'impact_factor': part_b.query_impact_factor,
+        'h_index': part_b.query_h_index,
+    }
+
+def same_row(left, right):
+    if left.keys() != right.keys():
+        return False
+    for key, value in left.items():
+        other = right[key]
+        if isinstance(value, float) or isinstance(other, float):
+            if value is None or other is None or abs(value - other) > 1e-9:
+                return False
+        elif value != other:
+            return False
+    return True
+
+# Differences between the engine rows and the Cypher records. Query 1 has no global order, its rows are compared
+# sorted.
+def compare(name, engine_rows, cypher_rows):
+    if name == 'top3_cited_papers_conference':
+        key = lambda row: tuple('' if value is None else str(value) for value in row.values())
+        engine_rows, cypher_rows = sorted(engine_rows, key=key), sorted(cypher_rows, key=key)
+    problems = []
+    if len(engine_rows) != len(cypher_rows):
+        problems.append(f"{len(engine_rows)} rows instead of {len(cypher_rows)}")
+    for i, (engine_row, cypher_row) in enumerate(zip(engine_rows, cypher_rows)):
+        if not same_row(engine_row, cypher_row):
+            problems.append(f"row {i}: {engine_row} instead of {cypher_row}")
+    return problems
+
+# Runs every query on the engine and on the loaded graph and reports the differences and the time of both. The graph
+# must have been loaded from `data_dir`.
+def cross_check(graph, session):
+    ok = True
+    timings = {}
+    for fn in QUERIES:
+        start = time.perf_counter()
+        engine_rows = fn(graph)
+        engine_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        records, _ = session.execute_read(cypher_queries()[fn.__name__])
+        cypher_ms = (time.perf_counter() - start) * 1000
+        problems = compare(fn.__name__, engine_rows, [record.data() for record in records])
+        ok = ok and not problems
+        timings[fn.__name__] = {'engine_ms': engine_ms, 'cypher_ms': cypher_ms, 'rows': len(engine_rows),
+                                'matches': not problems}
+        print(f"  {fn.__name__:45} engine {engine_ms:>9.1f} ms  cypher {cypher_ms:>9.1f} ms  "
+              f"{'OK' if not problems else 'MISMATCH'}")
+        for problem in problems[:5]:
+            print(f"    {problem}")
+    return ok, timings
+
+
+def main(data_dir=DATA_DIR, check=False):
+    start = time.perf_counter()
+    graph = Graph(data_dir)
+    print(f"Graph of {data_dir} read in {time.perf_counter() - start:.1f}s: {len(graph.paper_ids)} papers, "
+          f"{len(graph.cites.indices)} citations, {len(graph.authored.indices)} authorships")
+    if check:
+        from session_helper_neo4j import session_scope
+        print("Cross-checking against the loaded graph...")
+        with session_scope() as session:
+            ok, _ = cross_check(graph, session)
+        print("All queries match." if ok else "Some queries differ.")
+        return ok
+    for fn in QUERIES:
+        start = time.perf_counter()
+        rows = fn(graph)
+        print(f"\n--- {fn.__name__}: {len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms ---")
+        for row in rows[:10]:
+            print(row)
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the PartB queries in process on the preprocessed files')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of the preprocessed files')
+    parser.add_argument('--cross-check', action='store_true',
+                        help='Compare every query with its Cypher version on the loaded graph and time both')
+    args = parser.parse_args()
+    if not main(args.data_dir, args.cross_check):
+        raise SystemExit(1)
@@ -0,0 +1,365 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+import pandas as pd
+import data_preprocessing as dp
+import graph_algorithms as ga
+import analytics_engine as ae
+import citation_metrics_neo4j as cm
+import load_data_neo4j as ld
+import PartB_SaadWantland as part_b
+import PartC_SaadWantland as part_c
+import PartD_SaadWantland as part_d
+import synthetic_graph as sg
+from query_metrics_neo4j import QueryMetrics, instrument, percentile
+from session_helper_neo4j import create_session, clean_session, SessionPool
+
+DATA_DIR = 'data'
+BENCH_DIR = os.path.join('data', 'bench')
+REPORT_PATH = os.path.join('data', 'benchmark_report.json')
+SCALES = [1, 10, 100]
+WARMUP = 1
+ITERATIONS = 5
+LOAD_ITERATIONS = 1
+CHUNK_SIZE = 500000
+SECTIONS = ('load', 'partc', 'partb', 'engine', 'partd')
+GENERATORS = ('replicate', 'fitted')
+BETWEENNESS_PIVOTS = 500
+
+PARTB_QUERIES = [
+    part_b.query_top3_cited_papers_conference,
+    part_b.query_authors_published_same_venue_4editions,
+    part_b.query_impact_factor,
+    part_b.query_h_index,
+]
+PARTC_STAGES = [
+    part_c.stage1_define_community,
+    part_c.stage2_mark_database_venues,
+    part_c.stage3_mark_top100_papers,
+    part_c.stage4_mark_reviewers_and_gurus,
+]
+PARTD_ALGORITHMS = [
+    part_d.query_simulate_node_similarity_algorithm,
+    part_d.query_simulate_betweeneness_centrality_algorithm,
+    part_d.query_simulate_pagerank_algorithm,
+]
+
+# === SCALED GRAPHS ===
+# A graph of scale k is k disjoint copies of the preprocessed graph: copy i > 0 gets the suffix `~i` on every ID
+# (papers, authors, keywords, venues), in the node files and in the relationship files alike. Every copy is
+# isomorphic to the original, so the degree distribution of every rel_*.csv file is exactly the same at any scale,
+# only the number of nodes and relationships grows. The `fitted` generator (synthetic_graph) draws a new graph with
+# k times the relationships of the preprocessed one from the distributions fitted on it instead.
+
+def id_columns(file):
+    return [column for column in dp.OUTPUT_COLUMNS[file] if column.endswith('ID')]
+
+def source_state(data_dir):
+    state = {}
+    for file in dp.OUTPUT_COLUMNS:
+        path = os.path.join(data_dir, file)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            state[file] = [stat.st_size, stat.st_mtime]
+    return state
+
+# An existing scaled graph is reused when it was made the same way from the same source files
+def is_current(out_dir, state):
+    marker = os.path.join(out_dir, 'scale.json')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == state:
+                print(f"  Reusing the {state['factor']}x graph in {out_dir}")
+                return True
+    return False
+
+def mark_current(out_dir, state):
+    with open(os.path.join(out_dir, 'scale.json'), 'w') as f:
+        json.dump(state, f)
+
+# Writes the graph of scale `factor` to `out_dir`, streaming every file in chunks
+def scale_data(data_dir, out_dir, factor):
+    state = {'generator': 'replicate', 'factor': factor, 'source': source_state(data_dir)}
+    if is_current(out_dir, state):
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.time()
+    for file in state['source']:
+        columns = id_columns(file)
+        path = os.path.join(out_dir, file)
+        rows = 0
+        first = True
+        for chunk in pd.read_csv(os.path.join(data_dir, file), dtype=str, keep_default_na=False, na_values=[''],
+                                 chunksize=CHUNK_SIZE):
+            for i in range(factor):
+                copy = chunk
+                if i > 0:
+                    copy = chunk.copy()
+                    for column in columns:
+                        copy[column] = copy[column].where(copy[column].isna(), copy[column] + f'~{i}')
+                copy.to_csv(path, index=False, header=first, mode='w' if first else 'a')
+                rows += len(copy)
+                first = False
+        print(f"  {file}: {rows} rows")
+    mark_current(out_dir, state)
+    print(f"  {factor}x graph written to {out_dir} in {time.time() - start:.1f}s")
+
+# Generates a graph with `factor` times the relationships of the preprocessed one, fitted on it
+def fitted_data(data_dir, out_dir, factor, seed=sg.SEED):
+    state = {'generator': 'fitted', 'factor': factor, 'seed': seed, 'source': source_state(data_dir)}
+    if is_current(out_dir, state):
+        return
+    edges = sum(count for file, count in count_rows(data_dir).items() if file.startswith('rel_'))
+    sg.main(edges * factor, out_dir, data_dir, seed=seed)
+    mark_current(out_dir, state)
+
+def scale_dir(data_dir, bench_dir, factor, generator='replicate'):
+    if generator == 'fitted':
+        return os.path.join(bench_dir, f'fitted-x{factor}')
+    return data_dir if factor == 1 else os.path.join(bench_dir, f'x{factor}')
+
+# LOAD CSV reads from the server's import directory, which mirrors the local data directory (see ld.IMPORT_URL)
+def import_url(data_dir):
+    return 'file:///' + data_dir.replace(os.sep, '/').strip('/') + '/'
+
+def count_rows(data_dir):
+    counts = {}
+    for file in dp.OUTPUT_COLUMNS:
+        path = os.path.join(data_dir, file)
+        if os.path.exists(path):
+            counts[file] = sum(len(chunk) for chunk in pd.read_csv(path, dtype=str, usecols=[0],
+                                                                     chunksize=CHUNK_SIZE))
+    return counts
+
+# === MEASUREMENTS ===
+
+def timings(runs):
+    return {
+        'runs_ms': [round(run, 3) for run in runs],
+        'min_ms': min(runs),
+        'mean_ms': statistics.mean(runs),
+        'p50_ms': percentile(runs, 50),
+        'p95_ms': percentile(runs, 95),
+        'max_ms': max(runs),
+    }
+
+# Runs `fn` `warmup` times unmeasured, then `iterations` times measured. `setup` runs before every call and is not
+# measured. The workload's own output is silenced.
+def measure(fn, warmup, iterations, setup=None):
+    runs = []
+    for i in range(warmup + iterations):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            runs.append(elapsed)
+    return timings(runs)
+
+def print_result(name, result):
+    print(f"  {name[:58]:58} p50 {result['p50_ms']:>10.1f} ms  p95 {result['p95_ms']:>10.1f} ms")
+
+# Wipes the graph and loads `data_dir` in `mode`, file by file. Returns the time and rows of every file and of the
+# whole load.
+def load_once(session, mode, batch_size, data_dir, sessions):
+    pool = SessionPool(sessions) if mode == 'unwind' else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        clean_session(session)
+    files = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.execute_write(ld.create_constraints)
+        session.execute_write(ld.create_indexes)
+        session.execute_read(ld.await_indexes)
+    files['schema'] = ((time.perf_counter() - start) * 1000, 0)
+    for file, body in ld.NODE_FILES + ld.REL_FILES:
+        file_start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = ld.load_file(session, pool, file, body, mode, batch_size, data_dir, None)
+        files[file] = ((time.perf_counter() - file_start) * 1000, rows)
+    session.execute_write(ld.clear_progress)
+    metrics_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cm.materialize(session, batch_size)
+    files['citation_metrics'] = ((time.perf_counter() - metrics_start) * 1000, 0)
+    files['total'] = ((time.perf_counter() - start) * 1000, sum(rows for _, rows in files.values()))
+    if pool is not None:
+        pool.close()
+    return files
+
+# Every loader, `iterations` full loads each. The graph is left loaded by the last mode.
+def bench_load(session, modes, batch_size, data_dir, sessions, iterations):
+    results = {}
+    ld.IMPORT_URL = import_url(data_dir)
+    # The graph no longer matches the manifest of the last delta load
+    ld.clear_manifest(ld.MANIFEST_DIR)
+    for mode in modes:
+        runs = [load_once(session, mode, batch_size, data_dir, sessions) for _ in range(iterations)]
+        for name in runs[0]:
+            result = timings([run[name][0] for run in runs])
+            result['rows'] = runs[-1][name][1]
+            result['rows_per_s'] = result['rows'] / max(result['p50_ms'] / 1000, 1e-9)
+            results[f'{mode}/{name}'] = result
+            print_result(f'{mode}/{name}', result)
+    return results
+
+def bench_transactions(session, functions, execute, warmup, iterations, setup=None):
+    results = {}
+    for fn in functions:
+        results[fn.__name__] = measure(lambda: execute(fn), warmup, iterations, setup)
+        print_result(fn.__name__, results[fn.__name__])
+    return results
+
+# The local versions of the PartD algorithms on the files of `data_dir`. Betweenness is estimated from
+# BETWEENNESS_PIVOTS sources, so its time grows with the graph size instead of its square.
+def bench_local_algorithms(data_dir, warmup, iterations):
+    graph = ga.PaperGraph(data_dir)
+    cited = ga.undirected(graph.cites)
+    algorithms = {
+        'similarity': lambda: ga.jaccard_similarity(graph.keywords),
+        'betweenness': lambda: ga.betweenness(cited, BETWEENNESS_PIVOTS),
+        'pagerank': lambda: ga.pagerank(graph.cites),
+    }
+    results = {}
+    for name, fn in algorithms.items():
+        results[name] = measure(fn, warmup, iterations)
+        print_result(name, results[name])
+    return results
+
+# Reads the files of `data_dir` into the in-process engine and times its PartB queries. When the graph was just loaded
+# from the same files, the rows are also checked against the Cypher queries.
+def bench_engine(session, data_dir, warmup, iterations, load_iterations, check):
+    results = {}
+    graphs = []
+    results['read'] = measure(lambda: graphs.append(ae.Graph(data_dir)), 0, load_iterations)
+    print_result('read', results['read'])
+    graph = graphs[-1]
+    for fn in ae.QUERIES:
+        results[fn.__name__] = measure(lambda: fn(graph), warmup, iterations)
+        print_result(fn.__name__, results[fn.__name__])
+    if check:
+        results['matches_cypher'], _ = ae.cross_check(graph, session)
+    return results
+
+def server_version(session):
+    record = session.run("CALL dbms.components() YIELD name, versions, edition "
+                         "RETURN name, versions[0] AS version, edition").single()
+    return f"{record['name']} {record['version']} {record['edition']}"
+
+def bench_scale(factor, sections, data_dir, bench_dir, modes, batch_size, sessions, warmup, iterations,
+                load_iterations, generator='replicate'):
+    directory = scale_dir(data_dir, bench_dir, factor, generator)
+    if generator == 'fitted':
+        print(f"Generating the {factor}x fitted graph...")
+        fitted_data(data_dir, directory, factor)
+    elif factor > 1:
+        print(f"Writing the {factor}x graph...")
+        scale_data(data_dir, directory, factor)
+    query_metrics = QueryMetrics(log_path=None)
+    session = instrument(create_session(), query_metrics)
+    report = {'scale': factor, 'data_dir': directory, 'rows': count_rows(directory), 'results': {}}
+    results = report['results']
+
+    if 'load' in sections:
+        print(f"[{factor}x] Loaders ({', '.join(modes)})...")
+        results['load'] = bench_load(session, modes, batch_size, directory, sessions, load_iterations)
+    if 'partc' in sections or 'partb' in sections:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cm.ensure_materialized(session, batch_size)
+    if 'partc' in sections:
+        print(f"[{factor}x] PartC transformations...")
+        results['partc'] = bench_transactions(session, PARTC_STAGES, session.execute_write, warmup, iterations)
+    if 'partb' in sections:
+        print(f"[{factor}x] PartB queries...")
+        results['partb'] = bench_transactions(session, PARTB_QUERIES, session.execute_read, warmup, iterations)
+    if 'engine' in sections:
+        print(f"[{factor}x] PartB queries in process...")
+        results['engine'] = bench_engine(session, directory, warmup, iterations, load_iterations, 'load' in sections)
+    if 'partd' in sections:
+        if ga.gds_version(session) is None:
+            print(f"[{factor}x] PartD algorithms without GDS (graph_algorithms)...")
+            results['partd_local'] = bench_local_algorithms(directory, warmup, iterations)
+        else:
+            print(f"[{factor}x] PartD algorithms, projecting and computing on every run...")
+            # Node similarity would otherwise add its SIMILAR relationships to those of the previous run
+            results['partd_cold'] = bench_transactions(
+                session, PARTD_ALGORITHMS, session.execute_write, warmup, iterations,
+                setup=lambda: (clean_session(session, rel_types=['SIMILAR']), part_d.projections.drop_all(session)))
+            print(f"[{factor}x] PartD algorithms on the cached projections...")
+            results['partd'] = bench_transactions(
+                session, PARTD_ALGORITHMS, session.execute_write, warmup, iterations,
+                setup=lambda: clean_session(session, rel_types=['SIMILAR']))
+
+    report['queries'] = query_metrics.summary()
+    session.close()
+    return report
+
+def main(scales=SCALES, sections=SECTIONS, data_dir=DATA_DIR, bench_dir=BENCH_DIR, report_path=REPORT_PATH,
+         modes=ld.LOAD_MODES, batch_size=ld.BATCH_SIZE, sessions=ld.SESSIONS, warmup=WARMUP, iterations=ITERATIONS,
+         load_iterations=LOAD_ITERATIONS, generator='replicate'):
+    with create_session() as session:
+        server = server_version(session)
+        gds = ga.gds_version(session)
+    report = {
+        'started': datetime.now(timezone.utc).isoformat(),
+        'server': server,
+        'gds': gds,
+        'python': platform.python_version(),
+        'warmup': warmup,
+        'iterations': iterations,
+        'load_iterations': load_iterations,
+        'load_modes': list(modes),
+        'batch_size': batch_size,
+        'generator': generator,
+        'scales': [],
+    }
+    for factor in scales:
+        report['scales'].append(bench_scale(factor, sections, data_dir, bench_dir, modes, batch_size, sessions,
+                                            warmup, iterations, load_iterations, generator))
+        # Written after every scale, so the smaller scales are kept if a larger one fails
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Benchmark report written to {report_path}")
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the loaders, PartB queries, PartC transformations and '
+                                                 'PartD algorithms on scaled copies of the graph')
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)),
+                        help='Comma separated scale factors, a graph of scale k is k copies of the preprocessed one')
+    parser.add_argument('--sections', default=','.join(SECTIONS),
+                        help=f'Comma separated parts to benchmark among {", ".join(SECTIONS)}')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of the preprocessed files')
+    parser.add_argument('--bench-dir', default=BENCH_DIR,
+                        help='Directory of the scaled graphs, it must be visible in the import directory of the '
+                             'server like the data directory for the LOAD CSV loaders')
+    parser.add_argument('--generator', choices=GENERATORS, default='replicate',
+                        help='replicate: k copies of the preprocessed graph (default), fitted: a graph with k times '
+                             'its relationships drawn by synthetic_graph from its fitted distributions')
+    parser.add_argument('--report', default=REPORT_PATH, help='JSON report')
+    parser.add_argument('--modes', default=','.join(ld.LOAD_MODES), help='Comma separated loaders to benchmark')
+    parser.add_argument('--batch-size', type=int, default=ld.BATCH_SIZE, help='Rows committed per transaction')
+    parser.add_argument('--sessions', type=int, default=ld.SESSIONS,
+                        help='Sessions writing batches concurrently (unwind loader)')
+    parser.add_argument('--warmup', type=int, default=WARMUP, help='Unmeasured runs of every query first')
+    parser.add_argument('--iterations', type=int, default=ITERATIONS, help='Measured runs of every query')
+    parser.add_argument('--load-iterations', type=int, default=LOAD_ITERATIONS,
+                        help='Measured full loads per loader (each one wipes the graph)')
+    args = parser.parse_args()
+    sections = args.sections.split(',')
+    modes = args.modes.split(',')
+    for name, values, allowed in (('section', sections, SECTIONS), ('mode', modes, ld.LOAD_MODES)):
+        unknown = set(values) - set(allowed)
+        if unknown:
+            parser.error(f"unknown {name}(s): {', '.join(sorted(unknown))}")
+    main([int(scale) for scale in args.scales.split(',')], sections, args.data_dir, args.bench_dir, args.report,
+         modes, args.batch_size, args.sessions, args.warmup, args.iterations, args.load_iterations, args.generator)
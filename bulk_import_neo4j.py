@@ -0,0 +1,170 @@
+import argparse
+import os
+import time
+import pandas as pd
+import data_preprocessing as dp
+
+DATA_DIR = 'data'
+BULK_DIR = os.path.join('data', 'bulk')
+# Same target database as the loaders: NEO4J_DATABASE, or neo4j-admin needs a name and 'neo4j' is the usual default
+DATABASE = os.environ.get('NEO4J_DATABASE') or 'neo4j'
+CHUNK_SIZE = 500000
+
+# Node files for `neo4j-admin database import full`: label -> (preprocessed file, key column used as the import ID,
+# {column: typed header}). Every label has its own ID space. Venue editions are keyed on their venue and year (and
+# volume) by data_preprocessing, VenueID is shared by the editions of a venue.
+NODES = {
+    'Paper': ('nodes_papers.csv', 'PaperID', {
+        'PaperID': 'PaperID', 'Title': 'Title', 'Year': 'Year:int', 'Abstract': 'Abstract', 'DOI': 'DOI'}),
+    'Author': ('nodes_authors.csv', 'AuthorID', {'AuthorID': 'AuthorID', 'Name': 'Name'}),
+    'Keyword': ('nodes_keywords.csv', 'KeywordID', {'KeywordID': 'KeywordID', 'Keyword': 'Keyword'}),
+    'Conference': ('nodes_conference.csv', 'ConferenceID', {
+        'ConferenceID': 'ConferenceID', 'VenueID': 'VenueID', 'Venue': 'Venue', 'Year': 'Year:int'}),
+    'Journal': ('nodes_journal.csv', 'JournalID', {
+        'JournalID': 'JournalID', 'VenueID': 'VenueID', 'Venue': 'Venue', 'Year': 'Year:int', 'Volume': 'Volume:int'}),
+    'Workshop': ('nodes_workshop.csv', 'WorkshopID', {
+        'WorkshopID': 'WorkshopID', 'VenueID': 'VenueID', 'Venue': 'Venue', 'Year': 'Year:int'}),
+}
+
+# Relationship files: (type, preprocessed file, (start column, label), (end column, label), {column: typed header})
+RELATIONSHIPS = [
+    ('AUTHOR_OF', 'rel_author_of.csv', ('AuthorID', 'Author'), ('PaperID', 'Paper'), {}),
+    ('CORRESPONDING_AUTHOR', 'rel_corresponding_author.csv', ('AuthorID', 'Author'), ('PaperID', 'Paper'), {}),
+    ('ABOUT', 'rel_about.csv', ('PaperID', 'Paper'), ('KeywordID', 'Keyword'), {}),
+    ('RELATED', 'rel_related.csv', ('PaperID', 'Paper'), ('RelatedToPaperID', 'Paper'), {}),
+    ('PUBLISHED_IN', 'rel_published_in_conference.csv', ('PaperID', 'Paper'), ('ConferenceID', 'Conference'), {}),
+    ('PUBLISHED_IN', 'rel_published_in_journal.csv', ('PaperID', 'Paper'), ('JournalID', 'Journal'), {}),
+    ('PUBLISHED_IN', 'rel_published_in_workshop.csv', ('PaperID', 'Paper'), ('WorkshopID', 'Workshop'), {}),
+    ('REVIEWS', 'rel_reviews.csv', ('ReviewerID', 'Author'), ('PaperID', 'Paper'),
+     {'Comment': 'Comment', 'Score': 'Score:int'}),
+]
+
+
+# Reads a preprocessed csv file with every value as a string and empty fields as NaN
+def read_csv(path, chunksize=None):
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''], chunksize=chunksize)
+
+
+# Writes the node files of every label and returns, per label, a frame mapping the ID property used by the
+# relationship files to the import ID(s) it matches (like MATCH on the property in load_data_neo4j)
+def export_nodes(data_dir, bulk_dir):
+    id_maps = {}
+    for label, (file, key, headers) in NODES.items():
+        nodes = read_csv(os.path.join(data_dir, file)).dropna(subset=[key])
+        nodes[':ID'] = nodes[key]
+        # nodes_authors.csv has a row per spelling of an author's name, and load_data_neo4j MERGEs the authors on
+        # AuthorID (ON CREATE SET Name), so the first row of an ID wins here too. The other labels are CREATEd under a
+        # uniqueness constraint by load_data_neo4j, a duplicate is left for neo4j-admin to report in the same way.
+        duplicates = nodes[':ID'].duplicated() & (label == 'Author')
+        if duplicates.any():
+            print(f"  {file}: {duplicates.sum()} rows with an already exported AuthorID skipped")
+            nodes = nodes[~duplicates]
+        out = nodes[[':ID'] + list(headers)].rename(columns=dict(headers, **{':ID': f':ID({label})'}))
+        out.to_csv(os.path.join(bulk_dir, file), index=False)
+        id_maps[label] = nodes[[key, ':ID']].rename(columns={key: 'key'})
+        print(f"  {file}: {len(out)} {label} nodes")
+    return id_maps
+
+
+# Replaces the values of `column` by the import IDs they refer to. Rows whose value matches no node are dropped and
+# counted.
+def resolve(chunk, column, id_map, header):
+    resolved = chunk.merge(id_map, left_on=column, right_on='key', how='inner', sort=False)
+    resolved = resolved.drop(columns=[column, 'key']).rename(columns={':ID': header})
+    matched = chunk[column].isin(id_map['key'])
+    return resolved, int((~matched).sum())
+
+
+# Writes the relationship files, checking referential integrity: every start and end node must exist. Dangling rows
+# would fail the import, they are reported and left out (LOAD CSV skips them too), or raise with `strict`.
+def export_relationships(data_dir, bulk_dir, id_maps, strict=False):
+    exported = []
+    problems = []
+    for rel_type, file, (start, start_label), (end, end_label), headers in RELATIONSHIPS:
+        path = os.path.join(bulk_dir, file)
+        rows = written = dangling_start = dangling_end = 0
+        first = True
+        for chunk in read_csv(os.path.join(data_dir, file), chunksize=CHUNK_SIZE):
+            rows += len(chunk)
+            chunk, missing = resolve(chunk, start, id_maps[start_label], f':START_ID({start_label})')
+            dangling_start += missing
+            chunk, missing = resolve(chunk, end, id_maps[end_label], f':END_ID({end_label})')
+            dangling_end += missing
+            columns = [f':START_ID({start_label})', f':END_ID({end_label})'] + list(headers)
+            chunk[columns].rename(columns=headers).to_csv(path, index=False, header=first, mode='w' if first else 'a')
+            written += len(chunk)
+            first = False
+        if first:
+            pd.DataFrame(columns=[f':START_ID({start_label})', f':END_ID({end_label})'] + list(headers.values())).to_csv(
+                path, index=False)
+        print(f"  {file}: {rows} rows -> {written} {rel_type} relationships")
+        if dangling_start or dangling_end:
+            problems.append(f"{file}: {dangling_start} rows without their {start_label} ({start}), "
+                            f"{dangling_end} without their {end_label} ({end})")
+        exported.append((rel_type, file))
+
+    for problem in problems:
+        print(f"  Referential integrity: {problem}")
+    if problems and strict:
+        raise ValueError('Relationships with missing endpoints: ' + '; '.join(problems))
+    return exported
+
+
+# Writes the argument file of neo4j-admin (one option per line, passed as @file) and returns the command to run
+def write_import_args(bulk_dir, exported, database):
+    lines = ['--overwrite-destination=true', '--multiline-fields=true']
+    for label, (file, _, _) in NODES.items():
+        lines.append(f"--nodes={label}={os.path.abspath(os.path.join(bulk_dir, file))}")
+    for rel_type, file in exported:
+        lines.append(f"--relationships={rel_type}={os.path.abspath(os.path.join(bulk_dir, file))}")
+    args_path = os.path.join(bulk_dir, 'import.args')
+    with open(args_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return f"neo4j-admin database import full @{os.path.abspath(args_path)} {database}"
+
+
+# Creates the constraints and indexes of load_data_neo4j on the imported database, then the citation metrics
+def create_schema():
+    import citation_metrics_neo4j as cm
+    import load_data_neo4j as ld
+    from session_helper_neo4j import session_scope
+
+    with session_scope() as session:
+        session.execute_write(ld.create_constraints)
+        session.execute_write(ld.create_indexes)
+        session.execute_read(ld.await_indexes)
+        print("Constraints and indexes are online.")
+        cm.materialize(session)
+
+
+def main(data_dir=DATA_DIR, bulk_dir=BULK_DIR, database=DATABASE, strict=False):
+    dp.require_edition_keys(data_dir)
+    start = time.time()
+    os.makedirs(bulk_dir, exist_ok=True)
+    print("Exporting nodes...")
+    id_maps = export_nodes(data_dir, bulk_dir)
+    print("Exporting relationships...")
+    exported = export_relationships(data_dir, bulk_dir, id_maps, strict)
+    command = write_import_args(bulk_dir, exported, database)
+    print(f"Bulk import files written to {bulk_dir} in {time.time() - start:.1f}s.")
+    print("Stop the database, then run:")
+    print(f"  {command}")
+    print("and, once it is started again, create the constraints and indexes with:")
+    print("  python bulk_import_neo4j.py --create-schema")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the preprocessed files for neo4j-admin database import')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of the preprocessed files')
+    parser.add_argument('--bulk-dir', default=BULK_DIR, help='Directory of the exported import files')
+    parser.add_argument('--database', default=DATABASE,
+                        help='Database to (re)create with the import (default: NEO4J_DATABASE, else neo4j)')
+    parser.add_argument('--strict', action='store_true',
+                        help='Fail when a relationship references a node that does not exist')
+    parser.add_argument('--create-schema', action='store_true',
+                        help='Create the constraints and indexes on the imported database instead of exporting')
+    args = parser.parse_args()
+    if args.create_schema:
+        create_schema()
+    else:
+        main(args.data_dir, args.bulk_dir, args.database, args.strict)
@@ -0,0 +1,148 @@
+import argparse
+import time
+from session_helper_neo4j import create_session, bump_data_version
+
+BATCH_SIZE = 10000
+
+# Citation metrics kept as node properties, so the PartB queries and PartC read them instead of aggregating the
+# RELATED relationships on every run:
+# - Paper.citationCount: papers citing the paper
+# - Author.hIndex: h-index of the author over the citationCount of their papers
+# - Journal.paperCount, citationsNextYear, citationsSecondYear: papers of the journal edition, and citations they get
+#   from papers of the year after the edition and of the second year after (the windows of the impact factor)
+# They are computed for the whole graph after a full load and refreshed for the affected nodes after a delta load.
+# As every load ends here, both also give the graph a new data version (stale GDS projections are dropped on it).
+
+PAPER_METRICS = """
+    SET p.citationCount = COUNT { (p)<-[:RELATED]-(:Paper) }
+"""
+# Sorted citation counts: the h-index is the number of positions i (from 1) with at least i citations
+AUTHOR_METRICS = """
+    CALL {
+        WITH a
+        MATCH (a)-[:AUTHOR_OF]->(p:Paper)
+        WITH coalesce(p.citationCount, 0) AS citations
+        ORDER BY citations DESC
+        RETURN COLLECT(citations) AS citations
+    }
+    SET a.hIndex = SIZE([i IN RANGE(0, SIZE(citations) - 1) WHERE citations[i] >= i + 1])
+"""
+JOURNAL_METRICS = """
+    SET j.paperCount = COUNT { (:Paper)-[:PUBLISHED_IN]->(j) },
+        j.citationsNextYear = COUNT {
+            (citing:Paper)-[:RELATED]->(:Paper)-[:PUBLISHED_IN]->(j) WHERE citing.Year = j.Year + 1
+        },
+        j.citationsSecondYear = COUNT {
+            (citing:Paper)-[:RELATED]->(:Paper)-[:PUBLISHED_IN]->(j) WHERE citing.Year = j.Year + 2
+        }
+"""
+
+# (variable, label, key, body), in dependency order: the h-index reads the citation counts
+METRICS = [
+    ('p', 'Paper', 'PaperID', PAPER_METRICS),
+    ('a', 'Author', 'AuthorID', AUTHOR_METRICS),
+    ('j', 'Journal', 'JournalID', JOURNAL_METRICS),
+]
+
+
+# Computes the metrics of every node of `label`. Auto-commit (session.run).
+def materialize_label(session, variable, label, body, batch_size):
+    return session.run(
+        f"""
+        MATCH ({variable}:{label})
+        CALL {{ WITH {variable} {body} }} IN TRANSACTIONS OF $batch_size ROWS
+        RETURN count(*) AS nodes
+        """, batch_size=batch_size).single()['nodes']
+
+def materialize(session, batch_size=BATCH_SIZE):
+    start = time.time()
+    for variable, label, _, body in METRICS:
+        nodes = materialize_label(session, variable, label, body, batch_size)
+        print(f"  {label}: metrics of {nodes} nodes computed")
+    session.execute_write(bump_data_version)
+    print(f"Citation metrics computed in {time.time() - start:.1f}s.")
+
+def missing_metrics(tx):
+    return tx.run("MATCH (p:Paper) WHERE p.citationCount IS NULL RETURN count(p) > 0 AS missing").single()['missing']
+
+# Graphs loaded without the metrics (e.g. by the bulk import) get them before they are queried
+def ensure_materialized(session, batch_size=BATCH_SIZE):
+    if session.execute_read(missing_metrics):
+        print("Computing the citation metrics...")
+        materialize(session, batch_size)
+
+
+# === INCREMENTAL UPDATES ===
+
+def refresh_nodes(tx, variable, label, key, body, ids):
+    tx.run(f"UNWIND $ids AS id MATCH ({variable}:{label} {{{key}: id}}) {body}", ids=ids)
+
+def authors_of(tx, paper_ids):
+    return tx.run("""
+        UNWIND $ids AS id
+        MATCH (a:Author)-[:AUTHOR_OF]->(:Paper {PaperID: id})
+        RETURN COLLECT(DISTINCT a.AuthorID) AS ids
+    """, ids=paper_ids).single()['ids']
+
+# Journal editions of the papers, and of the papers they cite when `citing` (their year counts in the windows)
+def journals_of(tx, paper_ids, citing_ids):
+    return tx.run("""
+        CALL {
+            UNWIND $ids AS id
+            MATCH (:Paper {PaperID: id})-[:PUBLISHED_IN]->(j:Journal)
+            RETURN j
+            UNION
+            UNWIND $citing AS id
+            MATCH (:Paper {PaperID: id})-[:RELATED]->(:Paper)-[:PUBLISHED_IN]->(j:Journal)
+            RETURN j
+        }
+        RETURN COLLECT(DISTINCT j.JournalID) AS ids
+    """, ids=paper_ids, citing=citing_ids).single()['ids']
+
+def in_batches(ids, batch_size):
+    ids = sorted(ids)
+    return [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+# Recomputes the metrics that depend on what changed: the citation counts of the `cited` papers, the h-index of their
+# authors and of the `authors` whose papers changed, and the journal editions of the cited and `published` papers, of
+# the papers cited by `citing` papers (whose year changed) and the `journals` given. Recomputing instead of
+# incrementing keeps it idempotent, so a refresh can be repeated after a failure.
+def refresh(session, cited=(), authors=(), published=(), citing=(), journals=(), batch_size=BATCH_SIZE):
+    cited, authors, journals = set(cited), set(authors), set(journals)
+    for batch in in_batches(cited, batch_size):
+        session.execute_write(refresh_nodes, 'p', 'Paper', 'PaperID', PAPER_METRICS, batch)
+        authors.update(session.execute_read(authors_of, batch))
+    for batch in in_batches(authors, batch_size):
+        session.execute_write(refresh_nodes, 'a', 'Author', 'AuthorID', AUTHOR_METRICS, batch)
+    papers = sorted(cited | set(published))
+    citing = sorted(set(citing))
+    for i in range(0, max(len(papers), len(citing)), batch_size):
+        journals.update(session.execute_read(journals_of, papers[i:i + batch_size], citing[i:i + batch_size]))
+    for batch in in_batches(journals, batch_size):
+        session.execute_write(refresh_nodes, 'j', 'Journal', 'JournalID', JOURNAL_METRICS, batch)
+    session.execute_write(bump_data_version)
+    print(f"Citation metrics refreshed: {len(cited)} papers, {len(authors)} authors, {len(journals)} journal editions")
+
+def merge_citations(tx, pairs):
+    tx.run("""
+        UNWIND $pairs AS pair
+        MATCH (p1:Paper {PaperID: pair.citing})
+        MATCH (p2:Paper {PaperID: pair.cited})
+        MERGE (p1)-[:RELATED]->(p2)
+    """, pairs=pairs)
+
+# Adds RELATED relationships (citing PaperID, cited PaperID) and refreshes the metrics they change
+def add_citations(session, pairs, batch_size=BATCH_SIZE):
+    pairs = [{'citing': citing, 'cited': cited} for citing, cited in pairs]
+    for i in range(0, len(pairs), batch_size):
+        session.execute_write(merge_citations, pairs[i:i + batch_size])
+    refresh(session, cited=[pair['cited'] for pair in pairs], batch_size=batch_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute the citation metrics properties of the whole graph')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Nodes updated per transaction')
+    args = parser.parse_args()
+    session = create_session()
+    materialize(session, args.batch_size)
+    session.close()
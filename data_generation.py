@@ -5,177 +5,475 @@ import requests
 import time
 import csv
 import random
+import threading
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import paper_cache
 
 # Assign path for downloaded data.
 os.makedirs('data', exist_ok=True)
 OUTPUT_CSV_PATH = os.path.join('data', 'papers.csv')
+OUTPUT_JSONL_PATH = os.path.join('data', 'papers.jsonl')
+CHECKPOINT_PATH = os.path.join('data', 'harvest_checkpoint.json')
+CSV_FIELDNAMES = ['PaperId', 'Title', 'Year', 'DOI', 'AuthorId', 'Author', "Main_Author", 'Venue',
+                  'VenueID', 'Type', 'FieldOfStudy', 'Volume', 'ReferenceId', 'Reference Name', 'Abstract']
 
+# The csv is fsynced and the checkpoint saved every FSYNC_EVERY papers
+FSYNC_EVERY = 200
+
+# Semantic Scholar API settings. The base URL can be pointed to a local stub server for testing.
+API_URL = os.environ.get('S2_API_URL', 'https://api.semanticscholar.org/graph/v1')
+PAPER_FIELDS = ('paperId,title,year,authors,externalIds,venue,publicationVenue,citations,'
+                'fieldsOfStudy,publicationTypes,journal,abstract')
+
+# Concurrency and rate limiting: N requests are kept in flight but never faster than the token bucket allows.
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 5.0
+MAX_RETRIES = 8
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# The batch endpoint accepts up to 500 IDs per request
+BATCH_SIZE = 500
+
+# Recorded responses: in 'record' mode every API response is saved to FIXTURE_DIR, in 'replay' mode responses are
+# only read from it so the harvest can run offline.
+FIXTURE_DIR = os.path.join('data', 'fixtures')
+FIXTURE_MODE = None
+
+
+# Token bucket shared by all the worker threads, refilled at `rate` tokens per second
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Single long-lived writer for the raw output together with the checkpoint describing what it contains. The output is
+# either papers.jsonl (one compact record per paper, the default) or the original papers.csv with one row per author
+# and citation. Every `fsync_every` papers the output is flushed and fsynced, and only then the checkpoint (completed
+# stages, written paper IDs and the output size at that point) is atomically replaced. Resuming truncates the output
+# back to the checkpointed size, so rows written after the last checkpoint are never duplicated.
+class HarvestCheckpoint:
+    def __init__(self, output_format='jsonl', path=CHECKPOINT_PATH, resume=False, fsync_every=FSYNC_EVERY):
+        self.path = path
+        self.output_format = output_format
+        self.output_path = OUTPUT_JSONL_PATH if output_format == 'jsonl' else OUTPUT_CSV_PATH
+        self.fsync_every = fsync_every
+        self.pending = 0
+        self.completed = []
+        self.paper_ids = set()
+
+        if resume and os.path.exists(path) and os.path.exists(self.output_path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('format', 'csv') != output_format:
+                raise ValueError(f"Checkpoint was written for {state.get('format', 'csv')} output")
+            self.completed = state['completed']
+            self.paper_ids = set(state['paper_ids'])
+            os.truncate(self.output_path, state['output_bytes'])
+            self.output = open(self.output_path, 'a', newline='', encoding='utf-8', buffering=1 << 20)
+            self.writer = csv.DictWriter(self.output, fieldnames=CSV_FIELDNAMES)
+            print(f'Resuming harvest: {len(self.paper_ids)} papers written, completed {self.completed}')
+        else:
+            if resume:
+                print('No checkpoint found, starting a new harvest.')
+            self.output = open(self.output_path, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+            self.writer = csv.DictWriter(self.output, fieldnames=CSV_FIELDNAMES)
+            if output_format == 'csv':
+                self.writer.writeheader()
+
+    def is_done(self, stage):
+        return stage in self.completed
+
+    def mark_done(self, stage):
+        self.completed.append(stage)
+        self.sync()
+
+    def is_written(self, paper_id):
+        return paper_id in self.paper_ids
+
+    # Attempt to process the paper into the output, if it encounters a problem it skips it. Either way the paper counts
+    # as handled so it is not downloaded again when resuming.
+    def write_paper(self, paper):
+        try:
+            if self.output_format == 'jsonl':
+                self.output.write(json.dumps(paper_record(paper), ensure_ascii=False) + '\n')
+            else:
+                process_paper(paper, self.writer)
+        except Exception:
+            pass
+        self.paper_ids.add(paper.get('paperId'))
+        self.pending += 1
+
+    def maybe_sync(self):
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        state = {'format': self.output_format,
+                 'completed': self.completed,
+                 'paper_ids': sorted(p for p in self.paper_ids if p is not None),
+                 'output_bytes': os.fstat(self.output.fileno()).st_size}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.output.close()
+
+
+rate_limiter = TokenBucket(REQUESTS_PER_SECOND)
+thread_local = threading.local()
+
+# Samples the references of every paper. It is seeded by main() and only used by the harvesting thread, so the
+# requests sent (and the fixtures they are recorded under) are the same on every run with the same seed.
+sampler = random.Random()
+# Backoff jitter of the worker threads, kept apart from the sampler so retries never shift the sampled references
+jitter = random.Random()
+
+# IDs already downloaded during this run, so each paper is only requested (and written) once. An ID is only added
+# once its paper was returned, so the papers of a failed batch are requested again when they come up.
+fetched_ids = set()
+fetched_lock = threading.Lock()
+
+# On-disk response cache (see paper_cache.py), None when caching is disabled
+cache = None
+
+
+def main(workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, api_url=None, batch_size=BATCH_SIZE,
+         fixture_mode=None, fixture_dir=FIXTURE_DIR, seed=None, cache_path=paper_cache.CACHE_PATH,
+         cache_ttl_days=paper_cache.CACHE_TTL_DAYS, cache_max_mb=paper_cache.CACHE_MAX_MB, offline=False,
+         resume=False, output_format='jsonl'):
+    global rate_limiter, sampler, API_URL, BATCH_SIZE, FIXTURE_MODE, FIXTURE_DIR, cache
+    # A fixed seed makes the sampled references (and therefore the requests sent) repeatable, which replaying
+    # recorded fixtures relies on
+    sampler = random.Random(seed)
+    rate_limiter = TokenBucket(rate)
+    if api_url:
+        API_URL = api_url
+    BATCH_SIZE = batch_size
+    FIXTURE_MODE = fixture_mode
+    FIXTURE_DIR = fixture_dir
+    cache = paper_cache.PaperCache(cache_path, cache_ttl_days, cache_max_mb) if cache_path else None
+
+    if offline:
+        if cache is None:
+            raise ValueError('Offline mode needs the response cache')
+        rebuild_from_cache(output_format)
+        cache.close()
+        return
+
+    checkpoint = HarvestCheckpoint(output_format, resume=resume)
+    fetched_ids.clear()
+    fetched_ids.update(checkpoint.paper_ids)
 
-def main():
     years = ["2020", "2021", "2022", "2023", "2024", "2025"]
 
-    for year in years:
-        dwnld_conferences(700, year)
-    dwnld_papers(2000)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for year in years:
+            dwnld_conferences(700, year, executor, checkpoint)
+        dwnld_papers(2000, executor, checkpoint)
+    checkpoint.close()
+
+    if cache is not None:
+        print(f'Evicted {cache.evict()} cache entries.')
+        cache.close()
+
+
+# Rebuilds the raw output purely from the papers stored in the cache, without any network access
+def rebuild_from_cache(output_format='jsonl'):
+    checkpoint = HarvestCheckpoint(output_format)
+    for paper in cache.papers():
+        checkpoint.write_paper(paper)
+        checkpoint.maybe_sync()
+    checkpoint.close()
+    print(f'Rebuilt {checkpoint.output_path} from {len(checkpoint.paper_ids)} cached papers.')
 
 
 # Performs the download and processing of journal articles
-def dwnld_papers(n_papers):
+def dwnld_papers(n_papers, executor, checkpoint):
+    if checkpoint.is_done('journals'):
+        print('Journal papers already harvested, skipping.')
+        return
+
     # Obtain a list of journal papers to look up in the following part
     papers = get_papers("JournalArticle")
-    paper_ids = [paper['paperId'] for paper in papers]
-
-    n_paper = 1
-    for paper_id in paper_ids:
-        if n_paper < n_papers:
-            paper = get_paper(paper_id)
-            try:
-                process_paper(paper, n_paper)
-            except:
-                pass
-            n_paper+=1
-
-            # Process the references cited in the paper. A random number is chosen for max references for two reasons:
-            # 1. Avoid spending too much time processing references
-            # 2. Mantain variability between papers for the graph model.
-            max_refs = random.randint(1, 14)
-            refs = 0
-            for reference in paper['citations']:
-                if refs <= max_refs:
-                    print(reference)
-                    ref_id = reference["paperId"]
-                    paper = get_paper(ref_id)
-                    refs += 1
-
-                    # Attempt to process the cited paper, if it encounters a problem it skips it
-                    try:
-                        process_paper(paper, n_paper)
-                    except:
-                        pass
-                else:
-                    break
-        else:
-            break
+    paper_ids = [paper['paperId'] for paper in papers][:max(n_papers - 1, 0)]
 
-    # dwnld_conferences()
+    # Process the references cited in each paper. A random number is chosen for max references for two reasons:
+    # 1. Avoid spending too much time processing references
+    # 2. Mantain variability between papers for the graph model.
+    harvest(paper_ids, 14, executor, checkpoint)
+    checkpoint.mark_done('journals')
 
 
 # Performs the download and processing of conference papers
-def dwnld_conferences(n_conferences, conf_year):
+def dwnld_conferences(n_conferences, conf_year, executor, checkpoint):
+    stage = f'conferences-{conf_year}'
+    if checkpoint.is_done(stage):
+        print(f'Conference papers of {conf_year} already harvested, skipping.')
+        return
+
     # Obtain a list of conference papers to look up in the following part
     conferences = get_papers("Conference", conf_year)
-    conference_ids = [conference['paperId'] for conference in conferences]
-
-    # For each conference paper obtain the relevant data
-    n_conference = 0
-    for conf_id in conference_ids:
-        if n_conference < n_conferences:
-            # Obtains a paper and attempts to process it into the csv
-            paper = get_paper(conf_id)
-            try:
-                process_paper(paper, n_conference)
-            except:
-                pass
-            n_conference += 1
-
-            # Process the references cited in the paper. A random number is chosen for max references for two reasons:
-            # 1. Avoid spending too much time processing references
-            # 2. Mantain variability between papers for the graph model.
-            max_refs = random.randint(1, 6)
-            refs = 0
-            for reference in paper['citations']:
-                if refs <= max_refs:
-                    print(reference)
-                    ref_id = reference["paperId"]
-                    paper = get_paper(ref_id)
-                    refs+=1
-
-                    # Attempt to process the cited paper, if it encounters a problem it skips it
-                    try:
-                        process_paper(paper, n_conference)
-                    except:
-                        pass
-                else:
-                    break
-        else:
-            break
+    conference_ids = [conference['paperId'] for conference in conferences][:n_conferences]
 
+    # For each conference paper obtain the relevant data, together with a random number of its references
+    harvest(conference_ids, 6, executor, checkpoint)
+    checkpoint.mark_done(stage)
 
-# Performs a bulk search to obtain the IDs of relevant papers or conferences for further processing
-def get_papers(paper_types, p_year = "2019-"):
-    x = 1
-    while x == 1:
-        rsp = requests.get(f'https://api.semanticscholar.org/graph/v1/paper/search/bulk',
-                           params={'query': "machine | learning",
-                                   'publicationTypes': paper_types,
-                                   'fieldsOfStudy': "Computer Science,Engineering,Mathematics",
-                                   'fields': "paperId",
-                                   'minCitationCount': 5,
-                                   'year': p_year})
+
+# Downloads the given papers and a random sample of their references through the batch endpoint, then processes them
+# in order (each paper followed by its references) so the csv is only ever written from this thread. Papers already
+# in the checkpoint are skipped, and the checkpoint is only saved between a paper and its references.
+def harvest(paper_ids, max_refs_limit, executor, checkpoint):
+    paper_ids = [paper_id for paper_id in paper_ids if not checkpoint.is_written(paper_id)]
+    papers = get_papers_batch(paper_ids, executor)
+
+    ref_ids = []
+    for paper in papers:
+        if paper is None:
+            ref_ids.append([])
+            continue
+        max_refs = sampler.randint(1, max_refs_limit)
+        citations = paper.get('citations') or []
+        ref_ids.append([reference['paperId'] for reference in citations[:max_refs + 1]])
+    flat_refs = get_papers_batch([ref_id for refs in ref_ids for ref_id in refs], executor)
+
+    position = 0
+    for paper, refs in zip(papers, ref_ids):
+        if paper is not None:
+            checkpoint.write_paper(paper)
+        for ref_paper in flat_refs[position:position + len(refs)]:
+            if ref_paper is not None:
+                checkpoint.write_paper(ref_paper)
+        position += len(refs)
+        checkpoint.maybe_sync()
+
+
+# Looks up a list of paper IDs with as few requests as possible. IDs are grouped into chunks of BATCH_SIZE which are
+# sent concurrently. The result is aligned with `paper_ids`; IDs that were already fetched in this run (or repeated
+# in the list), unknown IDs and failed chunks give None.
+def get_papers_batch(paper_ids, executor):
+    with fetched_lock:
+        new_ids = list(dict.fromkeys(paper_id for paper_id in paper_ids
+                                     if paper_id is not None and paper_id not in fetched_ids))
+
+    found = {}
+    if cache is not None:
+        keys = {paper_cache.PaperCache.key('paper', paper_id, PAPER_FIELDS): paper_id for paper_id in new_ids}
+        for key, paper in cache.get_many(keys).items():
+            found[keys[key]] = paper
+        new_ids = [paper_id for paper_id in new_ids if paper_id not in found]
+
+    chunks = [new_ids[i:i + BATCH_SIZE] for i in range(0, len(new_ids), BATCH_SIZE)]
+    for chunk, papers in zip(chunks, executor.map(try_post_batch, chunks)):
+        for paper_id, paper in zip(chunk, papers):
+            found[paper_id] = paper
+        if cache is not None:
+            cache.put_many([(paper_cache.PaperCache.key('paper', paper_id, PAPER_FIELDS), 'paper', paper_id, paper)
+                            for paper_id, paper in zip(chunk, papers) if paper is not None])
+
+    with fetched_lock:
+        fetched_ids.update(paper_id for paper_id, paper in found.items() if paper is not None)
+    # Only the first occurrence of a repeated ID receives the paper
+    return [found.pop(paper_id, None) if paper_id is not None else None for paper_id in paper_ids]
+
+
+# A replay that misses a fixture stops the harvest instead of skipping the batch, the output would silently be
+# smaller than the recorded one
+class MissingFixture(Exception):
+    pass
+
+
+def try_post_batch(paper_ids):
+    try:
+        return post_batch(paper_ids)
+    except (requests.RequestException, RuntimeError) as e:
+        print(f'Skipping batch of {len(paper_ids)} papers: {e}')
+        return [None] * len(paper_ids)
+
+
+# Each worker thread keeps its own HTTP session so connections are reused between requests
+def http_session():
+    if not hasattr(thread_local, 'session'):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
+
+# Sends a rate limited request to the API. Throttling (429) and server errors (5xx) are retried with exponential
+# backoff, honouring the Retry-After header when present. Any other error status is raised to the caller.
+def api_request(method, path, params=None, body=None):
+    if FIXTURE_MODE is not None:
+        fixture_path = os.path.join(FIXTURE_DIR, fixture_key(method, path, params, body) + '.json')
+        if FIXTURE_MODE == 'replay':
+            if not os.path.exists(fixture_path):
+                raise MissingFixture(f'No recorded fixture for {method} {path} in {FIXTURE_DIR}')
+            with open(fixture_path, encoding='utf-8') as f:
+                return json.load(f)
+        data = send_request(method, path, params, body)
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        with open(fixture_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        return data
+    return send_request(method, path, params, body)
+
+
+# Fixtures are named after a hash of everything that identifies the request
+def fixture_key(method, path, params, body):
+    request = json.dumps([method, path, params or {}, body], sort_keys=True)
+    return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+
+def send_request(method, path, params=None, body=None):
+    delay = BACKOFF_BASE
+    for attempt in range(MAX_RETRIES):
+        rate_limiter.acquire()
         try:
+            rsp = http_session().request(method, API_URL + path, params=params, json=body, timeout=30)
+        except (requests.ConnectionError, requests.Timeout):
+            rsp = None
+
+        if rsp is not None and rsp.status_code not in RETRY_STATUSES:
             rsp.raise_for_status()
-            x = 2
-        except:
-            time.sleep(1)
-    data = rsp.json()
+            return rsp.json()
+
+        retry_after = rsp.headers.get('Retry-After', '') if rsp is not None else ''
+        time.sleep(float(retry_after) if retry_after.isdigit() else delay * jitter.uniform(0.5, 1.5))
+        delay = min(delay * 2, BACKOFF_MAX)
+    raise RuntimeError(f'{method} {path} failed after {MAX_RETRIES} attempts')
+
+
+# Performs a bulk search to obtain the IDs of relevant papers or conferences for further processing
+def get_papers(paper_types, p_year = "2019-"):
+    params = {'query': "machine | learning",
+              'publicationTypes': paper_types,
+              'fieldsOfStudy': "Computer Science,Engineering,Mathematics",
+              'fields': "paperId",
+              'minCitationCount': 5,
+              'year': p_year}
+    key = paper_cache.PaperCache.key('search', json.dumps(params, sort_keys=True), params['fields'])
+    data = cache.get(key) if cache is not None else None
+    if data is None:
+        data = api_request('GET', '/paper/search/bulk', params=params)
+        if cache is not None:
+            cache.put(key, 'search', None, data)
     data = data['data']
     return data
 
 
 # Performs a search for a particular paper given its ID
 def get_paper(paper_id):
-    x = 1
-    while x == 1:
-        rsp = requests.get(f'https://api.semanticscholar.org/graph/v1/paper/{paper_id}',
-                           params={'fields': 'paperId,title,year,authors,externalIds,venue,publicationVenue,citations,'
-                                             'fieldsOfStudy,publicationTypes,journal,abstract'})
-        try:
-            rsp.raise_for_status()
-            x = 2
-        except:
-            time.sleep(1)
-    return rsp.json()
+    key = paper_cache.PaperCache.key('paper', paper_id, PAPER_FIELDS)
+    paper = cache.get(key) if cache is not None else None
+    if paper is None:
+        paper = api_request('GET', f'/paper/{paper_id}', params={'fields': PAPER_FIELDS})
+        if cache is not None:
+            cache.put(key, 'paper', paper_id, paper)
+    return paper
+
+
+# Performs a search for up to BATCH_SIZE papers in a single request. Unknown IDs are returned as None.
+def post_batch(paper_ids):
+    return api_request('POST', '/paper/batch', params={'fields': PAPER_FIELDS}, body={'ids': list(paper_ids)})
+
+
+# Obtain relevant data points from the JSON file provided by the API as a single compact record. The fields are the
+# same as the csv columns, with the authors and citations kept as lists instead of repeating the paper for each pair.
+def paper_record(paper):
+    journal = paper.get('journal', {})
+    volume = journal.get('volume', [])
+    return {
+        "PaperId": paper["paperId"],
+        "Title": paper["title"],
+        "Year": paper["year"],
+        "DOI": paper["externalIds"]["DOI"],
+        "Venue": paper["venue"],
+        "VenueID": paper["publicationVenue"]["id"],
+        "Type": paper["publicationVenue"]["type"],
+        "FieldOfStudy": paper["fieldsOfStudy"][0] if paper["fieldsOfStudy"][0] is not None else "<no_fieldOfStudy_data>",
+        "Volume": volume if volume else "<no_volume_data>",
+        "Abstract": paper["abstract"],
+        "Authors": [{"AuthorId": author["authorId"], "Author": author["name"]} for author in paper['authors']],
+        "References": [{"ReferenceId": reference["paperId"], "Reference Name": reference["title"]}
+                       for reference in paper["citations"]],
+    }
 
 
 # Obtain relevant data points from the JSON file provided by the API and process them into a useful csv file
-def process_paper(paper, n_run):
-    # Select type of operation to perform based on wether it's the first load of the document or not
-    operation = 'w' if n_run == 0 else 'a'
-
-    with open(OUTPUT_CSV_PATH, operation, newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['PaperId', 'Title', 'Year', 'DOI', 'AuthorId', 'Author', "Main_Author", 'Venue',
-                      'VenueID', 'Type', 'FieldOfStudy', 'Volume', 'ReferenceId', 'Reference Name', 'Abstract']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-        # Write the header only when it's the first time opening the document
-        if operation == 'w':
-            writer.writeheader()
-
-        n_author = 0
-        for author in paper['authors']:
-            for reference in paper["citations"]:
-                journal = paper.get('journal', {})
-                volume = journal.get('volume', [])
-                writer.writerow({
-                    "PaperId": paper["paperId"],
-                    "Title": paper["title"],
-                    "Year": paper["year"],
-                    "DOI": paper["externalIds"]["DOI"],
-                    "AuthorId": author["authorId"],
-                    "Author": author["name"],
-                    "Main_Author": 1 if n_author == 0 else 0,
-                    "Venue": paper["venue"],
-                    "VenueID": paper["publicationVenue"]["id"],
-                    "Type": paper["publicationVenue"]["type"],
-                    "FieldOfStudy": paper["fieldsOfStudy"][0] if paper["fieldsOfStudy"][0] is not None else "<no_fieldOfStudy_data>",
-                    "Volume": volume if volume else "<no_volume_data>",
-                    "ReferenceId": reference["paperId"],
-                    "Reference Name": reference["title"],
-                    "Abstract": paper["abstract"],
-                })
-            n_author += 1
-    csvfile.close()
+def process_paper(paper, writer):
+    n_author = 0
+    for author in paper['authors']:
+        for reference in paper["citations"]:
+            journal = paper.get('journal', {})
+            volume = journal.get('volume', [])
+            writer.writerow({
+                "PaperId": paper["paperId"],
+                "Title": paper["title"],
+                "Year": paper["year"],
+                "DOI": paper["externalIds"]["DOI"],
+                "AuthorId": author["authorId"],
+                "Author": author["name"],
+                "Main_Author": 1 if n_author == 0 else 0,
+                "Venue": paper["venue"],
+                "VenueID": paper["publicationVenue"]["id"],
+                "Type": paper["publicationVenue"]["type"],
+                "FieldOfStudy": paper["fieldsOfStudy"][0] if paper["fieldsOfStudy"][0] is not None else "<no_fieldOfStudy_data>",
+                "Volume": volume if volume else "<no_volume_data>",
+                "ReferenceId": reference["paperId"],
+                "Reference Name": reference["title"],
+                "Abstract": paper["abstract"],
+            })
+        n_author += 1
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Download papers from the Semantic Scholar API into data/papers.jsonl '
+                                                 '(or data/papers.csv, see --output-format)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='Number of requests kept in flight')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help='Maximum requests per second')
+    parser.add_argument('--api-url', default=None, help='Base URL of the API (e.g. a local stub server)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Paper IDs per batch request (max 500)')
+    parser.add_argument('--fixtures', choices=['record', 'replay'], default=None,
+                        help='Record API responses to the fixture directory, or replay them offline')
+    parser.add_argument('--fixture-dir', default=FIXTURE_DIR, help='Directory of recorded API responses')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the reference sampling')
+    parser.add_argument('--cache', default=paper_cache.CACHE_PATH, help='SQLite file used as response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Always download from the API')
+    parser.add_argument('--cache-ttl-days', type=float, default=paper_cache.CACHE_TTL_DAYS,
+                        help='Cached responses older than this are downloaded again')
+    parser.add_argument('--cache-max-mb', type=float, default=paper_cache.CACHE_MAX_MB,
+                        help='Least recently used responses are evicted above this size')
+    parser.add_argument('--offline', action='store_true', help='Rebuild the output file (--output-format) purely from the cache')
+    parser.add_argument('--resume', action='store_true', help='Continue the harvest from the last checkpoint')
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'], default='jsonl',
+                        help='papers.jsonl with one record per paper, or papers.csv with one row per author/citation')
+    args = parser.parse_args()
+    main(args.workers, args.rate, args.api_url, args.batch_size, args.fixtures, args.fixture_dir, args.seed,
+         None if args.no_cache else args.cache, args.cache_ttl_days, args.cache_max_mb, args.offline, args.resume,
+         args.output_format)
@@ -1,198 +1,810 @@
+import argparse
 import pandas as pd
-import ast
+import numpy as np
+import hashlib
+import json
 import os
 import random
-
-def main():
-    # === Configuration ===
-    DATA_DIR = 'data'
-    df = pd.read_csv(os.path.join(DATA_DIR, "papers.csv"))
-
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# pyarrow is optional, it is only needed for the parquet and arrow outputs
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Seed for every synthetic value (keywords, editions, affiliations, reviews) so the output is reproducible
+SEED = 42
+# Papers (jsonl) or rows (csv) read at a time in streaming mode
+CHUNK_SIZE = 50000
+
+PAPER_COLUMNS = ['PaperId', 'Title', 'Year', 'DOI', 'Venue', 'VenueID', 'Type', 'FieldOfStudy', 'Volume', 'Abstract']
+ID_DTYPES = {'PaperId': str, 'AuthorId': str, 'VenueID': str, 'ReferenceId': str, 'Volume': str}
+
+KEYWORDS = ["data management", "indexing", "data modeling", "bigdata",
+            "data processing", "data storage", "data querying"]
+AFFILIATIONS = [
+    "MIT", "Stanford", "Oxford", "Cambridge", "Harvard",
+    "ETH Zurich", "CMU", "Tokyo", "Tsinghua", "Toronto",
+    "IBM", "Amazon", "Google", "Microsoft"
+]
+COMMENTS = [
+    "Excellent contribution to the field.",
+    "Needs more empirical validation.",
+    "Well-structured and informative.",
+    "Interesting methodology.",
+    "Limited novelty but useful results."
+]
+CONFERENCE_YEARS = [2020, 2021, 2022, 2023]
+WORKSHOP_YEARS = [2020, 2021, 2022, 2023]
+
+# Output files and their columns, in the order they are written
+OUTPUT_COLUMNS = {
+    "nodes_papers.csv": ['PaperID', 'Title', 'Year', 'Abstract', 'DOI'],
+    "nodes_authors.csv": ['AuthorID', 'Name', 'Affiliation'],
+    "nodes_keywords.csv": ['KeywordID', 'Keyword'],
+    "nodes_conference.csv": ['ConferenceID', 'VenueID', 'Venue', 'Year'],
+    "nodes_workshop.csv": ['WorkshopID', 'VenueID', 'Venue', 'Year'],
+    "nodes_journal.csv": ['JournalID', 'VenueID', 'Venue', 'Year', 'Volume'],
+    "rel_author_of.csv": ['AuthorID', 'PaperID'],
+    "rel_corresponding_author.csv": ['AuthorID', 'PaperID'],
+    "rel_about.csv": ['PaperID', 'KeywordID'],
+    "rel_related.csv": ['PaperID', 'RelatedToPaperID'],
+    "rel_published_in_conference.csv": ['PaperID', 'ConferenceID'],
+    "rel_published_in_workshop.csv": ['PaperID', 'WorkshopID'],
+    "rel_published_in_journal.csv": ['PaperID', 'JournalID'],
+    "rel_reviews.csv": ['ReviewerID', 'PaperID', 'Comment', 'Score'],
+}
+
+
+# Columnar formats that can be written next to the csv files
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def raw_path(data_dir, raw_format='auto'):
+    jsonl_path = os.path.join(data_dir, "papers.jsonl")
+    if raw_format == 'jsonl' or (raw_format == 'auto' and os.path.exists(jsonl_path)):
+        return jsonl_path, 'jsonl'
+    return os.path.join(data_dir, "papers.csv"), 'csv'
+
+
+# Reads the raw harvest as three normalized frames: one row per paper, one row per (paper, author) with the
+# Main_Author flag, and one row per (paper, reference). papers.jsonl (one record per paper) is used when present,
+# otherwise the frames are split out of papers.csv (one row per author x citation).
+def read_raw_papers(data_dir, raw_format='auto'):
+    path, raw_format = raw_path(data_dir, raw_format)
+    if raw_format == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            papers, authorships, references = records_to_frames(json.loads(line) for line in f)
+    else:
+        papers, authorships, references = split_raw_rows(pd.read_csv(path, dtype=ID_DTYPES))
+    return papers.drop_duplicates('PaperId').reset_index(drop=True), authorships, references
+
+
+# Same as read_raw_papers, but yields the frames `chunk_size` papers (jsonl) or rows (csv) at a time. Rows are only
+# deduplicated within a chunk.
+def iter_raw_papers(data_dir, raw_format='auto', chunk_size=CHUNK_SIZE):
+    path, raw_format = raw_path(data_dir, raw_format)
+    if raw_format == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            records = []
+            for line in f:
+                records.append(json.loads(line))
+                if len(records) >= chunk_size:
+                    yield records_to_frames(records)
+                    records = []
+            if records:
+                yield records_to_frames(records)
+    else:
+        for df in pd.read_csv(path, dtype=ID_DTYPES, chunksize=chunk_size):
+            yield split_raw_rows(df)
+
+
+def split_raw_rows(df):
+    papers = df[PAPER_COLUMNS].drop_duplicates('PaperId').reset_index(drop=True)
+    authorships = df[['PaperId', 'AuthorId', 'Author', 'Main_Author']].drop_duplicates().reset_index(drop=True)
+    references = df[['PaperId', 'ReferenceId']].drop_duplicates().reset_index(drop=True)
+    return papers, authorships, references
+
+
+def records_to_frames(records):
+    paper_rows, author_rows, reference_rows = [], [], []
+    for record in records:
+        authors = record.pop('Authors')
+        references = record.pop('References')
+        # papers.csv has no rows for papers without authors or citations, skip them to produce the same output
+        if not authors or not references:
+            continue
+        paper_rows.append(record)
+        paper_id = record['PaperId']
+        for n_author, author in enumerate(authors):
+            author_rows.append((paper_id, author['AuthorId'], author['Author'], 1 if n_author == 0 else 0))
+        for reference in references:
+            reference_rows.append((paper_id, reference['ReferenceId']))
+
+    # Empty strings are read as missing values from the csv, do the same here
+    papers = pd.DataFrame(paper_rows, columns=PAPER_COLUMNS).replace('', np.nan)
+    papers = papers.drop_duplicates('PaperId').reset_index(drop=True)
+    authorships = pd.DataFrame(author_rows, columns=['PaperId', 'AuthorId', 'Author', 'Main_Author']).replace('', np.nan)
+    authorships = authorships.drop_duplicates().reset_index(drop=True)
+    references = pd.DataFrame(reference_rows, columns=['PaperId', 'ReferenceId']).replace('', np.nan)
+    references = references.drop_duplicates().reset_index(drop=True)
+    return papers, authorships, references
+
+
+# Picks one of `choices` for every key in a single vectorized pass. The pick only depends on the key, the seed and the
+# purpose of the assignment (not on the position of the key or on how many keys there are), so the same title always
+# gets the same keyword however the data is ordered or split.
+def seeded_hashes(keys, seed, purpose):
+    hash_key = hashlib.md5(f'{seed}:{purpose}'.encode('utf-8')).hexdigest()[:16]
+    return pd.util.hash_pandas_object(pd.Series(keys).astype(str), index=False, hash_key=hash_key).to_numpy()
+
+def seeded_choice(keys, choices, seed, purpose):
+    return np.asarray(choices, dtype=object)[seeded_hashes(keys, seed, purpose) % np.uint64(len(choices))]
+
+
+# Row-local cleaning shared by the in-memory and streaming paths: normalizes Type and Volume, assigns the keyword and
+# the synthetic edition year (EditionYear, the original Year is kept for the paper nodes and journals).
+def clean_papers(papers, seed):
     # === Normalize Type and Detect Workshops ===
-    df['Type'] = df['Type'].fillna('other').str.strip().str.lower()
-    df.loc[df['Venue'].str.contains("Workshop", case=False, na=False), 'Type'] = 'workshop'
+    papers['Type'] = papers['Type'].fillna('other').str.strip().str.lower()
+    papers.loc[papers['Venue'].str.contains("Workshop", case=False, na=False), 'Type'] = 'workshop'
 
     # === Clean Volume Column ===
-    df['Volume'] = df['Volume'].replace('<no_volume_data>', None)
+    papers['Volume'] = papers['Volume'].replace('<no_volume_data>', None)
+    papers['Year'] = papers['Year'].astype('Int64')
+
+    # Assign a random keyword to each paper (papers sharing a title share the keyword)
+    papers['FieldOfStudy'] = seeded_choice(papers['Title'], KEYWORDS, seed, 'keyword')
+
+    # Reassign random Year to each paper to match new synthetic editions
+    papers['EditionYear'] = papers['Year']
+    is_conference = papers['Type'] == 'conference'
+    papers.loc[is_conference, 'EditionYear'] = seeded_choice(
+        papers.loc[is_conference, 'PaperId'], CONFERENCE_YEARS, seed, 'conference_year').astype(int)
+    is_workshop = papers['Type'] == 'workshop'
+    papers.loc[is_workshop, 'EditionYear'] = seeded_choice(
+        papers.loc[is_workshop, 'PaperId'], WORKSHOP_YEARS, seed, 'workshop_year').astype(int)
+    return papers
+
+
+def author_nodes(authors_df, seed):
+    keys = authors_df['AuthorID'].astype(str) + '|' + authors_df['Name'].astype(str)
+    authors_df['Affiliation'] = seeded_choice(keys, AFFILIATIONS, seed, 'affiliation')
+    return authors_df
+
+
+def review_rels(review_df, seed):
+    keys = review_df['ReviewerID'].astype(str) + '|' + review_df['PaperID'].astype(str)
+    review_df['Comment'] = seeded_choice(keys, COMMENTS, seed, 'comment')
+    review_df['Score'] = seeded_choice(keys, [1, 2, 3, 4, 5], seed, 'score').astype(int)
+    return review_df
+
+
+# Key of a venue edition: the venue ID, the year and for journals the volume, e.g. '3-2021' or '12-2023-280'. Venue
+# IDs are numbered per venue and shared by its editions, so they only identify the venue (the VenueID column).
+# A missing year or volume is keyed as 0 ('5-0-0'), like the venue edition migration of load_data_neo4j.py does.
+def edition_part(value):
+    if pd.isna(value):
+        return '0'
+    if isinstance(value, (float, np.floating)):
+        return str(int(value))
+    return str(value)
+
+def edition_id(*parts):
+    return '-'.join(edition_part(part) for part in parts)
+
+def edition_ids(*parts):
+    return pd.Series([edition_id(*values) for values in zip(*parts)], dtype=object)
+
+
+# Edition nodes (one per venue and year) of a conference or workshop
+def venue_editions(venues, years, id_column):
+    rows = [{'Venue': venue, 'Year': year} for venue in venues for year in years]
+    editions = pd.DataFrame(rows, columns=['Venue', 'Year'])
+    editions['VenueID'] = editions['Venue'].factorize()[0].astype(str)
+    editions[id_column] = edition_ids(editions['VenueID'], editions['Year']).to_numpy()
+    return editions[[id_column, 'VenueID', 'Venue', 'Year']]
+
+
+def journal_volumes(volumes):
+    return pd.to_numeric(volumes, errors='coerce').fillna(0).astype(int)
+
+
+# Journal edition nodes, one per venue, year and volume. `journal_df` has the VenueID, Venue, Year and Volume columns.
+def journal_nodes(journal_df):
+    journal_df['Volume'] = journal_volumes(journal_df['Volume'])
+    journal_df = journal_df.drop_duplicates(['VenueID', 'Year', 'Volume']).copy()
+    journal_df['JournalID'] = edition_ids(journal_df['VenueID'], journal_df['Year'], journal_df['Volume']).to_numpy()
+    return journal_df[['JournalID', 'VenueID', 'Venue', 'Year', 'Volume']]
+
+
+# === Force some authors to publish in same venue in 4 different years ===
+# `candidates_for(venue, year)` returns the conference papers of that edition, in input order
+def inject_authors(repeat_authors, repeat_venues, candidates_for):
+    print("Injecting authors into 4 editions of the same venue...")
+    extra_author_rows = []
+
+    for author in repeat_authors:
+        for venue in repeat_venues:
+            for year in CONFERENCE_YEARS:
+                # Get a paper from this venue+year
+                candidates = candidates_for(venue, year)
+                if not candidates.empty:
+                    paper_row = candidates.sample(n=1, random_state=random.randint(1, 1000))
+                    paper_id = paper_row['PaperId'].values[0]
+                    extra_author_rows.append({'AuthorID': author, 'PaperID': paper_id})
+    return pd.DataFrame(extra_author_rows, columns=['AuthorID', 'PaperID'])
+
 
-    # === NODES ===
+# === STAGES ===
+# The in-memory path is a graph of stages, one per output file. Each stage reads the cleaned frames (papers,
+# authorships, references), writes its file and returns the small values its dependants need (venue editions,
+# keyword IDs, the sampled authors). Stages without a dependency between them run concurrently in a process pool.
+# The pool uses fork, so the workers inherit the cleaned frames from the parent (copy-on-write) instead of receiving
+# a pickled copy.
 
+def stage_nodes_papers(frames, deps, data_dir, seed):
     # Paper nodes
-    papers_df = df[['PaperId', 'Title', 'Year', 'Abstract', 'DOI']].drop_duplicates().rename(columns={
+    papers_df = frames['papers'][['PaperId', 'Title', 'Year', 'Abstract', 'DOI']].drop_duplicates().rename(columns={
         'PaperId': 'PaperID'
     })
-    papers_df.to_csv(os.path.join(DATA_DIR, "nodes_papers.csv"), index=False)
+    papers_df.to_csv(os.path.join(data_dir, "nodes_papers.csv"), index=False)
 
+
+def stage_nodes_authors(frames, deps, data_dir, seed):
     # Author nodes with synthetic affiliations
-    authors_df = df[['AuthorId', 'Author']].drop_duplicates().rename(columns={
+    authors_df = author_nodes(frames['authorships'][['AuthorId', 'Author']].drop_duplicates().rename(columns={
         'AuthorId': 'AuthorID',
         'Author': 'Name'
-    })
-    affiliations = [
-        "MIT", "Stanford", "Oxford", "Cambridge", "Harvard",
-        "ETH Zurich", "CMU", "Tokyo", "Tsinghua", "Toronto",
-        "IBM", "Amazon", "Google", "Microsoft"
-    ]
-    authors_df['Affiliation'] = [random.choice(affiliations) for _ in range(len(authors_df))]
-    authors_df.to_csv(os.path.join(DATA_DIR, "nodes_authors.csv"), index=False)
-
-    # Keywords nodes
-    # === Safe FieldOfStudy Parsing ===
-    def safe_literal_eval(val):
-        if isinstance(val, str) and val.strip().startswith("[") and val.strip().endswith("]"):
-            try:
-                return ast.literal_eval(val)
-            except (ValueError, SyntaxError):
-                return []
-        elif isinstance(val, str) and val.strip() != "":
-            return [val.strip()]
-        else:
-            return []
-
-    # Assign a random keyword to each paper
-    titles = df['Title'].unique()
-    for t in titles:
-        keywords = ["data management", "indexing", "data modeling", "bigdata",
-                    "data processing", "data storage", "data querying"]
+    }), seed)
+    authors_df.to_csv(os.path.join(data_dir, "nodes_authors.csv"), index=False)
+    # Pick a few authors for the injection into 4 editions of the same venue
+    return authors_df['AuthorID'].sample(n=5, random_state=42).tolist()
 
-        df.loc[df['Title'] == t, 'FieldOfStudy'] = random.choice(keywords)
 
-
-    df['FieldOfStudy'] = df['FieldOfStudy'].apply(safe_literal_eval)
-
-    keywords_df = df.explode('FieldOfStudy')[['FieldOfStudy']].drop_duplicates().rename(columns={
+def stage_nodes_keywords(frames, deps, data_dir, seed):
+    keywords_df = frames['papers'][['FieldOfStudy']].drop_duplicates().rename(columns={
         'FieldOfStudy': 'Keyword'
     })
     keywords_df = keywords_df[keywords_df['Keyword'].notna() & (keywords_df['Keyword'] != '')]
     keywords_df['KeywordID'] = keywords_df['Keyword'].factorize()[0].astype(str)
     keywords_df = keywords_df[['KeywordID', 'Keyword']]
-    keywords_df.to_csv(os.path.join(DATA_DIR, "nodes_keywords.csv"), index=False)
-
-    # === SYNTHETIC MULTI-YEAR CONFERENCES & WORKSHOPS ===
-    conference_years = [2020, 2021, 2022, 2023]
-    workshop_years = [2020, 2021, 2022, 2023]
-
-    original_conference_df = df[df['Type'] == 'conference'][['Venue']].drop_duplicates()
-    conference_rows = []
-    for venue in original_conference_df['Venue'].unique():
-        for year in conference_years:
-            conference_rows.append({'Venue': venue, 'Year': year})
-    conference_df = pd.DataFrame(conference_rows).drop_duplicates()
-    conference_df['ConferenceID'] = conference_df['Venue'].factorize()[0].astype(str)
-    conference_df = conference_df[['ConferenceID', 'Venue', 'Year']]
-    conference_df.to_csv(os.path.join(DATA_DIR, "nodes_conference.csv"), index=False)
-
-    original_workshop_df = df[df['Type'] == 'workshop'][['Venue']].drop_duplicates()
-    workshop_rows = []
-    for venue in original_workshop_df['Venue'].unique():
-        for year in workshop_years:
-            workshop_rows.append({'Venue': venue, 'Year': year})
-    workshop_df = pd.DataFrame(workshop_rows).drop_duplicates()
-    workshop_df['WorkshopID'] = workshop_df['Venue'].factorize()[0].astype(str)
-    workshop_df = workshop_df[['WorkshopID', 'Venue', 'Year']]
-    workshop_df.to_csv(os.path.join(DATA_DIR, "nodes_workshop.csv"), index=False)
+    keywords_df.to_csv(os.path.join(data_dir, "nodes_keywords.csv"), index=False)
+    return dict(zip(keywords_df['Keyword'], keywords_df['KeywordID']))
 
-    # Reassign random Year to each paper to match new synthetic editions
-    df.loc[df['Type'] == 'conference', 'Year'] = df[df['Type'] == 'conference']['Venue'].apply(lambda v: random.choice(conference_years))
-    df.loc[df['Type'] == 'workshop', 'Year'] = df[df['Type'] == 'workshop']['Venue'].apply(lambda v: random.choice(workshop_years))
 
-    # === Force some authors to publish in same venue in 4 different years ===
-    print("Injecting authors into 4 editions of the same venue...")
+# === SYNTHETIC MULTI-YEAR CONFERENCES & WORKSHOPS ===
+def stage_nodes_conference(frames, deps, data_dir, seed):
+    papers = frames['papers']
+    conference_df = venue_editions(papers[papers['Type'] == 'conference']['Venue'].unique(), CONFERENCE_YEARS,
+                                   'ConferenceID')
+    conference_df.to_csv(os.path.join(data_dir, "nodes_conference.csv"), index=False)
+    return conference_df
 
-    # Pick a few authors
-    repeat_authors = authors_df['AuthorID'].sample(n=5, random_state=42).tolist()
-    # Pick a few venues
-    repeat_venues = conference_df['Venue'].unique()[:2]  # use 2 example venues
 
-    extra_author_rows = []
+def stage_nodes_workshop(frames, deps, data_dir, seed):
+    papers = frames['papers']
+    workshop_df = venue_editions(papers[papers['Type'] == 'workshop']['Venue'].unique(), WORKSHOP_YEARS, 'WorkshopID')
+    workshop_df.to_csv(os.path.join(data_dir, "nodes_workshop.csv"), index=False)
+    return workshop_df
 
-    for author in repeat_authors:
-        for venue in repeat_venues:
-            for year in [2020, 2021, 2022, 2023]:
-                # Get a paper from this venue+year
-                paper_row = df[(df['Venue'] == venue) & (df['Year'] == year)].sample(n=1, random_state=random.randint(1, 1000))
-                if not paper_row.empty:
-                    paper_id = paper_row['PaperId'].values[0]
-                    extra_author_rows.append({'AuthorID': author, 'PaperID': paper_id})
+
+def stage_nodes_journal(frames, deps, data_dir, seed):
+    papers = frames['papers']
+    journal_df = papers[papers['Type'] == 'journal'][['Venue', 'Year', 'Volume']].drop_duplicates()
+    journal_df['VenueID'] = journal_df['Venue'].factorize()[0].astype(str)
+    journal_df = journal_nodes(journal_df)
+    journal_df.to_csv(os.path.join(data_dir, "nodes_journal.csv"), index=False)
+    return journal_df
+
+
+# === RELATIONSHIPS ===
+
+def stage_rel_author_of(frames, deps, data_dir, seed):
+    # The injection is the only user of `random`, seeding here keeps it independent of the worker it runs in
+    random.seed(seed)
+    papers = frames['papers']
+    conference_papers = papers[papers['Type'] == 'conference']
+    repeat_venues = deps['nodes_conference']['Venue'].unique()[:2]  # use 2 example venues
+    extra_author_df = inject_authors(deps['nodes_authors'], repeat_venues, lambda venue, year: conference_papers[
+        (conference_papers['Venue'] == venue) & (conference_papers['EditionYear'] == year)])
 
     # Combine with existing AUTHOR_OF
-    existing_author_of = df[['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
+    existing_author_of = frames['authorships'][['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
         'AuthorId': 'AuthorID',
         'PaperId': 'PaperID'
     })
-    author_of_df = pd.concat([existing_author_of, pd.DataFrame(extra_author_rows)], ignore_index=True).drop_duplicates()
-    author_of_df.to_csv(os.path.join(DATA_DIR, "rel_author_of.csv"), index=False)
-
-    # Journal nodes
-    journal_df = df[df['Type'] == 'journal'][['Venue', 'Year', 'Volume']].drop_duplicates()
-    journal_df['JournalID'] = journal_df['Venue'].factorize()[0].astype(str)
-    journal_df['Volume'] = pd.to_numeric(journal_df['Volume'], errors='coerce').fillna(0).astype(int)
-    journal_df = journal_df[['JournalID', 'Venue', 'Year', 'Volume']]
-    journal_df.to_csv(os.path.join(DATA_DIR, "nodes_journal.csv"), index=False)
-
-    # === RELATIONSHIPS ===
-
-    # AUTHOR_OF
-    #df[['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
-     #   'AuthorId': 'AuthorID',
-      #  'PaperId': 'PaperID'
-    #}).to_csv(os.path.join(DATA_DIR, "rel_author_of.csv"), index=False)
-
-    # CORRESPONDING_AUTHOR
-    df[df['Main_Author'] == 1][['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
+    author_of_df = pd.concat([existing_author_of, extra_author_df], ignore_index=True).drop_duplicates()
+    author_of_df.to_csv(os.path.join(data_dir, "rel_author_of.csv"), index=False)
+
+
+def stage_rel_corresponding_author(frames, deps, data_dir, seed):
+    authorships = frames['authorships']
+    authorships[authorships['Main_Author'] == 1][['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
         'AuthorId': 'AuthorID',
         'PaperId': 'PaperID'
-    }).to_csv(os.path.join(DATA_DIR, "rel_corresponding_author.csv"), index=False)
+    }).to_csv(os.path.join(data_dir, "rel_corresponding_author.csv"), index=False)
+
 
-    # ABOUT
-    keywords_map = dict(zip(keywords_df['Keyword'], keywords_df['KeywordID']))
-    df_about = df.explode('FieldOfStudy')[['PaperId', 'FieldOfStudy']].drop_duplicates()
-    df_about['KeywordID'] = df_about['FieldOfStudy'].map(keywords_map)
+def stage_rel_about(frames, deps, data_dir, seed):
+    df_about = frames['papers'][['PaperId', 'FieldOfStudy']].drop_duplicates()
+    df_about['KeywordID'] = df_about['FieldOfStudy'].map(deps['nodes_keywords'])
     df_about = df_about.rename(columns={'PaperId': 'PaperID'})[['PaperID', 'KeywordID']]
-    df_about.to_csv(os.path.join(DATA_DIR, "rel_about.csv"), index=False)
+    df_about.to_csv(os.path.join(data_dir, "rel_about.csv"), index=False)
+
 
-    # RELATED
-    df[['PaperId', 'ReferenceId']].dropna().drop_duplicates().rename(columns={
+def stage_rel_related(frames, deps, data_dir, seed):
+    frames['references'][['PaperId', 'ReferenceId']].dropna().drop_duplicates().rename(columns={
         'PaperId': 'PaperID',
         'ReferenceId': 'RelatedToPaperID'
-    }).to_csv(os.path.join(DATA_DIR, "rel_related.csv"), index=False)
+    }).to_csv(os.path.join(data_dir, "rel_related.csv"), index=False)
 
-    # PUBLISHED_IN Conference
-    df[df['Type'] == 'conference'][['PaperId', 'Venue', 'Year']].merge(
-        conference_df[['ConferenceID', 'Venue', 'Year']], on=['Venue', 'Year']
+
+def stage_rel_published_in_conference(frames, deps, data_dir, seed):
+    papers = frames['papers']
+    papers[papers['Type'] == 'conference'][['PaperId', 'Venue', 'EditionYear']].rename(
+        columns={'EditionYear': 'Year'}).merge(
+        deps['nodes_conference'][['ConferenceID', 'Venue', 'Year']], on=['Venue', 'Year']
     )[['PaperId', 'ConferenceID']].drop_duplicates().rename(columns={'PaperId': 'PaperID'}).to_csv(
-        os.path.join(DATA_DIR, "rel_published_in_conference.csv"), index=False)
+        os.path.join(data_dir, "rel_published_in_conference.csv"), index=False)
+
 
-    # PUBLISHED_IN Workshop
-    df[df['Type'] == 'workshop'][['PaperId', 'Venue', 'Year']].merge(
-        workshop_df[['WorkshopID', 'Venue', 'Year']], on=['Venue', 'Year']
+def stage_rel_published_in_workshop(frames, deps, data_dir, seed):
+    papers = frames['papers']
+    papers[papers['Type'] == 'workshop'][['PaperId', 'Venue', 'EditionYear']].rename(
+        columns={'EditionYear': 'Year'}).merge(
+        deps['nodes_workshop'][['WorkshopID', 'Venue', 'Year']], on=['Venue', 'Year']
     )[['PaperId', 'WorkshopID']].drop_duplicates().rename(columns={'PaperId': 'PaperID'}).to_csv(
-        os.path.join(DATA_DIR, "rel_published_in_workshop.csv"), index=False)
+        os.path.join(data_dir, "rel_published_in_workshop.csv"), index=False)
 
-    # PUBLISHED_IN Journal
-    df[df['Type'] == 'journal'][['PaperId', 'Venue', 'Year']].merge(
-        journal_df[['JournalID', 'Venue', 'Year']], on=['Venue', 'Year']
+
+def stage_rel_published_in_journal(frames, deps, data_dir, seed):
+    papers = frames['papers']
+    journal_papers = papers[papers['Type'] == 'journal'][['PaperId', 'Venue', 'Year', 'Volume']].copy()
+    journal_papers['Volume'] = journal_volumes(journal_papers['Volume'])
+    journal_papers.merge(
+        deps['nodes_journal'][['JournalID', 'Venue', 'Year', 'Volume']], on=['Venue', 'Year', 'Volume']
     )[['PaperId', 'JournalID']].drop_duplicates().rename(columns={'PaperId': 'PaperID'}).to_csv(
-        os.path.join(DATA_DIR, "rel_published_in_journal.csv"), index=False)
-    # === REVIEWS (Synthetic) ===
-    def generate_comment():
-        comments = [
-            "Excellent contribution to the field.",
-            "Needs more empirical validation.",
-            "Well-structured and informative.",
-            "Interesting methodology.",
-            "Limited novelty but useful results."
-        ]
-        return random.choice(comments)
-
-    review_df = df[['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
+        os.path.join(data_dir, "rel_published_in_journal.csv"), index=False)
+
+
+# === REVIEWS (Synthetic) ===
+def stage_rel_reviews(frames, deps, data_dir, seed):
+    review_df = review_rels(frames['authorships'][['AuthorId', 'PaperId']].drop_duplicates().rename(columns={
         'AuthorId': 'ReviewerID',
         'PaperId': 'PaperID'
-    })
-    review_df['Comment'] = [generate_comment() for _ in range(len(review_df))]
-    review_df['Score'] = [random.randint(1, 5) for _ in range(len(review_df))]
+    }), seed)
+    review_df.to_csv(os.path.join(data_dir, "rel_reviews.csv"), index=False)
+
+
+# Stage name -> (stages it depends on, function)
+STAGES = {
+    'nodes_papers': ([], stage_nodes_papers),
+    'nodes_authors': ([], stage_nodes_authors),
+    'nodes_keywords': ([], stage_nodes_keywords),
+    'nodes_conference': ([], stage_nodes_conference),
+    'nodes_workshop': ([], stage_nodes_workshop),
+    'nodes_journal': ([], stage_nodes_journal),
+    'rel_author_of': (['nodes_authors', 'nodes_conference'], stage_rel_author_of),
+    'rel_corresponding_author': ([], stage_rel_corresponding_author),
+    'rel_about': (['nodes_keywords'], stage_rel_about),
+    'rel_related': ([], stage_rel_related),
+    'rel_published_in_conference': (['nodes_conference'], stage_rel_published_in_conference),
+    'rel_published_in_workshop': (['nodes_workshop'], stage_rel_published_in_workshop),
+    'rel_published_in_journal': (['nodes_journal'], stage_rel_published_in_journal),
+    'rel_reviews': ([], stage_rel_reviews),
+}
+
+# Cleaned frames of the current run. Set before the process pool is created so forked workers inherit them.
+shared_frames = {}
+
+
+def run_stage(name, deps, data_dir, seed):
+    return STAGES[name][1](shared_frames, deps, data_dir, seed)
+
+
+# Runs every stage as soon as the stages it depends on have finished, with up to `workers` stages at a time. Falls
+# back to running them one after another when there is a single worker or fork is not available on the platform.
+def run_stages(data_dir, seed, workers):
+    results = {}
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for name, (dependencies, _) in STAGES.items():
+            results[name] = run_stage(name, {d: results[d] for d in dependencies}, data_dir, seed)
+        return results
+
+    pending = dict(STAGES)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        while pending or running:
+            for name, (dependencies, _) in list(pending.items()):
+                if all(d in results for d in dependencies):
+                    deps = {d: results[d] for d in dependencies}
+                    running[executor.submit(run_stage, name, deps, data_dir, seed)] = name
+                    del pending[name]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def main(data_dir='data', raw_format='auto', seed=SEED, streaming=False, chunk_size=CHUNK_SIZE, workers=None,
+         formats=('csv',)):
+    remove_stale_columnar(data_dir, formats)
+    if streaming:
+        main_streaming(data_dir, raw_format, seed, chunk_size)
+        write_columnar(data_dir, formats)
+        return
+    workers = workers or os.cpu_count() or 1
+
+    # papers holds one row per paper, authorships one row per (paper, author) and references one per citation
+    papers, authorships, references = read_raw_papers(data_dir, raw_format)
+    shared_frames['papers'] = clean_papers(papers, seed)
+    shared_frames['authorships'] = authorships
+    shared_frames['references'] = references
+    try:
+        run_stages(data_dir, seed, workers)
+    finally:
+        shared_frames.clear()
+    write_columnar(data_dir, formats)
+
+
+# === COLUMNAR OUTPUT (optional) ===
+
+# Arrow schema of an output file. Years, volumes and scores are integers. The IDs referencing other nodes and the other
+# repetitive strings are dictionary encoded, the key of a node file and the free text columns are plain strings.
+def arrow_schema(name):
+    plain = {'Title', 'Abstract', 'DOI', 'Name', 'Keyword'}
+    integers = {'Year': pa.int32(), 'Volume': pa.int32(), 'Score': pa.int8()}
+    columns = OUTPUT_COLUMNS[name]
+    fields = []
+    for column in columns:
+        if column in integers:
+            fields.append((column, integers[column]))
+        elif column in plain or (name.startswith('nodes_') and column == columns[0]):
+            fields.append((column, pa.string()))
+        else:
+            fields.append((column, pa.dictionary(pa.int32(), pa.string())))
+    return pa.schema(fields)
+
+
+# Re-encodes the dictionary columns of `batch` against dictionaries that only grow from batch to batch, so the arrow
+# file can store them as dictionary deltas
+def unify_batch(batch, dictionaries):
+    columns = []
+    for i, field in enumerate(batch.schema):
+        column = batch.column(i)
+        if pa.types.is_dictionary(field.type):
+            known = dictionaries.get(field.name, pa.array([], pa.string()))
+            local = column.dictionary
+            new_values = local.filter(pc.is_null(pc.index_in(local, value_set=known)))
+            known = pa.concat_arrays([known, new_values]) if len(new_values) else known
+            dictionaries[field.name] = known
+            remap = pc.index_in(local, value_set=known).cast(pa.int32())
+            column = pa.DictionaryArray.from_arrays(pc.take(remap, column.indices), known)
+        columns.append(column)
+    return pa.record_batch(columns, schema=batch.schema)
+
+
+# Writes a typed parquet and/or arrow (IPC, memory-mappable) copy of every output csv file. The csv files are read in
+# blocks, so memory stays bounded in streaming mode too. The csv files are kept for LOAD CSV.
+def write_columnar(data_dir, formats):
+    formats = [f for f in formats if f in COLUMNAR_FORMATS]
+    if not formats:
+        return
+    if pa is None:
+        raise ImportError('pyarrow is needed for the parquet and arrow outputs (pip install pyarrow)')
+
+    for name in OUTPUT_COLUMNS:
+        schema = arrow_schema(name)
+        base = os.path.join(data_dir, os.path.splitext(name)[0])
+        reader = pa_csv.open_csv(
+            os.path.join(data_dir, name),
+            read_options=pa_csv.ReadOptions(block_size=1 << 26),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(column_types=schema, strings_can_be_null=True))
+        writers = []
+        if 'parquet' in formats:
+            writers.append(pq.ParquetWriter(base + '.parquet', schema))
+        if 'arrow' in formats:
+            writers.append(pa.ipc.new_file(base + '.arrow', schema,
+                                           options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)))
+        dictionaries = {}
+        for batch in reader:
+            batch = unify_batch(batch, dictionaries)
+            for writer in writers:
+                writer.write_batch(batch)
+        for writer in writers:
+            writer.close()
+
+
+# Removes parquet/arrow files of a previous run that are not written by this one, so readers never see stale data
+def remove_stale_columnar(data_dir, formats):
+    for output_format, extension in COLUMNAR_FORMATS.items():
+        if output_format in formats:
+            continue
+        for name in OUTPUT_COLUMNS:
+            path = os.path.join(data_dir, os.path.splitext(name)[0] + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Reads an output table (e.g. 'rel_related.csv') as a pyarrow Table. The arrow file is memory mapped (zero-copy),
+# then parquet is tried, and the csv file is parsed with the typed schema as a last resort.
+def read_table(data_dir, name, columns=None):
+    if pa is None:
+        raise ImportError('pyarrow is needed to read tables as arrow (pip install pyarrow)')
+    base = os.path.join(data_dir, os.path.splitext(name)[0])
+    if os.path.exists(base + '.arrow'):
+        table = pa.ipc.open_file(pa.memory_map(base + '.arrow')).read_all()
+        return table.select(columns) if columns else table
+    if os.path.exists(base + '.parquet'):
+        return pq.read_table(base + '.parquet', columns=columns, memory_map=True)
+    return pa_csv.read_csv(
+        os.path.join(data_dir, name),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(column_types=arrow_schema(name), strings_can_be_null=True,
+                                              include_columns=columns))
+
+
+# Reads an output table as a DataFrame, from the columnar files when pyarrow is installed and from the csv otherwise.
+# IDs are always strings.
+def read_frame(data_dir, name, columns=None):
+    if pa is not None:
+        return read_table(data_dir, name, columns).to_pandas()
+    text_columns = {c: str for c in OUTPUT_COLUMNS[name] if c not in ('Year', 'Volume', 'Score')}
+    return pd.read_csv(os.path.join(data_dir, name), usecols=columns, dtype=text_columns)
+
+
+# Hashes every row of `frame` (missing values of any kind hash the same) and returns the rows whose hash is not in
+# `seen` yet, adding them. This is the only state the streaming mode keeps per output table.
+def unseen_rows(frame, seen):
+    normalized = frame.astype(object).where(frame.notna(), '<NA>').astype(str)
+    hashes = pd.util.hash_pandas_object(normalized, index=False).to_numpy().tolist()
+    mask = np.zeros(len(frame), dtype=bool)
+    for i, row_hash in enumerate(hashes):
+        if row_hash not in seen:
+            seen.add(row_hash)
+            mask[i] = True
+    return frame[mask]
+
+
+def venue_key(venue):
+    return None if pd.isna(venue) else venue
+
+
+# Numbers venues in order of first appearance like factorize() does, missing venues get '-1'
+def venue_id(venue_ids, venue):
+    if pd.isna(venue):
+        return '-1'
+    if venue not in venue_ids:
+        venue_ids[venue] = str(len(venue_ids))
+    return venue_ids[venue]
+
+
+# Streaming version of main() for raw inputs larger than memory. The raw file is read in chunks and every output file
+# is appended to as the chunks are processed. Across chunks only compact state is kept: hash sets of the rows already
+# written, the venue and keyword IDs, and the candidate papers of the two venues used for the author injection. The
+# output files are identical to the ones written by main().
+def main_streaming(data_dir='data', raw_format='auto', seed=SEED, chunk_size=CHUNK_SIZE):
+    random.seed(seed)
+    outputs = {}
+    for name, columns in OUTPUT_COLUMNS.items():
+        outputs[name] = open(os.path.join(data_dir, name), 'w', newline='', encoding='utf-8')
+        pd.DataFrame(columns=columns).to_csv(outputs[name], index=False)
+
+    def write(name, frame):
+        frame.columns = OUTPUT_COLUMNS[name]
+        frame.to_csv(outputs[name], header=False, index=False)
+
+    seen = {name: set() for name in ['papers', 'authorships', 'references', 'authors', 'author_of',
+                                     'corresponding', 'journals']}
+    keyword_ids, journal_ids = {}, {}
+    conference_ids, workshop_ids = {}, {}
+    # Venues in order of first appearance, keyed by venue (None for a missing venue)
+    conference_venues, workshop_venues = {}, {}
+    n_authors = 0
+    repeat_candidates = {}
+
+    for n_chunk, (papers, authorships, references) in enumerate(iter_raw_papers(data_dir, raw_format, chunk_size)):
+        papers = papers.loc[unseen_rows(papers[['PaperId']], seen['papers']).index]
+        papers = clean_papers(papers.reset_index(drop=True), seed)
+        authorships = unseen_rows(authorships, seen['authorships'])
+        references = unseen_rows(references, seen['references'])
+
+        # Paper nodes
+        write("nodes_papers.csv", papers[['PaperId', 'Title', 'Year', 'Abstract', 'DOI']].copy())
+
+        # Author nodes with synthetic affiliations
+        authors_df = unseen_rows(authorships[['AuthorId', 'Author']], seen['authors']).rename(columns={
+            'AuthorId': 'AuthorID',
+            'Author': 'Name'
+        })
+        n_authors += len(authors_df)
+        write("nodes_authors.csv", author_nodes(authors_df, seed))
+
+        # Keyword nodes, numbered in order of first appearance
+        new_keywords = [k for k in papers['FieldOfStudy'].drop_duplicates() if k not in keyword_ids]
+        for keyword in new_keywords:
+            keyword_ids[keyword] = str(len(keyword_ids))
+        write("nodes_keywords.csv", pd.DataFrame({'KeywordID': [keyword_ids[k] for k in new_keywords],
+                                                  'Keyword': new_keywords}))
+
+        # Conference and workshop editions of the venues seen for the first time
+        for kind, ids, venues, years, name in [
+                ('conference', conference_ids, conference_venues, CONFERENCE_YEARS, "nodes_conference.csv"),
+                ('workshop', workshop_ids, workshop_venues, WORKSHOP_YEARS, "nodes_workshop.csv")]:
+            kind_papers = papers[papers['Type'] == kind]
+            new_venues = [v for v in kind_papers['Venue'].unique() if venue_key(v) not in venues]
+            venues.update((venue_key(v), v) for v in new_venues)
+            rows = [(edition_id(venue_id(ids, venue), year), venue_id(ids, venue), venue, year)
+                    for venue in new_venues for year in years]
+            write(name, pd.DataFrame(rows, columns=['ID', 'VenueID', 'Venue', 'Year']))
+
+            published_in = pd.DataFrame({
+                'PaperID': kind_papers['PaperId'],
+                'ID': edition_ids([venue_id(ids, venue) for venue in kind_papers['Venue']],
+                                  kind_papers['EditionYear']).to_numpy(),
+            })
+            write(f"rel_published_in_{kind}.csv", published_in)
+
+        # Candidate papers for the author injection, from the first two conference venues
+        conference_papers = papers[papers['Type'] == 'conference']
+        for venue in list(conference_venues.values())[:2]:
+            venue_papers = conference_papers[conference_papers['Venue'] == venue]
+            for year, paper_id in zip(venue_papers['EditionYear'], venue_papers['PaperId']):
+                repeat_candidates.setdefault((venue, year), []).append(paper_id)
+
+        # AUTHOR_OF and REVIEWS (the injected authors are appended at the end)
+        author_of = unseen_rows(authorships[['AuthorId', 'PaperId']], seen['author_of'])
+        write("rel_author_of.csv", author_of.copy())
+        write("rel_reviews.csv", review_rels(author_of.rename(columns={
+            'AuthorId': 'ReviewerID',
+            'PaperId': 'PaperID'
+        }), seed))
+
+        # Journal nodes
+        journal_papers = papers[papers['Type'] == 'journal'].copy()
+        journal_papers['Volume'] = journal_volumes(journal_papers['Volume'])
+        journal_df = unseen_rows(journal_papers[['Venue', 'Year', 'Volume']], seen['journals']).copy()
+        journal_df.insert(0, 'VenueID', [venue_id(journal_ids, venue) for venue in journal_df['Venue']])
+        write("nodes_journal.csv", journal_nodes(journal_df))
+        write("rel_published_in_journal.csv", pd.DataFrame({
+            'PaperID': journal_papers['PaperId'],
+            'JournalID': edition_ids([venue_id(journal_ids, venue) for venue in journal_papers['Venue']],
+                                     journal_papers['Year'], journal_papers['Volume']).to_numpy(),
+        }))
+
+        # CORRESPONDING_AUTHOR
+        corresponding = authorships[authorships['Main_Author'] == 1][['AuthorId', 'PaperId']]
+        write("rel_corresponding_author.csv", unseen_rows(corresponding, seen['corresponding']))
+
+        # ABOUT
+        write("rel_about.csv", pd.DataFrame({
+            'PaperID': papers['PaperId'],
+            'KeywordID': papers['FieldOfStudy'].map(keyword_ids),
+        }))
+
+        # RELATED
+        write("rel_related.csv", references[['PaperId', 'ReferenceId']].dropna())
+        print(f'Processed chunk {n_chunk + 1} ({len(seen["papers"])} papers so far)')
+
+    # Pick the same authors as main() does, reading them back from the written author nodes
+    outputs["nodes_authors.csv"].flush()
+    positions = pd.Series(np.arange(n_authors)).sample(n=5, random_state=42).tolist()
+    author_ids = {}
+    offset = 0
+    for chunk in pd.read_csv(os.path.join(data_dir, "nodes_authors.csv"), usecols=['AuthorID'],
+                             dtype={'AuthorID': str}, chunksize=chunk_size):
+        for position in positions:
+            if offset <= position < offset + len(chunk):
+                author_ids[position] = chunk['AuthorID'].iloc[position - offset]
+        offset += len(chunk)
+    repeat_authors = [author_ids[position] for position in positions]
+
+    extra_author_df = inject_authors(repeat_authors, list(conference_venues.values())[:2], lambda venue, year: pd.DataFrame(
+        {'PaperId': repeat_candidates.get((venue, year), [])}))
+    write("rel_author_of.csv", unseen_rows(extra_author_df, seen['author_of']))
+
+    for output in outputs.values():
+        output.close()
+
+
+# === LEGACY FILES ===
+# Files preprocessed before the venue editions had their own keys share one ConferenceID, WorkshopID or JournalID
+# between the editions of a venue, have no VenueID, and their PUBLISHED_IN files only name the venue. They are
+# converted in place without the raw harvest: a conference or workshop paper gets the edition main() draws for it
+# (from its PaperID), a journal paper the edition of its venue and year. The legacy files do not keep the volume of a
+# journal paper, so when its venue has several volumes that year one of them is drawn from the PaperID. The authors
+# injected into 4 editions of the same venue are injected again, into the new editions.
+
+def is_legacy(data_dir):
+    path = os.path.join(data_dir, "nodes_conference.csv")
+    return os.path.exists(path) and 'VenueID' not in pd.read_csv(path, nrows=0).columns
+
+def require_edition_keys(data_dir):
+    if is_legacy(data_dir):
+        raise ValueError(f'{data_dir} was preprocessed before the venue editions had their own keys, convert it '
+                         f'first: python data_preprocessing.py --data-dir {data_dir} --convert-legacy')
+
+def convert_legacy(data_dir='data', seed=SEED, formats=('csv',)):
+    if not is_legacy(data_dir):
+        print(f'{data_dir} already has edition keys')
+        return
+
+    def read(name):
+        return pd.read_csv(os.path.join(data_dir, name), dtype=str)
+
+    def write(name, frame):
+        frame[OUTPUT_COLUMNS[name]].to_csv(os.path.join(data_dir, name), index=False)
+
+    papers = read("nodes_papers.csv")
+    editions = {}
+    for kind, id_column, years in [('conference', 'ConferenceID', CONFERENCE_YEARS),
+                                   ('workshop', 'WorkshopID', WORKSHOP_YEARS)]:
+        # The legacy IDs are the venues factorized in the order main() factorizes them, so the VenueIDs are unchanged
+        venues = read(f"nodes_{kind}.csv").drop_duplicates(id_column)['Venue']
+        write(f"nodes_{kind}.csv", venue_editions(venues.unique(), years, id_column))
+        published_in = read(f"rel_published_in_{kind}.csv").rename(columns={id_column: 'VenueID'})
+        published_in['Year'] = seeded_choice(published_in['PaperID'], years, seed, f'{kind}_year').astype(int)
+        published_in[id_column] = edition_ids(published_in['VenueID'], published_in['Year']).to_numpy()
+        write(f"rel_published_in_{kind}.csv", published_in)
+        editions[kind] = published_in
+
+    journal_df = journal_nodes(read("nodes_journal.csv").rename(columns={'JournalID': 'VenueID'}))
+    write("nodes_journal.csv", journal_df)
+    published_in = read("rel_published_in_journal.csv").rename(columns={'JournalID': 'VenueID'}).reset_index()
+    candidates = published_in.merge(papers[['PaperID', 'Year']], on='PaperID', how='left').merge(
+        journal_df[['JournalID', 'VenueID', 'Year', 'Volume']], on=['VenueID', 'Year'])
+    candidates = candidates.sort_values(['index', 'Volume'], kind='stable')
+    counts = candidates.groupby('index')['JournalID'].transform('size').to_numpy().astype(np.uint64)
+    drawn = seeded_hashes(candidates['PaperID'], seed, 'journal_volume') % counts
+    chosen = candidates.groupby('index').cumcount().to_numpy() == drawn
+    write("rel_published_in_journal.csv", candidates[chosen])
+    print(f"{int((counts[chosen] > 1).sum())} journal papers had several volumes to choose from, "
+          f"{len(published_in) - int(chosen.sum())} have no edition")
+
+    # The injected rows are the tail of the file: the sampled authors on papers of the first two conference venues
+    author_of = read("rel_author_of.csv")
+    repeat_authors = read("nodes_authors.csv")['AuthorID'].sample(n=5, random_state=42).tolist()
+    conference_nodes = read("nodes_conference.csv")
+    repeat_venues = list(conference_nodes['Venue'].unique()[:2])
+    conference = editions['conference']
+    conference['Venue'] = conference['VenueID'].map(dict(zip(conference_nodes['VenueID'], conference_nodes['Venue'])))
+    repeat_papers = set(conference.loc[conference['Venue'].isin(repeat_venues), 'PaperID'])
+    injected = (author_of['AuthorID'].isin(repeat_authors) & author_of['PaperID'].isin(repeat_papers)).to_numpy()
+    tail = np.cumprod(injected[::-1])[::-1].astype(bool)
+    conference_papers = papers[['PaperID']].merge(conference, on='PaperID').rename(columns={'PaperID': 'PaperId'})
+    random.seed(seed)
+    extra_author_df = inject_authors(repeat_authors, repeat_venues, lambda venue, year: conference_papers[
+        (conference_papers['Venue'] == venue) & (conference_papers['Year'] == year)])
+    write("rel_author_of.csv", pd.concat([author_of[~tail], extra_author_df], ignore_index=True).drop_duplicates())
+    print(f"{int(tail.sum())} injected authorships replaced by {len(extra_author_df)}")
+
+    remove_stale_columnar(data_dir, formats)
+    write_columnar(data_dir, formats)
 
-    review_df.to_csv(os.path.join(DATA_DIR, "rel_reviews.csv"), index=False)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Transform the raw harvest into node and relationship csv files')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--raw-format', choices=['auto', 'jsonl', 'csv'], default='auto')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--streaming', action='store_true', help='Process the raw file in chunks with bounded memory')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Output files built concurrently by the in-memory mode (default: one per core)')
+    parser.add_argument('--formats', default='csv',
+                        help='Comma separated output formats: csv (always written), parquet, arrow')
+    parser.add_argument('--convert-legacy', action='store_true',
+                        help='Convert files preprocessed before the venue editions had their own keys, in place')
+    args = parser.parse_args()
+    if args.convert_legacy:
+        convert_legacy(args.data_dir, args.seed, tuple(args.formats.split(',')))
+    else:
+        main(args.data_dir, args.raw_format, args.seed, args.streaming, args.chunk_size, args.workers,
+             tuple(args.formats.split(',')))
@@ -0,0 +1,84 @@
+import argparse
+import hashlib
+import json
+from session_helper_neo4j import create_session, read_data_version, bump_data_version
+
+PREFIX = 'partd'
+
+# Named GDS projections kept in the catalog between runs. A projection is named after its spec (node labels and
+# relationship projections) and the data version of the graph, so algorithms that need the same subgraph share it,
+# and a projection is only rebuilt after a load changed the graph. Algorithms mutate their results into the
+# projection (then stream or write them), so a result also survives until the next load and is computed once.
+
+
+def digest(value):
+    return hashlib.md5(json.dumps(value, sort_keys=True).encode()).hexdigest()[:8]
+
+# Version of the part of the graph `spec` projects: the data version written by the loaders, and the node and
+# relationship counts of the count store (cheap), which catch writes that did not go through a loader
+def data_version(runner, spec):
+    version = read_data_version(runner) or bump_data_version(runner)
+    counts = [runner.run(f"MATCH (n:{label}) RETURN count(n) AS count").single()['count'] for label in spec['nodes']]
+    types = sorted({projection['type'] for projection in spec['relationships'].values()})
+    counts += [runner.run(f"MATCH ()-[r:{type_}]->() RETURN count(r) AS count").single()['count'] for type_ in types]
+    return digest([version, counts])
+
+def projection_names(runner, prefix):
+    return [record['graphName'] for record in runner.run(
+        "CALL gds.graph.list() YIELD graphName WHERE graphName STARTS WITH $prefix RETURN graphName",
+        prefix=f"{prefix}_")]
+
+def drop_projection(runner, name):
+    runner.run("CALL gds.graph.drop($graph, false) YIELD graphName RETURN graphName", graph=name).consume()
+
+# `runner` is a session or a transaction: the functions only run queries on it
+class ProjectionManager:
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+
+    # Name of the projection of `spec`, projected first if the catalog has none for the current data version.
+    # Projections of `spec` for older versions are dropped, they only hold heap.
+    def get(self, runner, spec):
+        key = f"{self.prefix}_{digest(spec)}"
+        name = f"{key}_{data_version(runner, spec)}"
+        if runner.run("CALL gds.graph.exists($graph) YIELD exists", graph=name).single()['exists']:
+            print(f"Reusing the projection {name}")
+            return name
+        for stale in projection_names(runner, key):
+            print(f"Dropping the stale projection {stale}")
+            drop_projection(runner, stale)
+        print(f"Projecting {name}")
+        runner.run("CALL gds.graph.project($graph, $nodes, $relationships)",
+                   graph=name, nodes=spec['nodes'], relationships=spec['relationships']).consume()
+        return name
+
+    def schema(self, runner, name):
+        return runner.run("CALL gds.graph.list($graph) YIELD schemaWithOrientation",
+                          graph=name).single()['schemaWithOrientation']
+
+    # Whether an algorithm already mutated `property` into the nodes of `label` of the projection
+    def has_node_property(self, runner, name, label, property_):
+        return property_ in self.schema(runner, name)['nodes'].get(label, {})
+
+    def has_relationship_type(self, runner, name, type_):
+        return type_ in self.schema(runner, name)['relationships']
+
+    def drop_all(self, runner):
+        names = projection_names(runner, self.prefix)
+        for name in names:
+            drop_projection(runner, name)
+        print(f"Dropped {len(names)} projections")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List or drop the cached GDS projections')
+    parser.add_argument('--prefix', default=PREFIX, help='Name prefix of the projections')
+    parser.add_argument('--drop', action='store_true', help='Drop them to free the heap they hold')
+    args = parser.parse_args()
+    session = create_session()
+    if args.drop:
+        ProjectionManager(args.prefix).drop_all(session)
+    else:
+        for name in projection_names(session, args.prefix):
+            print(name)
+    session.close()
@@ -0,0 +1,308 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import analytics_engine as ae
+
+DATA_DIR = 'data'
+ALGORITHMS = ('similarity', 'betweenness', 'pagerank')
+# Defaults of gds.pageRank
+DAMPING = 0.85
+MAX_ITERATIONS = 20
+TOLERANCE = 1e-7
+# Defaults of gds.nodeSimilarity
+TOP_K = 10
+SIMILARITY_CUTOFF = 1e-42
+# Source papers whose similarities are computed at a time (memory is about their shared-keyword pairs)
+SIMILARITY_BATCH = 1000
+SEED = 42
+WRITE_BATCH_SIZE = 10000
+
+# The PartD algorithms without the Graph Data Science library, on the CSR arrays of analytics_engine built from the
+# preprocessed files: PageRank on the RELATED graph, betweenness on the undirected RELATED graph (exact, or estimated
+# from a sample of pivots for large graphs) and Jaccard similarity of the papers over their keywords. They follow the
+# GDS definitions and defaults, so the scores can be compared with gds.*.stream, and can be written back to Neo4j in
+# batches (pagerank and betweenness properties, SIMILAR relationships).
+
+# === GRAPHS ===
+
+class PaperGraph:
+    def __init__(self, data_dir=DATA_DIR):
+        ae.dp.require_edition_keys(data_dir)
+        papers = ae.read_nodes(data_dir, 'nodes_papers.csv', 'PaperID', ['Title'])
+        keywords = ae.read_nodes(data_dir, 'nodes_keywords.csv', 'KeywordID', [])
+        self.paper_ids = papers['PaperID'].to_numpy()
+        self.titles = papers['Title'].to_numpy()
+        self.cites = ae.read_relationships(data_dir, 'rel_related.csv', 'PaperID', 'RelatedToPaperID',
+                                           self.paper_ids, self.paper_ids)
+        self.keywords = ae.read_relationships(data_dir, 'rel_about.csv', 'PaperID', 'KeywordID', self.paper_ids,
+                                              keywords['KeywordID'].to_numpy())
+        self.keyword_count = len(keywords)
+
+# Both directions of every relationship, like an UNDIRECTED projection (parallel relationships are kept)
+def undirected(csr):
+    rows = csr.rows()
+    return ae.CSR(np.concatenate([rows, csr.indices]), np.concatenate([csr.indices, rows]), csr.n)
+
+# Distinct targets of every source (the neighbour sets)
+def distinct(csr):
+    pairs = np.unique(ae.pack(csr.rows(), csr.indices, bits=31))
+    return ae.CSR(pairs >> 31, pairs & ((1 << 31) - 1), csr.n)
+
+
+# === PAGERANK ===
+
+# Power iteration of gds.pageRank: score = (1 - damping) + damping * sum(score of u / out-degree of u) over the
+# in-neighbours u, from 1 - damping, until no score changes by more than `tolerance`. Like GDS the scores are not
+# normalized and dangling nodes do not redistribute their score. Returns the scores and the iterations ran.
+def pagerank(csr, damping=DAMPING, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    out_degrees = csr.degrees()
+    sources = csr.rows()
+    scores = np.full(csr.n, 1 - damping)
+    for iteration in range(1, max_iterations + 1):
+        shares = np.divide(scores, out_degrees, out=np.zeros(csr.n), where=out_degrees > 0)
+        updated = (1 - damping) + damping * np.bincount(csr.indices, weights=shares[sources], minlength=csr.n)
+        delta = np.abs(updated - scores).max() if csr.n else 0
+        scores = updated
+        if delta < tolerance:
+            break
+    return scores, iteration
+
+
+# === BETWEENNESS ===
+
+# Dependencies of every node on the shortest paths from `source` (Brandes): a breadth-first search level by level,
+# then the dependencies accumulated from the deepest level back. Every level is one vectorized step over its edges.
+def dependencies(csr, source):
+    distance = np.full(csr.n, -1, dtype=np.int64)
+    paths = np.zeros(csr.n)
+    distance[source] = 0
+    paths[source] = 1
+    frontier = np.array([source])
+    levels = []
+    depth = 0
+    while len(frontier):
+        which, targets = csr.expand(frontier)
+        unseen = targets[distance[targets] < 0]
+        distance[unseen] = depth + 1
+        # Edges to the next level, along which the shortest paths continue
+        forward = distance[targets] == depth + 1
+        parents, children = frontier[which[forward]], targets[forward]
+        paths += np.bincount(children, weights=paths[parents], minlength=csr.n)
+        levels.append((parents, children))
+        frontier = np.unique(unseen)
+        depth += 1
+    dependency = np.zeros(csr.n)
+    for parents, children in reversed(levels):
+        dependency += np.bincount(parents, weights=paths[parents] / paths[children] * (1 + dependency[children]),
+                                  minlength=csr.n)
+    dependency[source] = 0
+    return dependency
+
+# Betweenness centrality of every node. With `pivots`, only the shortest paths from that many random sources are
+# followed and the sums are scaled by n / pivots, an unbiased estimate of the exact scores for a fraction of the cost.
+# Like gds.betweenness, the scores of an undirected graph are halved (every path is followed from both ends).
+def betweenness(csr, pivots=None, seed=SEED, undirected_graph=True):
+    sources = np.arange(csr.n)
+    scale = 1.0
+    if pivots is not None and pivots < csr.n:
+        sources = np.sort(np.random.default_rng(seed).choice(csr.n, size=pivots, replace=False))
+        scale = csr.n / pivots
+    scores = np.zeros(csr.n)
+    for source in sources:
+        scores += dependencies(csr, source)
+    return scores * scale / (2 if undirected_graph else 1)
+
+
+# === NODE SIMILARITY ===
+
+# Jaccard similarity |N(a) & N(b)| / |N(a) | N(b)| of the sources of `csr` over their targets (papers over their
+# keywords), like gds.nodeSimilarity: only pairs sharing a target are compared, scores below `cutoff` are dropped and
+# every source keeps its `top_k` most similar nodes (ties on the lower index). Returns (sources, targets, scores),
+# each pair once per direction where it is in the top k of its source.
+def jaccard_similarity(csr, top_k=TOP_K, cutoff=SIMILARITY_CUTOFF, batch_size=SIMILARITY_BATCH):
+    csr = distinct(csr)
+    degrees = csr.degrees()
+    inverse = csr.transpose(int(csr.indices.max()) + 1 if len(csr.indices) else 0)
+    results = []
+    for first in range(0, csr.n, batch_size):
+        batch = np.arange(first, min(first + batch_size, csr.n))
+        batch = batch[degrees[batch] > 0]
+        which, targets = csr.expand(batch)
+        others_which, others = inverse.expand(targets)
+        sources = batch[which[others_which]]
+        keep = sources != others
+        pairs, shared = np.unique(ae.pack(sources[keep], others[keep], bits=31), return_counts=True)
+        sources, others = pairs >> 31, pairs & ((1 << 31) - 1)
+        scores = shared / (degrees[sources] + degrees[others] - shared)
+        keep = scores >= cutoff
+        sources, others, scores = sources[keep], others[keep], scores[keep]
+        order = np.lexsort((others, -scores, sources))
+        sources, others, scores = sources[order], others[order], scores[order]
+        first_of = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]]) if len(sources) else np.zeros(0, int)
+        rank = np.arange(len(sources)) - np.repeat(first_of, np.diff(np.r_[first_of, len(sources)]))
+        top = rank < top_k
+        results.append((sources[top], others[top], scores[top]))
+    if not results:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+# === WRITE-BACK ===
+
+def write_rows(tx, query, rows):
+    tx.run(query, rows=rows)
+
+# Sets `prop` on the papers, `batch_size` papers per transaction
+def write_paper_property(session, paper_ids, values, prop, batch_size=WRITE_BATCH_SIZE):
+    query = f"UNWIND $rows AS row MATCH (p:Paper {{PaperID: row.id}}) SET p.{prop} = row.value"
+    for first in range(0, len(paper_ids), batch_size):
+        rows = [{'id': paper_id, 'value': float(value)}
+                for paper_id, value in zip(paper_ids[first:first + batch_size], values[first:first + batch_size])]
+        session.execute_write(write_rows, query, rows)
+
+# Replaces the SIMILAR relationships by the given pairs, `batch_size` per transaction
+def write_similar(session, paper_ids, sources, targets, scores, batch_size=WRITE_BATCH_SIZE):
+    from session_helper_neo4j import clean_session
+    clean_session(session, rel_types=['SIMILAR'])
+    query = """
+        UNWIND $rows AS row
+        MATCH (p1:Paper {PaperID: row.source})
+        MATCH (p2:Paper {PaperID: row.target})
+        CREATE (p1)-[:SIMILAR {score: row.score}]->(p2)
+    """
+    for first in range(0, len(sources), batch_size):
+        rows = [{'source': paper_ids[source], 'target': paper_ids[target], 'score': float(score)}
+                for source, target, score in zip(sources[first:first + batch_size], targets[first:first + batch_size],
+                                                 scores[first:first + batch_size])]
+        session.execute_write(write_rows, query, rows)
+
+
+# === COMPARISON WITH GDS ===
+
+def gds_version(session):
+    from neo4j.exceptions import ClientError
+    try:
+        return session.run("RETURN gds.version() AS version").single()['version']
+    except ClientError:
+        return None
+
+def gds_scores(session, algorithm):
+    graph = 'localComparison'
+    session.run(f"CALL gds.graph.drop('{graph}', false)")
+    orientation = 'NATURAL' if algorithm == 'pageRank' else 'UNDIRECTED'
+    session.run(f"CALL gds.graph.project('{graph}', 'Paper', {{RELATED: {{orientation: '{orientation}'}}}})")
+    records = session.run(f"""
+        CALL gds.{algorithm}.stream('{graph}') YIELD nodeId, score
+        RETURN gds.util.asNode(nodeId).PaperID AS id, score
+    """).data()
+    session.run(f"CALL gds.graph.drop('{graph}', false)")
+    return pd.Series({record['id']: record['score'] for record in records})
+
+def gds_similarities(session):
+    graph = 'localComparison'
+    session.run(f"CALL gds.graph.drop('{graph}', false)")
+    session.run(f"CALL gds.graph.project('{graph}', ['Paper', 'Keyword'], {{ABOUT: {{orientation: 'UNDIRECTED'}}}})")
+    records = session.run(f"""
+        CALL gds.nodeSimilarity.stream('{graph}') YIELD node1, node2, similarity
+        WITH gds.util.asNode(node1) AS p1, gds.util.asNode(node2) AS p2, similarity
+        WHERE p1:Paper AND p2:Paper
+        RETURN p1.PaperID AS source, p2.PaperID AS target, similarity
+    """).data()
+    session.run(f"CALL gds.graph.drop('{graph}', false)")
+    return records
+
+# Largest difference of the scores and overlap of the top 10 papers
+def score_agreement(local, reference):
+    local = local.reindex(reference.index)
+    top_local = set(local.sort_values(ascending=False).index[:10])
+    top_reference = set(reference.sort_values(ascending=False).index[:10])
+    return float((local - reference).abs().max()), len(top_local & top_reference)
+
+# Runs the GDS versions on the loaded graph (loaded from the same files) and prints how close the local results are
+def compare_with_gds(session, graph, results):
+    if gds_version(session) is None:
+        print("The Graph Data Science library is not installed, nothing to compare with.")
+        return
+    for name, algorithm in (('pagerank', 'pageRank'), ('betweenness', 'betweenness')):
+        if name in results:
+            local = pd.Series(results[name], index=graph.paper_ids)
+            difference, overlap = score_agreement(local, gds_scores(session, algorithm))
+            print(f"  {name}: largest score difference {difference:.6f}, top 10 overlap {overlap}/10")
+    if 'similarity' in results:
+        sources, targets, scores = results['similarity']
+        local = {(graph.paper_ids[s], graph.paper_ids[t]): score for s, t, score in zip(sources, targets, scores)}
+        reference = {(r['source'], r['target']): r['similarity'] for r in gds_similarities(session)}
+        common = local.keys() & reference.keys()
+        difference = max((abs(local[pair] - reference[pair]) for pair in common), default=0.0)
+        print(f"  similarity: {len(common)} of {len(reference)} GDS pairs found, largest score difference "
+              f"{difference:.6f} (pairs tied at the top k can differ)")
+
+
+def print_top(title, graph, scores):
+    print(f"\n--- {title} ---")
+    for index in np.lexsort((graph.titles.astype(str), -scores))[:5]:
+        print(f"  {scores[index]:12.6f}  {graph.titles[index]}")
+
+def main(data_dir=DATA_DIR, algorithms=ALGORITHMS, pivots=None, top_k=TOP_K, cutoff=SIMILARITY_CUTOFF, write=False,
+         compare=False, seed=SEED, batch_size=WRITE_BATCH_SIZE):
+    start = time.time()
+    graph = PaperGraph(data_dir)
+    print(f"Graph of {data_dir} read in {time.time() - start:.1f}s: {len(graph.paper_ids)} papers, "
+          f"{len(graph.cites.indices)} citations, {len(graph.keywords.indices)} keyword links")
+    results = {}
+    if 'similarity' in algorithms:
+        start = time.time()
+        sources, targets, scores = results['similarity'] = jaccard_similarity(graph.keywords, top_k, cutoff)
+        print(f"\n--- Node similarity: {len(sources)} pairs in {time.time() - start:.1f}s ---")
+        for index in np.lexsort((sources, -scores))[:5]:
+            print(f"  {scores[index]:.3f}  {graph.titles[sources[index]]} / {graph.titles[targets[index]]}")
+    if 'betweenness' in algorithms:
+        start = time.time()
+        results['betweenness'] = betweenness(undirected(graph.cites), pivots, seed)
+        print_top(f"Betweenness ({pivots or 'all'} pivots) in {time.time() - start:.1f}s", graph,
+                  results['betweenness'])
+    if 'pagerank' in algorithms:
+        start = time.time()
+        results['pagerank'], iterations = pagerank(graph.cites)
+        print_top(f"PageRank ({iterations} iterations) in {time.time() - start:.2f}s", graph, results['pagerank'])
+
+    if write or compare:
+        from session_helper_neo4j import session_scope
+        with session_scope() as session:
+            if write:
+                print("\nWriting the results...")
+                for name in ('betweenness', 'pagerank'):
+                    if name in results:
+                        write_paper_property(session, graph.paper_ids, results[name], name, batch_size)
+                if 'similarity' in results:
+                    write_similar(session, graph.paper_ids, *results['similarity'], batch_size)
+            if compare:
+                print("\nComparing with GDS...")
+                compare_with_gds(session, graph, results)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PageRank, betweenness and node similarity of the preprocessed '
+                                                 'files, without the Graph Data Science library')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of the preprocessed files')
+    parser.add_argument('--algorithms', default=','.join(ALGORITHMS),
+                        help=f'Comma separated algorithms among {", ".join(ALGORITHMS)}')
+    parser.add_argument('--pivots', type=int, default=None,
+                        help='Estimate betweenness from this many random sources instead of all of them')
+    parser.add_argument('--top-k', type=int, default=TOP_K, help='Most similar papers kept per paper')
+    parser.add_argument('--similarity-cutoff', type=float, default=SIMILARITY_CUTOFF,
+                        help='Lowest similarity kept')
+    parser.add_argument('--seed', type=int, default=SEED, help='Seed of the betweenness pivots')
+    parser.add_argument('--write', action='store_true',
+                        help='Write the pagerank and betweenness properties and the SIMILAR relationships to Neo4j')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare with the GDS algorithms on the loaded graph (needs GDS)')
+    parser.add_argument('--batch-size', type=int, default=WRITE_BATCH_SIZE, help='Rows written per transaction')
+    args = parser.parse_args()
+    algorithms = args.algorithms.split(',')
+    unknown = set(algorithms) - set(ALGORITHMS)
+    if unknown:
+        parser.error(f"unknown algorithms: {', '.join(sorted(unknown))}")
+    main(args.data_dir, algorithms, args.pivots, args.top_k, args.similarity_cutoff, args.write, args.compare,
+         args.seed, args.batch_size)
@@ -1,9 +1,87 @@
-from session_helper_neo4j import create_session, clean_session
+import argparse
+import csv
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import pandas as pd
+from neo4j.exceptions import TransientError
+import citation_metrics_neo4j as cm
+import data_preprocessing as dp
+from session_helper_neo4j import create_session, clean_session, session_scope, SessionPool
 
-def load_node_papers(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/nodes_papers.csv' AS line
+# Uniqueness constraints (each one is backed by an index) on the node keys used by the relationship loaders
+CONSTRAINTS = {
+    'paper_id': ('Paper', 'PaperID'),
+    'author_id': ('Author', 'AuthorID'),
+    'keyword_id': ('Keyword', 'KeywordID'),
+    # Venue editions are keyed on the venue and the year (and volume), e.g. ConferenceID '3-2021'
+    'conference_edition_id': ('Conference', 'ConferenceID'),
+    'workshop_edition_id': ('Workshop', 'WorkshopID'),
+    'journal_edition_id': ('Journal', 'JournalID'),
+}
+
+# VenueID is shared by all the editions of a venue, so it gets plain indexes
+INDEXES = {
+    'conference_venue_id': ('Conference', 'VenueID'),
+    'workshop_venue_id': ('Workshop', 'VenueID'),
+    'journal_venue_id': ('Journal', 'VenueID'),
+    # Sorts of the precomputed citation metrics (citation_metrics_neo4j)
+    'paper_citation_count': ('Paper', 'citationCount'),
+    'author_h_index': ('Author', 'hIndex'),
+}
+
+# Plain indexes on the edition keys from before they were unique, replaced by the constraints
+LEGACY_INDEXES = ['conference_id', 'workshop_id', 'journal_id']
+
+INDEX_TIMEOUT = 600
+
+# Path of the csv files for LOAD CSV (the server's import directory) and the local directory read in unwind mode
+IMPORT_URL = 'file:///data/'
+DATA_DIR = 'data'
+
+# single: one transaction per file, transactions: CALL { } IN TRANSACTIONS on the server, unwind: batches of rows
+# streamed by the driver over a pool of sessions
+LOAD_MODES = ('single', 'transactions', 'unwind')
+LOAD_MODE = 'transactions'
+BATCH_SIZE = 10000
+SESSIONS = 4
+PROGRESS_INTERVAL = 5
+
+# Relationship files loaded at the same time once the nodes are in
+PARALLEL_FILES = 4
+# In unwind mode, relationship files with at least PARTITION_MIN_ROWS rows are split in PARTITIONS by source node
+PARTITIONS = 16
+PARTITION_MIN_ROWS = 100000
+# Attempts of a transactions mode load that fails on a transient error (e.g. a deadlock with a concurrent file)
+LOAD_RETRIES = 5
+
+def create_constraints(session):
+    # A uniqueness constraint cannot be created while an index exists on the same label and property
+    for name in LEGACY_INDEXES:
+        session.run(f"DROP INDEX {name} IF EXISTS")
+    for name, (label, prop) in CONSTRAINTS.items():
+        session.run(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE")
+
+def create_indexes(session):
+    for name, (label, prop) in INDEXES.items():
+        session.run(f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})")
+
+# Waits until every index (including the ones backing the constraints) is online
+def await_indexes(session):
+    session.run("CALL db.awaitIndexes($timeout)", timeout=INDEX_TIMEOUT)
+
+# Drops the constraints and indexes created by this loader, used to measure the load without them
+def drop_schema(session):
+    for name in CONSTRAINTS:
+        session.run(f"DROP CONSTRAINT {name} IF EXISTS")
+    for name in list(INDEXES) + LEGACY_INDEXES:
+        session.run(f"DROP INDEX {name} IF EXISTS")
+
+# Every file is loaded with the same Cypher, applied to each csv row `line`: first the nodes, then the relationships
+NODE_FILES = [
+    ('nodes_papers.csv', """
         CREATE (:Paper {
             PaperID: line.PaperID,
             Title: line.Title,
@@ -11,175 +89,681 @@ def load_node_papers(session):
             Abstract: line.Abstract,
             DOI: line.DOI
         })
-        """
-    )
-
-def load_node_authors(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/nodes_authors.csv' AS line
-        CREATE (:Author {
-            AuthorID: line.AuthorID,
-            Name: line.Name
-        })
-        """
-    )
-
-def load_node_keywords(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/nodes_keywords.csv' AS line
+    """),
+    ('nodes_authors.csv', """
+        WITH line WHERE line.AuthorID IS NOT NULL
+        MERGE (a:Author {AuthorID: line.AuthorID})
+        ON CREATE SET a.Name = line.Name
+    """),
+    ('nodes_keywords.csv', """
         CREATE (:Keyword {
             KeywordID: line.KeywordID,
             Keyword: line.Keyword
         })
-        """
-    )
-
-def load_node_conferences(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/nodes_conference.csv' AS line
+    """),
+    ('nodes_conference.csv', """
         CREATE (:Conference {
             ConferenceID: line.ConferenceID,
+            VenueID: line.VenueID,
             Venue: line.Venue,
             Year: toInteger(line.Year)
         })
-        """
-    )
-
-def load_node_journals(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/nodes_journal.csv' AS line
+    """),
+    ('nodes_journal.csv', """
         CREATE (:Journal {
             JournalID: line.JournalID,
+            VenueID: line.VenueID,
             Venue: line.Venue,
             Year: toInteger(line.Year),
             Volume: toInteger(line.Volume)
         })
-        """
-    )
-
-def load_node_workshops(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/nodes_workshop.csv' AS line
+    """),
+    ('nodes_workshop.csv', """
         CREATE (:Workshop {
             WorkshopID: line.WorkshopID,
+            VenueID: line.VenueID,
             Venue: line.Venue,
             Year: toInteger(line.Year)
         })
-        """
-    )
+    """),
+]
 
-def load_rel_author_of(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_author_of.csv' AS line
+REL_FILES = [
+    ('rel_author_of.csv', """
         MATCH (a:Author {AuthorID: line.AuthorID})
         MATCH (p:Paper {PaperID: line.PaperID})
         CREATE (a)-[:AUTHOR_OF]->(p)
-        """
-    )
-
-def load_rel_corresponding_author(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_corresponding_author.csv' AS line
+    """),
+    ('rel_corresponding_author.csv', """
         MATCH (a:Author {AuthorID: line.AuthorID})
         MATCH (p:Paper {PaperID: line.PaperID})
         CREATE (a)-[:CORRESPONDING_AUTHOR]->(p)
-        """
-    )
-
-def load_rel_about(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_about.csv' AS line
+    """),
+    ('rel_about.csv', """
         MATCH (p:Paper {PaperID: line.PaperID})
         MATCH (k:Keyword {KeywordID: line.KeywordID})
         CREATE (p)-[:ABOUT]->(k)
-        """
-    )
-
-def load_rel_related(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_related.csv' AS line
+    """),
+    ('rel_related.csv', """
         MATCH (p1:Paper {PaperID: line.PaperID})
         MATCH (p2:Paper {PaperID: line.RelatedToPaperID})
         CREATE (p1)-[:RELATED]->(p2)
-        """
-    )
-
-def load_rel_published_in_conference(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_published_in_conference.csv' AS line
+    """),
+    ('rel_published_in_conference.csv', """
         MATCH (p:Paper {PaperID: line.PaperID})
         MATCH (c:Conference {ConferenceID: line.ConferenceID})
         CREATE (p)-[:PUBLISHED_IN]->(c)
-        """
-    )
-
-def load_rel_published_in_journal(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_published_in_journal.csv' AS line
+    """),
+    ('rel_published_in_journal.csv', """
         MATCH (p:Paper {PaperID: line.PaperID})
         MATCH (j:Journal {JournalID: line.JournalID})
         CREATE (p)-[:PUBLISHED_IN]->(j)
-        """
-    )
-
-def load_rel_published_in_workshop(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_published_in_workshop.csv' AS line
+    """),
+    ('rel_published_in_workshop.csv', """
         MATCH (p:Paper {PaperID: line.PaperID})
         MATCH (w:Workshop {WorkshopID: line.WorkshopID})
         CREATE (p)-[:PUBLISHED_IN]->(w)
-        """
-    )
-
-def load_rel_reviews(session):
-    session.run(
-        """
-        LOAD CSV WITH HEADERS FROM 'file:///data/rel_reviews.csv' AS line
+    """),
+    ('rel_reviews.csv', """
         MATCH (a:Author {AuthorID: line.ReviewerID})
         MATCH (p:Paper {PaperID: line.PaperID})
         CREATE (a)-[:REVIEWS {
             Comment: line.Comment,
             Score: toInteger(line.Score)
         }]->(p)
+    """),
+]
+
+# === PROGRESS ===
+# The progress of each file is committed in the same transaction as the rows it counts, so after a failure the load
+# resumes right after the last committed batch. In transactions mode it is the line reached, kept on the file's
+# (:LoadProgress) node. In unwind mode batches commit out of order, so every committed batch gets its own (:LoadBatch)
+# marker. The markers are removed once everything is loaded.
+
+def read_progress(session, file, mode, batch_size):
+    record = session.run(
         """
-    )
+        MERGE (m:LoadProgress {File: $file})
+        ON CREATE SET m.Mode = $mode, m.BatchSize = $batch_size, m.Position = 0, m.Done = false
+        WITH m
+        OPTIONAL MATCH (b:LoadBatch {File: $file})
+        RETURN m.Mode AS mode, m.BatchSize AS batch_size, m.Position AS position, m.Done AS done,
+               collect(b.Batch) AS batches
+        """, file=file, mode=mode, batch_size=batch_size).single()
+    partial = not record['done'] and (record['position'] > 0 or len(record['batches']) > 0)
+    if partial and (record['mode'] != mode or (mode == 'unwind' and record['batch_size'] != batch_size)):
+        raise ValueError(f"{file} was partially loaded in {record['mode']} mode with batches of "
+                         f"{record['batch_size']} rows, resume it with the same --mode and --batch-size")
+    if not partial:
+        session.run("MATCH (m:LoadProgress {File: $file}) SET m.Mode = $mode, m.BatchSize = $batch_size",
+                    file=file, mode=mode, batch_size=batch_size)
+    return record['position'], set(record['batches']), record['done']
 
-def main():
+def mark_done(session, file):
+    session.run("MATCH (m:LoadProgress {File: $file}) SET m.Done = true", file=file)
+    session.run("MATCH (b:LoadBatch {File: $file}) DELETE b", file=file)
+
+def clear_progress(session):
+    session.run("MATCH (m) WHERE m:LoadProgress OR m:LoadBatch DELETE m")
+
+# === LOADING MODES ===
+
+# The whole file in one LOAD CSV transaction
+def load_single(session, file, body):
+    return session.run(
+        f"""
+        LOAD CSV WITH HEADERS FROM $url AS line
+        CALL {{ WITH line {body} }}
+        WITH count(*) AS rows
+        MATCH (m:LoadProgress {{File: $file}})
+        SET m.Done = true
+        RETURN rows
+        """, url=IMPORT_URL + file, file=file).single()['rows']
+
+# LOAD CSV committing every `batch_size` rows on the server. Must run in an auto-commit transaction (session.run).
+def load_transactions(session, file, body, batch_size, position):
+    return session.run(
+        f"""
+        MATCH (m:LoadProgress {{File: $file}})
+        LOAD CSV WITH HEADERS FROM $url AS line
+        WITH m, line, linenumber() AS position
+        WHERE position > $position
+        CALL {{
+            WITH m, line, position
+            CALL {{ WITH line {body} }}
+            SET m.Position = position
+        }} IN TRANSACTIONS OF $batch_size ROWS
+        RETURN count(*) AS rows
+        """, url=IMPORT_URL + file, file=file, position=position, batch_size=batch_size).single()['rows']
+
+# One batch of rows sent by the driver, committed with its (:LoadBatch) marker
+def load_batch(session, file, body, rows, batch):
+    session.run(
+        f"""
+        UNWIND $rows AS line
+        CALL {{ WITH line {body} }}
+        WITH count(*) AS rows
+        CREATE (:LoadBatch {{File: $file, Batch: $batch}})
+        """, rows=rows, file=file, batch=batch)
+    return len(rows)
+
+# Rows of a local csv file as dicts, empty fields become nulls like in LOAD CSV
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {key: (value if value != '' else None) for key, value in row.items()}
+
+# Batches of rows (lists of dicts) of an output file. A DataFrame given in `frames` is used as is, otherwise the typed
+# arrow/parquet copy of the file is read when it exists, and the csv file when it does not.
+def iter_batches(file, batch_size, data_dir, frames):
+    if frames is not None and file in frames:
+        frame = frames[file].astype(object)
+        frame = frame.where(frame.notna(), None)
+        for i in range(0, len(frame), batch_size):
+            yield frame.iloc[i:i + batch_size].to_dict('records')
+        return
+    base = os.path.join(data_dir, os.path.splitext(file)[0])
+    if dp.pa is not None and (os.path.exists(base + '.arrow') or os.path.exists(base + '.parquet')):
+        table = dp.read_table(data_dir, file)
+        for i in range(0, table.num_rows, batch_size):
+            yield table.slice(i, batch_size).to_pylist()
+        return
+    rows = read_rows(os.path.join(data_dir, file))
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+# Splits a relationship frame in PARTITIONS queues of (batch, rows) by a hash of its source node ID (first column).
+# The rows are only turned into dicts when their batch is sent.
+def partition_batches(frame, batch_size):
+    frame = frame.astype(object)
+    frame = frame.where(frame.notna(), None)
+    partitions = pd.util.hash_pandas_object(frame.iloc[:, 0].astype(str), index=False).to_numpy() % PARTITIONS
+    queues = []
+    batch = 0
+    for partition in range(PARTITIONS):
+        rows = frame[partitions == partition]
+        queue = deque()
+        for i in range(0, len(rows), batch_size):
+            queue.append((batch, rows.iloc[i:i + batch_size]))
+            batch += 1
+        queues.append(queue)
+    return queues
+
+# Loads the partitions concurrently with at most one batch of each partition in flight, so concurrent transactions
+# never lock the same source nodes
+def load_partitioned(pool, file, body, frame, batch_size, done_batches):
+    queues = partition_batches(frame, batch_size)
+    running = {}
+    loaded = 0
+    start = last_report = time.time()
+    while running or any(queues):
+        busy = set(running.values())
+        for partition, queue in enumerate(queues):
+            while queue and queue[0][0] in done_batches:
+                queue.popleft()
+            if queue and partition not in busy and len(running) < 2 * pool.size:
+                batch, rows = queue.popleft()
+                running[pool.submit_write(load_batch, file, body, rows.to_dict('records'), batch)] = partition
+        if not running:
+            break
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            del running[future]
+            loaded += future.result()
+        if time.time() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.time()
+            print(f"  {file}: {loaded} rows ({loaded / (last_report - start):.0f} rows/s)")
+    return loaded
+
+# Streams the batches of a file over the Bolt driver, keeping up to two batches per session of the pool in flight.
+# Nothing has to be in the server's import directory.
+def load_unwind(pool, file, body, batch_size, done_batches, data_dir, frames):
+    if file.startswith('rel_') and pool.size > 1:
+        frame = frames[file] if frames is not None and file in frames else dp.read_frame(data_dir, file)
+        if len(frame) >= PARTITION_MIN_ROWS:
+            return load_partitioned(pool, file, body, frame, batch_size, done_batches)
+        frames = dict(frames or {}, **{file: frame})
+    loaded = 0
+    pending = set()
+    start = last_report = time.time()
+    for batch, rows in enumerate(iter_batches(file, batch_size, data_dir, frames)):
+        if batch in done_batches:
+            continue
+        if len(pending) >= 2 * pool.size:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            loaded += sum(future.result() for future in finished)
+            if time.time() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.time()
+                print(f"  {file}: {loaded} rows ({loaded / (last_report - start):.0f} rows/s)")
+        pending.add(pool.submit_write(load_batch, file, body, rows, batch))
+    for future in pending:
+        loaded += future.result()
+    return loaded
+
+# Loads one file in `mode` and returns the number of rows loaded (0 when a resumed load had already finished it)
+def load_file(session, pool, file, body, mode, batch_size, data_dir, frames):
+    position, done_batches, done = session.execute_write(read_progress, file, mode, batch_size)
+    if done:
+        print(f"  {file}: already loaded, skipping")
+        return 0
+    start = time.time()
+    if mode == 'single':
+        rows = session.execute_write(load_single, file, body)
+    elif mode == 'transactions':
+        rows = 0
+        for attempt in range(LOAD_RETRIES):
+            try:
+                rows += load_transactions(session, file, body, batch_size, position)
+                break
+            except TransientError as e:
+                if attempt == LOAD_RETRIES - 1:
+                    raise
+                # The committed batches are kept, continue after the last one
+                print(f"  {file}: {e.code}, retrying from the last committed batch")
+                position = session.execute_write(read_progress, file, mode, batch_size)[0]
+    else:
+        rows = load_unwind(pool, file, body, batch_size, done_batches, data_dir, frames)
+    session.execute_write(mark_done, file)
+    elapsed = time.time() - start
+    print(f"  {file}: {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+    return rows
+
+# Loads `files` on up to `parallel` sessions at once, the largest files first
+def load_files_parallel(pool, files, mode, batch_size, data_dir, frames, parallel):
+    def size(file):
+        if frames is not None and file in frames:
+            return len(frames[file])
+        path = os.path.join(data_dir, file)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def load(file, body):
+        with session_scope() as session:
+            load_file(session, pool, file, body, mode, batch_size, data_dir, frames)
+
+    files = sorted(files, key=lambda spec: size(spec[0]), reverse=True)
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [executor.submit(load, file, body) for file, body in files]
+        for future in futures:
+            future.result()
+
+# === DELTA LOADING ===
+# A manifest keeps the key and a hash of the content of every row loaded from each file. A delta load compares the new
+# files with it, MERGEs the new and changed rows and deletes the rows whose key is gone. All the statements are
+# idempotent, so a delta that fails halfway is simply run again.
+
+MANIFEST_DIR = os.path.join('data', 'load_manifest')
+
+# file -> (key columns, upsert, delete), applied to each csv row `line`
+DELTA_NODES = {
+    'nodes_papers.csv': (['PaperID'], """
+        MERGE (p:Paper {PaperID: line.PaperID})
+        SET p.Title = line.Title, p.Year = toInteger(line.Year), p.Abstract = line.Abstract, p.DOI = line.DOI
+    """, """
+        MATCH (p:Paper {PaperID: line.PaperID}) DETACH DELETE p
+    """),
+    'nodes_authors.csv': (['AuthorID'], """
+        MERGE (a:Author {AuthorID: line.AuthorID})
+        SET a.Name = line.Name
+    """, """
+        MATCH (a:Author {AuthorID: line.AuthorID}) DETACH DELETE a
+    """),
+    'nodes_keywords.csv': (['KeywordID'], """
+        MERGE (k:Keyword {KeywordID: line.KeywordID})
+        SET k.Keyword = line.Keyword
+    """, """
+        MATCH (k:Keyword {KeywordID: line.KeywordID}) DETACH DELETE k
+    """),
+    'nodes_conference.csv': (['ConferenceID'], """
+        MERGE (c:Conference {ConferenceID: line.ConferenceID})
+        SET c.VenueID = line.VenueID, c.Venue = line.Venue, c.Year = toInteger(line.Year)
+    """, """
+        MATCH (c:Conference {ConferenceID: line.ConferenceID}) DETACH DELETE c
+    """),
+    'nodes_journal.csv': (['JournalID'], """
+        MERGE (j:Journal {JournalID: line.JournalID})
+        SET j.VenueID = line.VenueID, j.Venue = line.Venue, j.Year = toInteger(line.Year),
+            j.Volume = toInteger(line.Volume)
+    """, """
+        MATCH (j:Journal {JournalID: line.JournalID}) DETACH DELETE j
+    """),
+    'nodes_workshop.csv': (['WorkshopID'], """
+        MERGE (w:Workshop {WorkshopID: line.WorkshopID})
+        SET w.VenueID = line.VenueID, w.Venue = line.Venue, w.Year = toInteger(line.Year)
+    """, """
+        MATCH (w:Workshop {WorkshopID: line.WorkshopID}) DETACH DELETE w
+    """),
+}
+
+DELTA_RELS = {
+    'rel_author_of.csv': (['AuthorID', 'PaperID'], """
+        MATCH (a:Author {AuthorID: line.AuthorID})
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MERGE (a)-[:AUTHOR_OF]->(p)
+    """, """
+        MATCH (:Author {AuthorID: line.AuthorID})-[r:AUTHOR_OF]->(:Paper {PaperID: line.PaperID}) DELETE r
+    """),
+    'rel_corresponding_author.csv': (['AuthorID', 'PaperID'], """
+        MATCH (a:Author {AuthorID: line.AuthorID})
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MERGE (a)-[:CORRESPONDING_AUTHOR]->(p)
+    """, """
+        MATCH (:Author {AuthorID: line.AuthorID})-[r:CORRESPONDING_AUTHOR]->(:Paper {PaperID: line.PaperID}) DELETE r
+    """),
+    'rel_about.csv': (['PaperID', 'KeywordID'], """
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MATCH (k:Keyword {KeywordID: line.KeywordID})
+        MERGE (p)-[:ABOUT]->(k)
+    """, """
+        MATCH (:Paper {PaperID: line.PaperID})-[r:ABOUT]->(:Keyword {KeywordID: line.KeywordID}) DELETE r
+    """),
+    'rel_related.csv': (['PaperID', 'RelatedToPaperID'], """
+        MATCH (p1:Paper {PaperID: line.PaperID})
+        MATCH (p2:Paper {PaperID: line.RelatedToPaperID})
+        MERGE (p1)-[:RELATED]->(p2)
+    """, """
+        MATCH (:Paper {PaperID: line.PaperID})-[r:RELATED]->(:Paper {PaperID: line.RelatedToPaperID}) DELETE r
+    """),
+    'rel_published_in_conference.csv': (['PaperID', 'ConferenceID'], """
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MATCH (c:Conference {ConferenceID: line.ConferenceID})
+        MERGE (p)-[:PUBLISHED_IN]->(c)
+    """, """
+        MATCH (:Paper {PaperID: line.PaperID})-[r:PUBLISHED_IN]->(:Conference {ConferenceID: line.ConferenceID})
+        DELETE r
+    """),
+    'rel_published_in_journal.csv': (['PaperID', 'JournalID'], """
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MATCH (j:Journal {JournalID: line.JournalID})
+        MERGE (p)-[:PUBLISHED_IN]->(j)
+    """, """
+        MATCH (:Paper {PaperID: line.PaperID})-[r:PUBLISHED_IN]->(:Journal {JournalID: line.JournalID}) DELETE r
+    """),
+    'rel_published_in_workshop.csv': (['PaperID', 'WorkshopID'], """
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MATCH (w:Workshop {WorkshopID: line.WorkshopID})
+        MERGE (p)-[:PUBLISHED_IN]->(w)
+    """, """
+        MATCH (:Paper {PaperID: line.PaperID})-[r:PUBLISHED_IN]->(:Workshop {WorkshopID: line.WorkshopID}) DELETE r
+    """),
+    'rel_reviews.csv': (['ReviewerID', 'PaperID'], """
+        MATCH (a:Author {AuthorID: line.ReviewerID})
+        MATCH (p:Paper {PaperID: line.PaperID})
+        MERGE (a)-[r:REVIEWS]->(p)
+        SET r.Comment = line.Comment, r.Score = toInteger(line.Score)
+    """, """
+        MATCH (:Author {AuthorID: line.ReviewerID})-[r:REVIEWS]->(:Paper {PaperID: line.PaperID}) DELETE r
+    """),
+}
+
+# Rows of a local file with the hash of their content, one per key (the first one, like the loaders)
+def hashed_rows(data_dir, file, keys):
+    frame = pd.read_csv(os.path.join(data_dir, file), dtype=str, keep_default_na=False, na_values=[''])
+    frame = frame.dropna(subset=keys).drop_duplicates(keys).reset_index(drop=True)
+    frame['_hash'] = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return frame
+
+def manifest_path(manifest_dir, file):
+    return os.path.join(manifest_dir, file + '.gz')
+
+def read_manifest(manifest_dir, file, keys):
+    path = manifest_path(manifest_dir, file)
+    if not os.path.exists(path):
+        return pd.DataFrame({column: pd.Series(dtype=str) for column in keys}).assign(_hash=pd.Series(dtype='uint64'))
+    return pd.read_csv(path, dtype=dict({column: str for column in keys}, _hash='uint64'), keep_default_na=False,
+                       na_values=[''])
+
+# Replaces the manifest of a file, only once its rows are in the database
+def write_manifest(manifest_dir, file, frame, keys):
+    os.makedirs(manifest_dir, exist_ok=True)
+    path = manifest_path(manifest_dir, file)
+    frame[keys + ['_hash']].to_csv(path + '.tmp', index=False, compression={'method': 'gzip', 'compresslevel': 1})
+    os.replace(path + '.tmp', path)
+
+# Rows of `frame` absent from `other` (compared on `keys`)
+def missing_rows(frame, other, keys):
+    flags = frame[keys].merge(other[keys], on=keys, how='left', indicator=True)['_merge']
+    return frame[(flags == 'left_only').to_numpy()]
+
+# Splits the rows of a file in upserts (new or changed rows) and deletes (keys that are gone) against the manifest
+def diff_manifest(frame, manifest, keys):
+    both = frame[keys + ['_hash']].merge(manifest[keys + ['_hash']], on=keys, suffixes=('', '_old'))
+    unchanged = both[both['_hash'] == both['_hash_old']]
+    upserts = missing_rows(frame, unchanged, keys)
+    deletes = missing_rows(manifest, frame, keys)[keys]
+    return upserts, deletes, len(both) - len(unchanged)
+
+def apply_rows(session, body, rows):
+    session.run(f"UNWIND $rows AS line CALL {{ WITH line {body} }}", rows=rows)
+
+def apply_batches(session, body, frame, batch_size):
+    frame = frame.drop(columns=['_hash'], errors='ignore').astype(object)
+    frame = frame.where(frame.notna(), None)
+    for i in range(0, len(frame), batch_size):
+        session.execute_write(apply_rows, body, frame.iloc[i:i + batch_size].to_dict('records'))
+
+# Brings the graph in line with the files in `data_dir`: node upserts, relationship deletes and upserts, then node
+# deletes (DETACH DELETE also removes their relationships). Returns the (frame, upserts, deletes) of every file.
+def load_delta(session, data_dir, batch_size, manifest_dir):
+    changes = {}
+    for file, (keys, _, _) in list(DELTA_NODES.items()) + list(DELTA_RELS.items()):
+        frame = hashed_rows(data_dir, file, keys)
+        upserts, deletes, changed = diff_manifest(frame, read_manifest(manifest_dir, file, keys), keys)
+        changes[file] = (frame, upserts, deletes)
+        print(f"  {file}: {len(upserts) - changed} new, {changed} changed, {len(deletes)} deleted")
+
+    steps = [(file, 'upsert') for file in DELTA_NODES] + [(file, 'delete') for file in DELTA_RELS] + \
+            [(file, 'upsert') for file in DELTA_RELS] + [(file, 'delete') for file in DELTA_NODES]
+    for file, action in steps:
+        keys, upsert, delete = DELTA_NODES.get(file) or DELTA_RELS[file]
+        frame, upserts, deletes = changes[file]
+        if action == 'upsert':
+            apply_batches(session, upsert, upserts, batch_size)
+        else:
+            apply_batches(session, delete, deletes, batch_size)
+    for file, (frame, upserts, deletes) in changes.items():
+        if len(upserts) == 0 and len(deletes) == 0 and os.path.exists(manifest_path(manifest_dir, file)):
+            continue
+        write_manifest(manifest_dir, file, frame, (DELTA_NODES.get(file) or DELTA_RELS[file])[0])
+    return changes
+
+# Refreshes the citation metrics that the upserted and deleted rows of a delta load can change
+def refresh_metrics(session, changes, batch_size):
+    def changed(file, column):
+        _, upserts, deletes = changes[file]
+        return set(upserts[column].dropna()) | set(deletes[column].dropna())
+
+    journals = changed('rel_published_in_journal.csv', 'JournalID') | changed('nodes_journal.csv', 'JournalID')
+    cm.refresh(session, cited=changed('rel_related.csv', 'RelatedToPaperID'),
+               authors=changed('rel_author_of.csv', 'AuthorID'),
+               published=changed('rel_published_in_journal.csv', 'PaperID'),
+               citing=changed('nodes_papers.csv', 'PaperID'), journals=journals, batch_size=batch_size)
+
+def clear_manifest(manifest_dir):
+    for file in list(DELTA_NODES) + list(DELTA_RELS):
+        if os.path.exists(manifest_path(manifest_dir, file)):
+            os.remove(manifest_path(manifest_dir, file))
+
+# Records every local file (or only `files`) as loaded, so the next delta load only applies what changed since
+def write_manifests(data_dir, manifest_dir, files=None):
+    for file, (keys, _, _) in list(DELTA_NODES.items()) + list(DELTA_RELS.items()):
+        if files is not None and file not in files:
+            continue
+        if not os.path.exists(os.path.join(data_dir, file)):
+            print(f"  {file} is not in {data_dir}, no manifest written (the next delta load will MERGE everything)")
+            continue
+        write_manifest(manifest_dir, file, hashed_rows(data_dir, file, keys), keys)
+
+# === VENUE EDITION MIGRATION ===
+# Graphs loaded before the venue editions had their own keys share ConferenceID, WorkshopID and JournalID between all
+# the editions of a venue, and every paper is PUBLISHED_IN all of them. The migration keys the edition nodes in place
+# (so labels set later, e.g. DatabaseVenue, are kept), then replaces the PUBLISHED_IN relationships by the ones of
+# the files preprocessed with edition keys, one per paper. It is idempotent: migrated editions have a VenueID.
+
+# label -> (key, suffix appended to the old venue ID). A missing year or volume is keyed as 0, like
+# data_preprocessing.edition_id does.
+EDITION_KEYS = {
+    'Conference': ('ConferenceID', "toString(coalesce(v.Year, 0))"),
+    'Workshop': ('WorkshopID', "toString(coalesce(v.Year, 0))"),
+    'Journal': ('JournalID', "toString(coalesce(v.Year, 0)) + '-' + toString(coalesce(v.Volume, 0))"),
+}
+EDITION_FILES = ['nodes_conference.csv', 'nodes_journal.csv', 'nodes_workshop.csv']
+PUBLISHED_IN_FILES = ['rel_published_in_conference.csv', 'rel_published_in_journal.csv',
+                      'rel_published_in_workshop.csv']
+
+def count_published_in(session):
+    return session.run("MATCH ()-[r:PUBLISHED_IN]->() RETURN count(r) AS count").single()['count']
+
+# Keeps the old venue ID as VenueID and appends the year (and volume) to the key. Auto-commit (session.run).
+def rekey_editions(session, label, key, suffix, batch_size):
+    return session.run(
+        f"""
+        MATCH (v:{label}) WHERE v.VenueID IS NULL
+        CALL {{
+            WITH v
+            SET v.VenueID = v.{key}, v.{key} = v.{key} + '-' + {suffix}
+        }} IN TRANSACTIONS OF $batch_size ROWS
+        RETURN count(v) AS rekeyed
+        """, batch_size=batch_size).single()['rekeyed']
+
+# Journal editions without a volume were loaded once per spelling of the missing volume, they now share a key. The
+# duplicates are dropped before the constraints are created, their PUBLISHED_IN relationships are replaced anyway.
+def drop_duplicate_editions(tx, label, key):
+    return tx.run(
+        f"""
+        MATCH (v:{label})
+        WITH v.{key} AS key, COLLECT(v) AS editions
+        WHERE SIZE(editions) > 1
+        UNWIND tail(editions) AS duplicate
+        DETACH DELETE duplicate
+        RETURN count(duplicate) AS dropped
+        """).single()['dropped']
+
+def main_migrate(session, mode, batch_size, data_dir, sessions, manifest_dir):
+    start = time.time()
+    before = count_published_in(session)
+    print("Keying the venue editions on their venue and year...")
+    for label, (key, suffix) in EDITION_KEYS.items():
+        rekeyed = rekey_editions(session, label, key, suffix, batch_size)
+        dropped = session.execute_write(drop_duplicate_editions, label, key)
+        print(f"  {label}: {rekeyed} editions rekeyed, {dropped} duplicates dropped")
+    print("Creating constraints and indexes...")
+    session.execute_write(create_constraints)
+    session.execute_write(create_indexes)
+    session.execute_read(await_indexes)
+
+    print("Replacing the PUBLISHED_IN relationships...")
+    clean_session(session, rel_types=['PUBLISHED_IN'])
+    pool = SessionPool(sessions) if mode == 'unwind' else None
+    for file, body in REL_FILES:
+        if file in PUBLISHED_IN_FILES:
+            load_file(session, pool, file, body, mode, batch_size, data_dir, None)
+    session.execute_write(clear_progress)
+    write_manifests(data_dir, manifest_dir, EDITION_FILES + PUBLISHED_IN_FILES)
+    # The journal editions lost the papers of their other years
+    print("Computing the citation metrics...")
+    cm.materialize(session, batch_size)
+    print(f"PUBLISHED_IN relationships: {before} before, {count_published_in(session)} after. "
+          f"Migrated in {time.time() - start:.1f}s.")
+    if pool is not None:
+        pool.close()
+    session.close()
+
+# `frames` optionally maps output file names (e.g. 'nodes_papers.csv') to DataFrames loaded instead of the files
+# (unwind mode)
+def main(constraints=True, mode=LOAD_MODE, batch_size=BATCH_SIZE, resume=False, data_dir=DATA_DIR,
+         sessions=SESSIONS, frames=None, parallel=PARALLEL_FILES, delta=False, manifest_dir=MANIFEST_DIR,
+         migrate_venues=False):
+    dp.require_edition_keys(data_dir)
     session = create_session()
-    session = clean_session(session)
-
-    print("Loading nodes...")
-    session.execute_write(load_node_papers)
-    session.execute_write(load_node_authors)
-    session.execute_write(load_node_keywords)
-    session.execute_write(load_node_conferences)
-    session.execute_write(load_node_journals)
-    session.execute_write(load_node_workshops)
-
-    print("Loading relationships...")
-    session.execute_write(load_rel_author_of)
-    session.execute_write(load_rel_corresponding_author)
-    session.execute_write(load_rel_about)
-    session.execute_write(load_rel_related)
-    session.execute_write(load_rel_published_in_conference)
-    session.execute_write(load_rel_published_in_journal)
-    session.execute_write(load_rel_published_in_workshop)
-    session.execute_write(load_rel_reviews)
+    if delta:
+        return main_delta(session, batch_size, data_dir, manifest_dir)
+    if migrate_venues:
+        return main_migrate(session, mode, batch_size, data_dir, sessions, manifest_dir)
+    pool = SessionPool(sessions) if mode == 'unwind' else None
+    if not resume:
+        # The manifest no longer describes the graph once it is wiped
+        clear_manifest(manifest_dir)
+        session = clean_session(session)
 
+    start = time.time()
+    if constraints:
+        print("Creating constraints and indexes...")
+        session.execute_write(create_constraints)
+        session.execute_write(create_indexes)
+        session.execute_read(await_indexes)
+    else:
+        print("Dropping constraints and indexes...")
+        session.execute_write(drop_schema)
+    schema_time = time.time()
+
+    print(f"Loading nodes ({mode} mode)...")
+    for file, body in NODE_FILES:
+        load_file(session, pool, file, body, mode, batch_size, data_dir, frames)
+    nodes_time = time.time()
+
+    print(f"Loading relationships ({mode} mode, {parallel} files at a time)...")
+    load_files_parallel(pool, REL_FILES, mode, batch_size, data_dir, frames, parallel)
+    session.execute_write(clear_progress)
+    rels_time = time.time()
+
+    print("Computing the citation metrics...")
+    cm.materialize(session, batch_size)
+    end = time.time()
+
+    if frames is None:
+        print("Writing the load manifest...")
+        write_manifests(data_dir, manifest_dir)
+
+    print(f"Schema: {schema_time - start:.1f}s, nodes: {nodes_time - schema_time:.1f}s, "
+          f"relationships: {rels_time - nodes_time:.1f}s, citation metrics: {end - rels_time:.1f}s, "
+          f"total: {end - start:.1f}s")
     print("Done loading all data into Neo4j.")
+    if pool is not None:
+        pool.close()
+    session.close()
+
+# Applies only what changed in `data_dir` since the last load (the first delta load MERGEs everything)
+def main_delta(session, batch_size, data_dir, manifest_dir):
+    start = time.time()
+    print("Creating constraints and indexes...")
+    session.execute_write(create_constraints)
+    session.execute_write(create_indexes)
+    session.execute_read(await_indexes)
+
+    print("Loading changes...")
+    changes = load_delta(session, data_dir, batch_size, manifest_dir)
+    print("Refreshing the citation metrics...")
+    refresh_metrics(session, changes, batch_size)
+    print(f"Done loading the changes into Neo4j in {time.time() - start:.1f}s.")
     session.close()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Load the preprocessed csv files into Neo4j')
+    parser.add_argument('--no-constraints', action='store_true',
+                        help='Load without uniqueness constraints and indexes (to compare load times)')
+    parser.add_argument('--mode', choices=LOAD_MODES, default=LOAD_MODE,
+                        help='single: one transaction per file, transactions: CALL { } IN TRANSACTIONS (default), '
+                             'unwind: batches streamed by the driver from the local files')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows committed per transaction')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted load after its last committed batch instead of starting over')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='Local directory of the preprocessed files (unwind mode), arrow/parquet copies are used '
+                             'when they exist')
+    parser.add_argument('--sessions', type=int, default=SESSIONS,
+                        help='Sessions writing batches concurrently (unwind mode)')
+    parser.add_argument('--parallel', type=int, default=PARALLEL_FILES,
+                        help='Relationship files loaded concurrently')
+    parser.add_argument('--delta', action='store_true',
+                        help='Only MERGE the new and changed rows and delete the removed ones, against the manifest '
+                             'of the previous load, instead of wiping and reloading everything')
+    parser.add_argument('--manifest-dir', default=MANIFEST_DIR, help='Directory of the load manifest')
+    parser.add_argument('--migrate-venues', action='store_true',
+                        help='Migrate a graph loaded with venue-level IDs to edition keys, from files preprocessed '
+                             'with edition keys, instead of loading')
+    args = parser.parse_args()
+    main(not args.no_constraints, args.mode, args.batch_size, args.resume, args.data_dir, args.sessions, None,
+         args.parallel, args.delta, args.manifest_dir, args.migrate_venues)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+CACHE_PATH = os.path.join('data', 'cache.sqlite')
+CACHE_TTL_DAYS = 30
+CACHE_MAX_MB = 2048
+
+
+# Persistent cache of API responses stored in a SQLite file. Entries are content addressed: the key is a hash of the
+# kind of request, the paper ID (or search parameters) and the requested fields, so changing the fields never returns
+# a stale shape. Bodies are stored as compressed JSON. Entries older than the TTL are ignored and removed on eviction,
+# and the least recently used entries are removed once the cache grows past its maximum size.
+class PaperCache:
+    def __init__(self, path=CACHE_PATH, ttl_days=CACHE_TTL_DAYS, max_mb=CACHE_MAX_MB):
+        self.path = path
+        self.ttl = ttl_days * 24 * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                paper_id TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self.conn.commit()
+
+    @staticmethod
+    def key(kind, identifier, fields):
+        return hashlib.sha1(f'{kind}\0{identifier}\0{fields}'.encode('utf-8')).hexdigest()
+
+    # Returns {key: response} for the keys that are cached and not expired
+    def get_many(self, keys):
+        found = {}
+        now = time.time()
+        keys = list(keys)
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, body FROM responses WHERE fetched_at >= ? AND key IN ({','.join('?' * len(chunk))})",
+                    [now - self.ttl] + chunk).fetchall()
+                for key, body in rows:
+                    found[key] = json.loads(zlib.decompress(body))
+            self.conn.executemany('UPDATE responses SET accessed_at = ? WHERE key = ?', [(now, k) for k in found])
+            self.conn.commit()
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    # Stores a list of (key, kind, paper_id, response) tuples in a single transaction
+    def put_many(self, entries):
+        now = time.time()
+        rows = []
+        for key, kind, paper_id, response in entries:
+            body = zlib.compress(json.dumps(response).encode('utf-8'))
+            rows.append((key, kind, paper_id, body, len(body), now, now))
+        with self.lock:
+            self.conn.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.conn.commit()
+
+    def put(self, key, kind, paper_id, response):
+        self.put_many([(key, kind, paper_id, response)])
+
+    # Iterates over every cached paper in the order they were first stored
+    def papers(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT body FROM responses WHERE kind = 'paper' ORDER BY rowid").fetchall()
+        for (body,) in rows:
+            yield json.loads(zlib.decompress(body))
+
+    # Removes expired entries, then the least recently used ones until the cache fits in its maximum size
+    def evict(self):
+        with self.lock:
+            removed = self.conn.execute('DELETE FROM responses WHERE fetched_at < ?', (time.time() - self.ttl,)).rowcount
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                doomed = []
+                for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                self.conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+                removed += len(doomed)
+            self.conn.commit()
+        return removed
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
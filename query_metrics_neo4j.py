@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import pprint
+import threading
+import time
+from collections import defaultdict
+from dotenv import load_dotenv
+
+# Every executed statement is appended as one JSON object per line to the metrics log. With QUERY_PROFILE=1 the
+# statements run with PROFILE, which adds the db hits of the plan to each entry.
+load_dotenv()
+METRICS_LOG = os.environ.get('QUERY_METRICS_LOG', os.path.join('data', 'query_metrics.jsonl'))
+PROFILE = os.environ.get('QUERY_PROFILE', '0') == '1'
+
+COUNTERS = ['nodes_created', 'nodes_deleted', 'relationships_created', 'relationships_deleted', 'properties_set',
+            'labels_added', 'labels_removed', 'indexes_added', 'indexes_removed', 'constraints_added',
+            'constraints_removed', 'system_updates']
+
+# Statements PROFILE cannot be applied to: schema and administration commands, and the batched statements of the
+# loaders and of the deletes (CALL { } IN TRANSACTIONS cannot be profiled)
+UNPROFILED_PREFIXES = ('PROFILE', 'EXPLAIN', 'CREATE CONSTRAINT', 'CREATE INDEX', 'DROP', 'SHOW', 'USE')
+UNPROFILED_CLAUSES = ('IN TRANSACTIONS',)
+
+
+def profiled(text):
+    upper = text.upper()
+    return not upper.startswith(UNPROFILED_PREFIXES) and not any(clause in upper for clause in UNPROFILED_CLAUSES)
+
+
+def print_query_results(records, summary):
+    pp = pprint.PrettyPrinter(indent=4)
+    print("The query `{}` returned {} records in {} ms.".format(
+        summary.query, len(records), summary.result_available_after))
+    for record in records:
+        pp.pprint(record.data())
+        print()
+
+
+# Sums the db hits of every operator of a PROFILE plan
+def db_hits(plan):
+    if not plan:
+        return None
+    return plan.get('dbHits', 0) + sum(db_hits(child) or 0 for child in plan.get('children', []))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+# Collects the metrics of the statements run through instrumented sessions, writes them to the JSON log and keeps
+# them in memory for the p50/p95 summary
+class QueryMetrics:
+    def __init__(self, log_path=METRICS_LOG, profile=PROFILE):
+        self.log_path = log_path
+        self.profile = profile
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def record(self, name, summary, rows, wall_ms):
+        counters = {counter: getattr(summary.counters, counter) for counter in COUNTERS}
+        entry = {
+            'query': name,
+            'timestamp': time.time(),
+            'rows': rows,
+            'wall_ms': round(wall_ms, 3),
+            'result_available_after_ms': summary.result_available_after,
+            'result_consumed_after_ms': summary.result_consumed_after,
+            'db_hits': db_hits(summary.profile),
+            'profiled_rows': summary.profile.get('rows') if summary.profile else None,
+            'counters': {counter: value for counter, value in counters.items() if value},
+        }
+        with self.lock:
+            self.entries.append(entry)
+            if self.log_path:
+                os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+
+    def summary(self):
+        with self.lock:
+            return summarize(self.entries)
+
+    def print_summary(self):
+        print_summary(self.summary())
+
+
+# p50/p95 of the wall time and of the server time (result available + consumed) per named query
+def summarize(entries):
+    by_name = defaultdict(list)
+    for entry in entries:
+        by_name[entry['query']].append(entry)
+    stats = {}
+    for name, runs in by_name.items():
+        wall = [run['wall_ms'] for run in runs]
+        server = [(run['result_available_after_ms'] or 0) + (run['result_consumed_after_ms'] or 0) for run in runs]
+        hits = [run['db_hits'] for run in runs if run.get('db_hits') is not None]
+        stats[name] = {
+            'runs': len(runs),
+            'wall_p50_ms': percentile(wall, 50),
+            'wall_p95_ms': percentile(wall, 95),
+            'server_p50_ms': percentile(server, 50),
+            'server_p95_ms': percentile(server, 95),
+            'db_hits_p50': percentile(hits, 50),
+            'rows_p50': percentile([run['rows'] for run in runs], 50),
+        }
+    return stats
+
+
+def print_summary(stats):
+    print(f"{'query':60} {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'db hits':>12}")
+    for name, stat in sorted(stats.items()):
+        hits = '' if stat['db_hits_p50'] is None else f"{stat['db_hits_p50']:.0f}"
+        print(f"{name[:60]:60} {stat['runs']:>5} {stat['wall_p50_ms']:>10.1f} {stat['wall_p95_ms']:>10.1f} {hits:>12}")
+
+
+def read_log(log_path=METRICS_LOG):
+    with open(log_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Wraps a neo4j Result: counts the records read and records the metrics as soon as the last record was read, or when
+# the result is consumed. Results the caller leaves unread are recorded when their transaction ends or their session
+# closes, their wall time then runs until that point.
+class InstrumentedResult:
+    def __init__(self, result, name, metrics, start):
+        self.result = result
+        self.name = name
+        self.metrics = metrics
+        self.start = start
+        self.end = None
+        self.rows = 0
+        self.summary = None
+
+    def __iter__(self):
+        for record in self.result:
+            self.rows += 1
+            yield record
+        self.exhausted()
+
+    # single(), data(), value() and values() always read the result to the end
+    def single(self, strict=False):
+        record = self.result.single(strict)
+        self.rows += record is not None
+        self.exhausted()
+        return record
+
+    def data(self, *keys):
+        data = self.result.data(*keys)
+        self.rows += len(data)
+        self.exhausted()
+        return data
+
+    def value(self, key=0, default=None):
+        values = self.result.value(key, default)
+        self.rows += len(values)
+        self.exhausted()
+        return values
+
+    def values(self, *keys):
+        values = self.result.values(*keys)
+        self.rows += len(values)
+        self.exhausted()
+        return values
+
+    def exhausted(self):
+        self.end = time.time()
+        self.consume()
+
+    def consume(self):
+        if self.summary is None:
+            self.summary = self.result.consume()
+            self.metrics.record(self.name, self.summary, self.rows, ((self.end or time.time()) - self.start) * 1000)
+        return self.summary
+
+    def __getattr__(self, attribute):
+        return getattr(self.result, attribute)
+
+
+# Wraps a transaction (or a session, for auto-commit statements): every statement gets a name, `base` for the first
+# one and `base#2`, `base#3`... for the next ones, and runs with PROFILE when profiling is on
+class InstrumentedRunner:
+    def __init__(self, runner, base, metrics):
+        self.runner = runner
+        self.base = base
+        self.metrics = metrics
+        self.results = []
+
+    def run(self, query, parameters=None, **kwparameters):
+        name = self.base if not self.results else f'{self.base}#{len(self.results) + 1}'
+        text = query.strip()
+        if self.metrics.profile and profiled(text):
+            text = 'PROFILE ' + text
+        result = InstrumentedResult(self.runner.run(text, parameters, **kwparameters), name, self.metrics,
+                                    time.time())
+        self.results.append(result)
+        return result
+
+    # Records the statements whose results were not consumed by the caller
+    def finish(self):
+        for result in self.results:
+            result.consume()
+
+    def __getattr__(self, attribute):
+        return getattr(self.runner, attribute)
+
+
+# Session whose statements are all measured. Transaction functions receive an instrumented transaction and their
+# statements are named after the function (e.g. query_h_index), auto-commit statements can be named with `name=`.
+class InstrumentedSession:
+    def __init__(self, session, metrics):
+        self.session = session
+        self.metrics = metrics
+        # Auto-commit results not recorded yet
+        self.pending = []
+
+    def execute(self, execute, fn, args, kwargs):
+        def work(tx, *a, **kw):
+            runner = InstrumentedRunner(tx, fn.__name__, self.metrics)
+            value = fn(runner, *a, **kw)
+            runner.finish()
+            return value
+        return execute(work, *args, **kwargs)
+
+    def execute_read(self, fn, *args, **kwargs):
+        return self.execute(self.session.execute_read, fn, args, kwargs)
+
+    def execute_write(self, fn, *args, **kwargs):
+        return self.execute(self.session.execute_write, fn, args, kwargs)
+
+    def run(self, query, parameters=None, name='session.run', **kwparameters):
+        result = InstrumentedRunner(self.session, name, self.metrics).run(query, parameters, **kwparameters)
+        self.pending = [pending for pending in self.pending if pending.summary is None] + [result]
+        return result
+
+    def close(self):
+        for result in self.pending:
+            result.consume()
+        self.pending = []
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, attribute):
+        return getattr(self.session, attribute)
+
+
+metrics = QueryMetrics()
+
+
+def instrument(session, query_metrics=None):
+    return InstrumentedSession(session, query_metrics or metrics)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='p50/p95 latency per named query of a metrics log')
+    parser.add_argument('--log', default=METRICS_LOG, help='JSON Lines metrics log')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+    stats = summarize(read_log(args.log))
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print_summary(stats)
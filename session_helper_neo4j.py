@@ -1,25 +1,188 @@
+import argparse
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
-def delete_and_detach_all_nodes(session):
-    session.run(
-        "MATCH (n) DETACH DELETE n"
-    )
+# Connection settings, from the environment or a .env file
+load_dotenv()
+NEO4J_URI = os.environ.get('NEO4J_URI', 'bolt://localhost:7692')
+NEO4J_USER = os.environ.get('NEO4J_USER', 'neo4j')
+NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD', 'neo4j123')
+# Database of the sessions, the server's default database (home database of the user) unless NEO4J_DATABASE is set
+DATABASE = os.environ.get('NEO4J_DATABASE') or None
+# Connections kept by the driver, seconds to wait for a free one, and records fetched per round trip
+MAX_POOL_SIZE = int(os.environ.get('NEO4J_MAX_POOL_SIZE', 50))
+ACQUISITION_TIMEOUT = float(os.environ.get('NEO4J_ACQUISITION_TIMEOUT', 60))
+FETCH_SIZE = int(os.environ.get('NEO4J_FETCH_SIZE', 1000))
 
-def create_session():
-    username = 'neo4j'
-    password = 'neo4j123' # Change this to your password
+driver = None
+driver_lock = threading.Lock()
+# Rows deleted per transaction, and per query (progress is reported between queries)
+DELETE_BATCH_SIZE = 10000
+DELETE_CHUNK_SIZE = 1000000
 
-    print('Creating a connection with neo4j...')
-    driver = GraphDatabase.driver("bolt://localhost:7692", auth=(username, password))
+# Deletes what `match` binds to `x` with `delete`, in transactions of `batch_size` rows. Must run in an auto-commit
+# transaction (session.run).
+def delete_in_batches(session, match, delete, what, batch_size=DELETE_BATCH_SIZE):
+    total = 0
+    while True:
+        deleted = session.run(
+            f"""
+            {match}
+            WITH x LIMIT $chunk
+            CALL {{ WITH x {delete} x }} IN TRANSACTIONS OF $batch_size ROWS
+            RETURN count(*) AS deleted
+            """, chunk=DELETE_CHUNK_SIZE, batch_size=batch_size).single()['deleted']
+        total += deleted
+        if deleted:
+            print(f'  {total} {what} deleted')
+        if deleted < DELETE_CHUNK_SIZE:
+            return total
 
-    session = driver.session()
+def delete_relationships(session, rel_types=None, batch_size=DELETE_BATCH_SIZE):
+    types = ':' + '|'.join(f'`{t}`' for t in rel_types) if rel_types else ''
+    return delete_in_batches(session, f"MATCH ()-[x{types}]->()", "DELETE", 'relationships', batch_size)
+
+# Deletes the relationships first, so no transaction has to detach a dense node on its own
+def delete_nodes(session, labels=None, batch_size=DELETE_BATCH_SIZE):
+    if not labels:
+        delete_relationships(session, batch_size=batch_size)
+        return delete_in_batches(session, "MATCH (x)", "DETACH DELETE", 'nodes', batch_size)
+    for label in labels:
+        delete_in_batches(session, f"MATCH (:`{label}`)-[x]-() WITH DISTINCT x", "DELETE", 'relationships',
+                          batch_size)
+        delete_in_batches(session, f"MATCH (x:`{label}`)", "DETACH DELETE", f'{label} nodes', batch_size)
+
+def default_database(driver):
+    with driver.session(database='system') as system:
+        return system.run("SHOW DEFAULT DATABASE YIELD name").single()['name']
+
+# Drops the database with all its data, indexes and constraints and creates it again (needs Neo4j Enterprise)
+def recreate_database(driver, database=DATABASE):
+    database = database or default_database(driver)
+    print(f'Dropping and recreating the {database} database.')
+    with driver.session(database='system') as system:
+        system.run("CREATE OR REPLACE DATABASE $name WAIT", name=database).consume()
+
+# A new driver with its own connection pool, most code should use the shared one from get_driver()
+def create_driver():
+    print(f'Creating a connection with neo4j at {NEO4J_URI}...')
+    return GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                max_connection_pool_size=MAX_POOL_SIZE,
+                                connection_acquisition_timeout=ACQUISITION_TIMEOUT)
+
+# The driver shared by the whole process, created on first use and closed at exit. Its connections are pooled, so
+# sessions are cheap to open and close.
+def get_driver():
+    global driver
+    with driver_lock:
+        if driver is None:
+            driver = create_driver()
+            atexit.register(close_driver)
+        return driver
+
+def close_driver():
+    global driver
+    with driver_lock:
+        if driver is not None:
+            driver.close()
+            driver = None
+
+def open_session(driver=None, **config):
+    return (driver or get_driver()).session(database=DATABASE, fetch_size=FETCH_SIZE, **config)
+
+# Session on the shared driver, closed (its connection back in the pool) when the block exits:
+#     with session_scope() as session:
+#         session.execute_read(...)
+@contextmanager
+def session_scope(**config):
+    session = open_session(**config)
+    try:
+        yield session
+    finally:
+        session.close()
+
+def create_session(driver=None):
+    session = open_session(driver)
     print('Session Initiated....')
 
     return session
 
-def clean_session(session):
-    
-    print('Deleting and detaching all the previous nodes in the database.')
-    session.execute_write(delete_and_detach_all_nodes)
+# Wipes the database in batches: everything, or only the relationships of `rel_types` and/or the nodes of `labels`
+# (e.g. labels=['Review'] or rel_types=['SIMILAR']) for partial rebuilds. With `recreate` the database is dropped and
+# created again instead, which is the fastest way to empty a large graph.
+def clean_session(session, labels=None, rel_types=None, recreate=False, batch_size=DELETE_BATCH_SIZE):
+    start = time.time()
+    if recreate:
+        recreate_database(get_driver())
+    elif labels or rel_types:
+        print(f'Deleting {", ".join((labels or []) + (rel_types or []))} from the database.')
+        if rel_types:
+            delete_relationships(session, rel_types, batch_size)
+        if labels:
+            delete_nodes(session, labels, batch_size)
+    else:
+        print('Deleting and detaching all the previous nodes in the database.')
+        delete_nodes(session, batch_size=batch_size)
+    print(f'Cleaned in {time.time() - start:.1f}s.')
+
+    return session
+
+# Every load that changes the graph gives it a new data version (a random ID on the (:DataVersion) node), so what is
+# derived from the graph, such as the GDS projections of PartD, knows when it is stale. A wiped graph has none.
+def bump_data_version(tx):
+    return tx.run("""
+        MERGE (v:DataVersion)
+        SET v.version = randomUUID(), v.updated = datetime()
+        RETURN v.version AS version
+    """).single()['version']
+
+def read_data_version(tx):
+    record = tx.run("MATCH (v:DataVersion) RETURN v.version AS version").single()
+    return record['version'] if record else None
+
+# Runs write transactions concurrently, each worker thread using its own session of the driver (sessions are not
+# thread safe, the driver is)
+class SessionPool:
+    def __init__(self, size, driver=None):
+        self.driver = driver or get_driver()
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size)
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = open_session(self.driver)
+            with self.lock:
+                self.sessions.append(self.local.session)
+        return self.local.session
+
+    def run_write(self, fn, args):
+        return self.session().execute_write(fn, *args)
+
+    # Schedules `fn(tx, *args)` in a write transaction and returns its future
+    def submit_write(self, fn, *args):
+        return self.executor.submit(self.run_write, fn, args)
+
+    def close(self):
+        self.executor.shutdown()
+        for session in self.sessions:
+            session.close()
 
-    return session
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Delete data from the Neo4j database in batches')
+    parser.add_argument('--labels', nargs='*', help='Only delete the nodes with these labels (e.g. Review)')
+    parser.add_argument('--rel-types', nargs='*', help='Only delete the relationships of these types (e.g. SIMILAR)')
+    parser.add_argument('--recreate', action='store_true', help='Drop and recreate the database (Neo4j Enterprise)')
+    parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE, help='Rows deleted per transaction')
+    args = parser.parse_args()
+    session = create_session()
+    clean_session(session, args.labels, args.rel_types, args.recreate, args.batch_size)
+    session.close()
@@ -0,0 +1,402 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import data_preprocessing as dp
+
+DATA_DIR = 'data'
+OUT_DIR = os.path.join('data', 'synthetic')
+EDGES = 1000000
+SEED = dp.SEED
+# Papers generated (and held in memory) at a time by a worker
+SHARD_PAPERS = 50000
+# Quantiles kept of the length of titles and abstracts
+LENGTH_QUANTILES = 101
+
+FILLER = ('We study the problem in a principled way and propose a method that is evaluated on several datasets, '
+          'showing consistent improvements over strong baselines while remaining efficient in time and memory. ') * 40
+
+# Synthetic graphs with the schema of data_preprocessing (the nodes_*/rel_* files) at any scale, without the API.
+# The distributions are fitted from the preprocessed files of `data/` into a profile: authors per paper, papers per
+# author, references per paper, citations per cited paper, papers per venue, journal editions and years, and the
+# lengths of titles and abstracts. The graph is generated in shards of papers, each one seeded from (seed, shard)
+# so the output does not depend on the number of worker processes, and every shard only holds its own rows. The
+# shard size is part of the seed: the same seed with another --shard-papers gives another (equally distributed) graph.
+
+# === PROFILE ===
+
+def pmf(values):
+    counts = pd.Series(values).value_counts().sort_index()
+    if counts.empty:
+        return {'values': [1], 'probs': [1.0]}
+    return {'values': [int(v) for v in counts.index], 'probs': (counts / counts.sum()).tolist()}
+
+def pmf_mean(dist):
+    return float(np.dot(dist['values'], dist['probs']))
+
+def quantiles(lengths):
+    lengths = pd.Series(lengths).dropna()
+    if lengths.empty:
+        return [0] * LENGTH_QUANTILES
+    return [int(q) for q in np.quantile(lengths, np.linspace(0, 1, LENGTH_QUANTILES))]
+
+# Fits the profile of the preprocessed files in `data_dir`
+def fit_profile(data_dir):
+    dp.require_edition_keys(data_dir)
+    def read(file, columns):
+        return pd.read_csv(os.path.join(data_dir, file), dtype=str, usecols=columns, keep_default_na=False,
+                           na_values=[''])
+
+    papers = read('nodes_papers.csv', ['PaperID', 'Title', 'Year', 'Abstract', 'DOI']).drop_duplicates('PaperID')
+    paper_ids = papers['PaperID']
+    author_of = read('rel_author_of.csv', ['AuthorID', 'PaperID'])
+    related = read('rel_related.csv', ['PaperID', 'RelatedToPaperID'])
+    journals = read('nodes_journal.csv', ['JournalID', 'VenueID', 'Year', 'Volume']).dropna(
+        subset=['VenueID', 'Year'])
+    journal_years = journals['Year'].astype(int)
+    volumes = pd.to_numeric(journals['Volume'], errors='coerce')
+
+    profile = {
+        'papers': len(papers),
+        'relationships': sum(len(read(file, [dp.OUTPUT_COLUMNS[file][0]])) for file in dp.OUTPUT_COLUMNS
+                             if file.startswith('rel_')),
+        'year': pmf(papers['Year'].dropna().astype(int)),
+        'title_length': quantiles(papers['Title'].dropna().str.len()),
+        'abstract_length': quantiles(papers['Abstract'].dropna().str.len()),
+        'abstract_missing': float(papers['Abstract'].isna().mean()),
+        'doi_missing': float(papers['DOI'].isna().mean()),
+        # Per paper, papers without authors or references included
+        'authors_per_paper': pmf(author_of['PaperID'].value_counts().reindex(paper_ids, fill_value=0)),
+        'references_per_paper': pmf(related['PaperID'].value_counts().reindex(paper_ids, fill_value=0)),
+        'papers_per_author': pmf(author_of['AuthorID'].value_counts()),
+        # In-degree of every cited ID. Most references point outside of the harvested papers and are not loaded.
+        'citations_per_reference': pmf(related['RelatedToPaperID'].value_counts()),
+        'venue_type': {},
+        'papers_per_venue': {},
+        'editions_per_journal': pmf(journals.groupby('VenueID').size()),
+        'journal_year': pmf(journal_years),
+        'journal_volume_offset': pmf((journal_years - volumes)[volumes > 0]),
+    }
+    for venue_type, id_column in (('conference', 'ConferenceID'), ('workshop', 'WorkshopID'),
+                                  ('journal', 'JournalID')):
+        # Papers per venue, all its editions together
+        published = read(f'rel_published_in_{venue_type}.csv', ['PaperID', id_column]).drop_duplicates('PaperID')
+        editions = read(f'nodes_{venue_type}.csv', [id_column, 'VenueID']).drop_duplicates(id_column)
+        profile['venue_type'][venue_type] = len(published) / max(len(papers), 1)
+        venues = published.merge(editions, on=id_column)['VenueID']
+        profile['papers_per_venue'][venue_type] = pmf(venues.value_counts())
+    return profile
+
+
+def papers_for(profile, edges):
+    return max(1, math.ceil(edges * profile['papers'] / max(profile['relationships'], 1)))
+
+# === SAMPLING ===
+# Relationships are drawn like in a configuration model. The papers have their own degrees (authors, references,
+# venue), drawn in every shard, and each relationship gets a global position: the shards are planned first, so shard
+# s knows how many authorships, references and venue papers the shards before it have. The target nodes (authors,
+# cited IDs, venues) get degrees fitted on the data and one stub per unit of degree, and position p takes the stub p
+# of a seeded permutation of all the stubs. Every stub is used once, so the degrees of the targets follow the fitted
+# distribution (up to rounding and the few duplicate pairs dropped) with O(#degrees) memory whatever the number of
+# nodes, and no shard needs the picks of the others.
+
+class StubSampler:
+    def __init__(self, dist, picks, seed):
+        degrees = np.asarray(dist['values'], dtype=np.int64)
+        probs = np.asarray(dist['probs'], dtype=np.float64)
+        n = max(1, round(picks / max(pmf_mean(dist), 1e-9)))
+        exact = probs * n
+        sizes = np.floor(exact).astype(np.int64)
+        # Largest remainders, so the classes cover exactly n nodes
+        sizes[np.argsort(exact - sizes)[::-1][:n - sizes.sum()]] += 1
+        stubs = sizes * np.maximum(degrees, 0)
+        self.n = n
+        self.degrees = degrees
+        self.starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.stub_ends = np.cumsum(stubs)
+        self.stub_starts = self.stub_ends - stubs
+        self.stubs = max(1, int(stubs.sum()))
+        rng = np.random.default_rng(seed)
+        self.stub_step, self.stub_offset = permutation(self.stubs, rng)
+        # Scatters the degree classes over the node IDs
+        self.node_step, self.node_offset = permutation(n, rng)
+
+    # Target nodes of the picks at the global `positions`
+    def nodes(self, positions):
+        stubs = (positions % self.stubs * self.stub_step + self.stub_offset) % self.stubs
+        classes = np.searchsorted(self.stub_ends, stubs, side='right')
+        nodes = self.starts[classes] + (stubs - self.stub_starts[classes]) // self.degrees[classes]
+        return (nodes * self.node_step + self.node_offset) % self.n
+
+# x -> (x * step + offset) mod n, with a seeded step coprime with n, is a permutation of 0..n-1
+def permutation(n, rng):
+    step = max(1, int(n * rng.uniform(0.2, 0.8))) | 1
+    while math.gcd(step, n) != 1:
+        step += 2
+    return step % n or 1, int(rng.integers(n))
+
+def draw(rng, dist, size):
+    return rng.choice(np.asarray(dist['values']), size=size, p=np.asarray(dist['probs']))
+
+# Draws from `dist` for every key, like dp.seeded_choice: the value only depends on the key, the seed and the purpose,
+# so every shard agrees on it without sharing state
+def seeded_draw(keys, dist, seed, purpose):
+    hash_key = hashlib.md5(f'{seed}:{purpose}'.encode('utf-8')).hexdigest()[:16]
+    hashes = pd.util.hash_pandas_object(pd.Series(keys).astype(str), index=False, hash_key=hash_key).to_numpy()
+    cdf = np.cumsum(dist['probs'])
+    picks = np.searchsorted(cdf / cdf[-1], (hashes >> np.uint64(11)) / float(1 << 53), side='right')
+    return np.asarray(dist['values'])[np.minimum(picks, len(cdf) - 1)]
+
+def draw_lengths(rng, lengths, size):
+    return np.interp(rng.random(size), np.linspace(0, 1, len(lengths)), lengths).astype(np.int64)
+
+def paper_id(index):
+    return 'syn-p' + pd.Series(index).astype(str)
+
+def author_id(index):
+    return 'syn-a' + pd.Series(index).astype(str)
+
+# Cited IDs below the number of papers are generated papers, the others are references to papers that are not part
+# of the graph (like most references of the harvested papers)
+def reference_id(index, papers):
+    index = pd.Series(index)
+    return ('syn-p' + index.astype(str)).where(index < papers, 'syn-r' + (index - papers).astype(str))
+
+# Edition `edition` of every journal of `journals`: (year, volume). The editions of a journal, their years and its
+# volume numbering are seeded on the journal, so the papers of any shard and the shard owning the journal agree.
+def journal_edition(profile, journals, edition, seed):
+    journals = np.asarray(journals)
+    years = seeded_draw(pd.Series(journals).astype(str) + ':' + pd.Series(edition).astype(str),
+                        profile['journal_year'], seed, 'journal_year')
+    volume_offsets = seeded_draw(journals, profile['journal_volume_offset'], seed, 'journal_volume_offset')
+    return years, np.maximum(years - volume_offsets, 1)
+
+def journal_editions(profile, journals, seed):
+    return seeded_draw(journals, profile['editions_per_journal'], seed, 'journal_editions')
+
+def shard_range(total, shard, shards):
+    return total * shard // shards, total * (shard + 1) // shards
+
+# === SHARDS ===
+
+# Degrees of the papers of a shard, from their own stream so that the planning and the generation draw the same ones
+def shard_degrees(profile, papers, shard, shards, seed):
+    first, last = shard_range(papers, shard, shards)
+    rng = np.random.default_rng([seed, shard, 0])
+    shares = np.array(list(profile['venue_type'].values()))
+    venue_probs = np.append(shares, max(0.0, 1 - shares.sum()))
+    return {
+        'authors': draw(rng, profile['authors_per_paper'], last - first),
+        'references': draw(rng, profile['references_per_paper'], last - first),
+        # Index of the venue type of every paper, len(venue_type) for none
+        'venue': rng.choice(len(venue_probs), size=last - first, p=venue_probs / venue_probs.sum()),
+    }
+
+# Number of relationships of every kind drawn by a shard
+def shard_picks(profile, papers, shard, shards, seed):
+    degrees = shard_degrees(profile, papers, shard, shards, seed)
+    picks = {'authors': int(degrees['authors'].sum()), 'references': int(degrees['references'].sum())}
+    for i, venue_type in enumerate(profile['venue_type']):
+        picks[venue_type] = int((degrees['venue'] == i).sum())
+    return picks
+
+def write_part(parts_dir, file, shard, frame):
+    frame[dp.OUTPUT_COLUMNS[file]].to_csv(os.path.join(parts_dir, f'{file}.{shard:06d}'), index=False, header=False)
+    return len(frame)
+
+# Unique (source, target) pairs, in the order they were drawn
+def unique_pairs(sources, targets):
+    pairs = pd.DataFrame({'source': sources, 'target': targets}).drop_duplicates()
+    return pairs['source'].to_numpy(), pairs['target'].to_numpy()
+
+# Generates the papers of `shard` with all their relationships, and the slice of authors and venues it owns.
+# `offsets` are the global positions of the first picks of the shard, `samplers` the target samplers by kind.
+def generate_shard(profile, papers, samplers, offsets, shard, shards, seed, parts_dir):
+    degrees = shard_degrees(profile, papers, shard, shards, seed)
+    rng = np.random.default_rng([seed, shard, 1])
+    rows = {}
+    first, last = shard_range(papers, shard, shards)
+    index = np.arange(first, last)
+    n = len(index)
+    ids = paper_id(index)
+
+    # Papers
+    titles = pd.Series([f'Synthetic paper {i}: {FILLER[:length]}'.strip()
+                        for i, length in zip(index, draw_lengths(rng, profile['title_length'], n))])
+    abstracts = pd.Series([FILLER[:length] for length in draw_lengths(rng, profile['abstract_length'], n)])
+    abstracts[rng.random(n) < profile['abstract_missing']] = None
+    dois = '10.5555/syn.' + pd.Series(index).astype(str)
+    dois[rng.random(n) < profile['doi_missing']] = None
+    rows['nodes_papers.csv'] = write_part(parts_dir, 'nodes_papers.csv', shard, pd.DataFrame({
+        'PaperID': ids, 'Title': titles, 'Year': draw(rng, profile['year'], n), 'Abstract': abstracts, 'DOI': dois}))
+
+    # Keywords, from the title like data_preprocessing
+    keyword_ids = {keyword: str(i) for i, keyword in enumerate(dp.KEYWORDS)}
+    rows['rel_about.csv'] = write_part(parts_dir, 'rel_about.csv', shard, pd.DataFrame({
+        'PaperID': ids, 'KeywordID': pd.Series(dp.seeded_choice(titles, dp.KEYWORDS, seed, 'keyword')).map(
+            keyword_ids)}))
+
+    # Authors, the first one is the corresponding author. Reviews are drawn from the authorships like
+    # data_preprocessing does.
+    sources = np.repeat(np.arange(n), degrees['authors'])
+    authors = samplers['authors'].nodes(offsets['authors'] + np.arange(len(sources)))
+    sources, authors = unique_pairs(sources, authors)
+    author_of = pd.DataFrame({'AuthorID': author_id(authors), 'PaperID': ids.to_numpy()[sources]})
+    rows['rel_author_of.csv'] = write_part(parts_dir, 'rel_author_of.csv', shard, author_of)
+    rows['rel_corresponding_author.csv'] = write_part(parts_dir, 'rel_corresponding_author.csv', shard,
+                                                      author_of.drop_duplicates('PaperID'))
+    rows['rel_reviews.csv'] = write_part(parts_dir, 'rel_reviews.csv', shard, dp.review_rels(
+        author_of.rename(columns={'AuthorID': 'ReviewerID'}), seed))
+
+    # Citations, without self-citations
+    sources = np.repeat(np.arange(n), degrees['references'])
+    targets = samplers['references'].nodes(offsets['references'] + np.arange(len(sources)))
+    keep = targets != index[sources]
+    sources, targets = unique_pairs(sources[keep], targets[keep])
+    rows['rel_related.csv'] = write_part(parts_dir, 'rel_related.csv', shard, pd.DataFrame({
+        'PaperID': ids.to_numpy()[sources], 'RelatedToPaperID': reference_id(targets, papers)}))
+
+    # Venue editions, at most one per paper. Conference and workshop papers get their edition year like
+    # data_preprocessing, journal papers one of the editions of their journal.
+    for i, venue_type in enumerate(profile['venue_type']):
+        published = np.flatnonzero(degrees['venue'] == i)
+        venues = samplers[venue_type].nodes(offsets[venue_type] + np.arange(len(published)))
+        paper_ids = ids.to_numpy()[published]
+        if venue_type == 'journal':
+            editions = (rng.random(len(venues)) * journal_editions(profile, venues, seed)).astype(np.int64)
+            edition = dp.edition_ids(venues, *journal_edition(profile, venues, editions, seed))
+        else:
+            years = dp.CONFERENCE_YEARS if venue_type == 'conference' else dp.WORKSHOP_YEARS
+            edition = dp.edition_ids(venues, dp.seeded_choice(paper_ids, years, seed, f'{venue_type}_year'))
+        file = f'rel_published_in_{venue_type}.csv'
+        rows[file] = write_part(parts_dir, file, shard, pd.DataFrame({
+            'PaperID': paper_ids, dp.OUTPUT_COLUMNS[file][1]: edition.to_numpy()}))
+
+    # This shard's slice of the author nodes
+    first, last = shard_range(samplers['authors'].n, shard, shards)
+    authors = pd.DataFrame({'AuthorID': author_id(np.arange(first, last)),
+                            'Name': 'Author ' + pd.Series(np.arange(first, last)).astype(str)})
+    rows['nodes_authors.csv'] = write_part(parts_dir, 'nodes_authors.csv', shard, dp.author_nodes(authors, seed))
+
+    # and of the venue editions: every edition year for conferences and workshops, the seeded editions for journals
+    for venue_type, years in (('conference', dp.CONFERENCE_YEARS), ('workshop', dp.WORKSHOP_YEARS)):
+        first, last = shard_range(samplers[venue_type].n, shard, shards)
+        venues = np.repeat(np.arange(first, last), len(years))
+        edition_years = np.tile(years, last - first)
+        file = f'nodes_{venue_type}.csv'
+        rows[file] = write_part(parts_dir, file, shard, pd.DataFrame({
+            dp.OUTPUT_COLUMNS[file][0]: dp.edition_ids(venues, edition_years).to_numpy(),
+            'VenueID': venues.astype(str),
+            'Venue': f'Synthetic {venue_type.title()} ' + pd.Series(venues).astype(str),
+            'Year': edition_years}))
+    first, last = shard_range(samplers['journal'].n, shard, shards)
+    journals = np.arange(first, last)
+    counts = journal_editions(profile, journals, seed)
+    journals = np.repeat(journals, counts)
+    editions = np.arange(len(journals)) - np.repeat(np.cumsum(counts) - counts, counts)
+    years, volumes = journal_edition(profile, journals, editions, seed)
+    editions = pd.DataFrame({'JournalID': dp.edition_ids(journals, years, volumes).to_numpy(),
+                             'VenueID': journals.astype(str),
+                             'Venue': 'Synthetic Journal ' + pd.Series(journals).astype(str),
+                             'Year': years, 'Volume': volumes})
+    rows['nodes_journal.csv'] = write_part(parts_dir, 'nodes_journal.csv', shard,
+                                           editions.drop_duplicates('JournalID'))
+    return rows
+
+def run_task(args):
+    return args[0](*args[1:])
+
+# Runs fn(*args) for every args of `tasks` on up to `workers` processes, yielding the results in order
+def run_tasks(fn, tasks, workers):
+    if workers <= 1 or len(tasks) == 1:
+        yield from (fn(*args) for args in tasks)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        yield from executor.map(run_task, [(fn,) + args for args in tasks])
+
+# Concatenates the parts of every file in shard order, after the header
+def merge_parts(parts_dir, out_dir, shards):
+    for file, columns in dp.OUTPUT_COLUMNS.items():
+        with open(os.path.join(out_dir, file), 'w', newline='') as out:
+            pd.DataFrame(columns=columns).to_csv(out, index=False)
+            for shard in range(shards):
+                part = os.path.join(parts_dir, f'{file}.{shard:06d}')
+                if not os.path.exists(part):
+                    continue
+                with open(part, newline='') as f:
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+                os.remove(part)
+    os.rmdir(parts_dir)
+
+def main(edges=EDGES, out_dir=OUT_DIR, data_dir=DATA_DIR, profile_path=None, seed=SEED, workers=None,
+         shard_papers=SHARD_PAPERS):
+    start = time.time()
+    if profile_path:
+        with open(profile_path) as f:
+            profile = json.load(f)
+    else:
+        print(f"Fitting the distributions of {data_dir}...")
+        profile = fit_profile(data_dir)
+    papers = papers_for(profile, edges)
+    shards = max(1, math.ceil(papers / shard_papers))
+    workers = workers or os.cpu_count() or 1
+
+    # Planning: the picks of every shard give the global position of the first pick of each shard
+    picks = list(run_tasks(shard_picks, [(profile, papers, shard, shards, seed) for shard in range(shards)], workers))
+    offsets = [dict.fromkeys(picks[0], 0)]
+    for shard_picked in picks[:-1]:
+        offsets.append({kind: offsets[-1][kind] + count for kind, count in shard_picked.items()})
+    dists = dict({'authors': profile['papers_per_author'], 'references': profile['citations_per_reference']},
+                 **profile['papers_per_venue'])
+    samplers = {kind: StubSampler(dist, sum(shard_picked[kind] for shard_picked in picks), [seed, i])
+                for i, (kind, dist) in enumerate(dists.items())}
+    print(f"Generating about {edges} relationships: {papers} papers, " +
+          ', '.join(f'{sampler.n} {kind}' for kind, sampler in samplers.items()) +
+          f", in {shards} shards on {min(workers, shards)} processes...")
+
+    os.makedirs(out_dir, exist_ok=True)
+    parts_dir = os.path.join(out_dir, '.parts')
+    os.makedirs(parts_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'profile.json'), 'w') as f:
+        json.dump(profile, f, indent=2)
+
+    totals = dict.fromkeys(dp.OUTPUT_COLUMNS, 0)
+    tasks = [(profile, papers, samplers, offsets[shard], shard, shards, seed, parts_dir) for shard in range(shards)]
+    for shard, rows in enumerate(run_tasks(generate_shard, tasks, workers), 1):
+        for file, count in rows.items():
+            totals[file] += count
+        if shard % 20 == 0 or shard == shards:
+            print(f"  {shard}/{shards} shards, {sum(totals.values())} rows")
+
+    # nodes_keywords.csv is the fixed list of data_preprocessing
+    totals['nodes_keywords.csv'] = write_part(parts_dir, 'nodes_keywords.csv', 0, pd.DataFrame({
+        'KeywordID': [str(i) for i in range(len(dp.KEYWORDS))], 'Keyword': dp.KEYWORDS}))
+    merge_parts(parts_dir, out_dir, shards)
+
+    for file, count in totals.items():
+        print(f"  {file}: {count} rows")
+    relationships = sum(count for file, count in totals.items() if file.startswith('rel_'))
+    print(f"{relationships} relationships written to {out_dir} in {time.time() - start:.1f}s.")
+    return totals
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic graph fitted on the preprocessed files, '
+                                                 'without the API')
+    parser.add_argument('--edges', type=float, default=EDGES,
+                        help='Approximate number of relationship rows to generate (e.g. 1e4 to 1e8)')
+    parser.add_argument('--out-dir', default=OUT_DIR, help='Directory of the generated nodes_*/rel_* files')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Preprocessed files the distributions are fitted on')
+    parser.add_argument('--profile', help='Profile of a previous run (profile.json) to use instead of fitting')
+    parser.add_argument('--seed', type=int, default=SEED, help='Seed of the generated graph')
+    parser.add_argument('--workers', type=int, help='Processes generating shards (default: number of CPUs)')
+    parser.add_argument('--shard-papers', type=int, default=SHARD_PAPERS,
+                        help='Papers per shard, bounds the memory of each process. Part of the seed: '
+                             'changing it changes the generated graph')
+    args = parser.parse_args()
+    main(int(args.edges), args.out_dir, args.data_dir, args.profile, args.seed, args.workers, args.shard_papers)
@@ -0,0 +1,124 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import analytics_engine as ae
+
+DATA_DIR = os.path.join(ROOT, 'data')
+
+# Reference implementation of the four queries in plain pandas (merges and group-bys), with the semantics of the
+# Cypher queries: relationships to missing nodes are ignored, and citations only count between loaded papers.
+
+
+def read(file):
+    return pd.read_csv(os.path.join(DATA_DIR, file), dtype=str, keep_default_na=False, na_values=[''])
+
+
+def papers():
+    nodes = read('nodes_papers.csv').drop_duplicates('PaperID')
+    nodes['Year'] = pd.to_numeric(nodes['Year'])
+    related = citations(nodes)
+    nodes['citations'] = nodes['PaperID'].map(related['RelatedToPaperID'].value_counts()).fillna(0).astype(int)
+    return nodes
+
+
+def citations(nodes):
+    related = read('rel_related.csv')
+    return related[related['PaperID'].isin(nodes['PaperID']) & related['RelatedToPaperID'].isin(nodes['PaperID'])]
+
+
+def authors():
+    return read('nodes_authors.csv').dropna(subset=['AuthorID']).drop_duplicates('AuthorID')
+
+
+def author_of(nodes, authors_):
+    rels = read('rel_author_of.csv')
+    return rels[rels['AuthorID'].isin(authors_['AuthorID']) & rels['PaperID'].isin(nodes['PaperID'])]
+
+
+# Papers published in an edition of `kind`, with the edition's VenueID, Venue and Year
+def published_in(kind, key, nodes):
+    editions = read(f'nodes_{kind}.csv').drop_duplicates(key)
+    editions['Year'] = pd.to_numeric(editions['Year'])
+    rels = read(f'rel_published_in_{kind}.csv')
+    rels = rels[rels['PaperID'].isin(nodes['PaperID']) & rels[key].isin(editions[key])]
+    return rels.merge(editions, on=key)
+
+
+def reference_top3(nodes):
+    cited = published_in('conference', 'ConferenceID', nodes).merge(nodes[['PaperID', 'Title', 'citations']],
+                                                                   on='PaperID')
+    cited = cited[cited['citations'] > 0].sort_values(['Venue', 'citations', 'PaperID'],
+                                                      ascending=[True, False, True])
+    rows = []
+    for (_, venue), group in cited.groupby(['VenueID', 'Venue'], sort=False):
+        titles = list(group['Title'][:3]) + [None] * 3
+        rows.append({'venueName': venue, 'topCitedPaper1': titles[0], 'topCitedPaper2': titles[1],
+                     'topCitedPaper3': titles[2]})
+    return rows
+
+
+def reference_4editions(nodes):
+    authors_ = authors()
+    venues = pd.concat([published_in('conference', 'ConferenceID', nodes),
+                        published_in('workshop', 'WorkshopID', nodes)])
+    rows = venues.merge(author_of(nodes, authors_), on='PaperID').merge(authors_[['AuthorID', 'Name']], on='AuthorID')
+    rows = rows.groupby(['Name', 'Venue'])['Year'].nunique().reset_index(name='editions')
+    rows = rows[rows['editions'] >= 4].sort_values(['editions', 'Name', 'Venue'], ascending=[False, True, True])
+    return rows.rename(columns={'Name': 'author', 'Venue': 'venueName'}).to_dict('records')
+
+
+def reference_impact_factor(nodes, limit=10):
+    journals = published_in('journal', 'JournalID', nodes)
+    cites = citations(nodes).merge(journals, left_on='RelatedToPaperID', right_on='PaperID', suffixes=('', '_cited'))
+    cites = cites.merge(nodes[['PaperID', 'Year']].rename(columns={'Year': 'citingYear'}), on='PaperID')
+    cites = cites[(cites['citingYear'] == cites['Year'] + 1) | (cites['citingYear'] == cites['Year'] + 2)]
+    rows = []
+    for row in cites.groupby(['VenueID', 'Venue', 'citingYear']).size().reset_index(name='count').itertuples():
+        published = ((journals['VenueID'] == row.VenueID) &
+                     journals['Year'].isin([row.citingYear - 1, row.citingYear - 2])).sum()
+        if published > 0:
+            rows.append({'journal': row.Venue, 'year': int(row.citingYear),
+                         'impactFactor': float(np.floor(row.count / published * 1000 + 0.5) / 1000)})
+    rows = pd.DataFrame(rows).sort_values(['impactFactor', 'journal', 'year'], ascending=[False, True, True])
+    return rows.head(limit).to_dict('records')
+
+
+def h_index(counts):
+    counts = sorted(counts, reverse=True)
+    return sum(1 for i, count in enumerate(counts) if count >= i + 1)
+
+
+def reference_h_index(nodes, limit=10):
+    authors_ = authors()
+    rows = author_of(nodes, authors_).merge(nodes[['PaperID', 'citations']], on='PaperID')
+    rows = rows.groupby('AuthorID')['citations'].apply(h_index).reset_index(name='hIndex').merge(authors_,
+                                                                                                 on='AuthorID')
+    rows = rows[rows['hIndex'] > 0].sort_values(['hIndex', 'Name'], ascending=[False, True]).head(limit)
+    return [{'author': row.Name, 'hIndex': int(row.hIndex)} for row in rows.itertuples()]
+
+
+@pytest.fixture(scope='module')
+def graph():
+    return ae.Graph(DATA_DIR)
+
+
+@pytest.fixture(scope='module')
+def nodes():
+    return papers()
+
+
+@pytest.mark.parametrize('query, reference', [
+    (ae.top3_cited_papers_conference, reference_top3),
+    (ae.authors_published_same_venue_4editions, reference_4editions),
+    (ae.impact_factor, reference_impact_factor),
+    (ae.h_index, reference_h_index),
+])
+def test_engine_matches_the_pandas_reference(graph, nodes, query, reference):
+    expected = reference(nodes)
+    assert expected
+    assert ae.compare(query.__name__, query(graph), expected) == []
@@ -0,0 +1,56 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bulk_import_neo4j as bi
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+# Per relationship file, with pandas: rows missing their start node, their end node, and rows with both
+def reference_counts():
+    keys = {label: set(bi.read_csv(os.path.join(DATA_DIR, file))[key].dropna())
+            for label, (file, key, _) in bi.NODES.items()}
+    counts = {}
+    for _, file, (start, start_label), (end, end_label), _ in bi.RELATIONSHIPS:
+        rels = bi.read_csv(os.path.join(DATA_DIR, file))
+        counts[file] = (int((~rels[start].isin(keys[start_label])).sum()),
+                        int((~rels[end].isin(keys[end_label])).sum()),
+                        int((rels[start].isin(keys[start_label]) & rels[end].isin(keys[end_label])).sum()))
+    return counts
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    bulk_dir = tmp_path_factory.mktemp('bulk')
+    id_maps = bi.export_nodes(DATA_DIR, bulk_dir)
+    bi.export_relationships(DATA_DIR, bulk_dir, id_maps)
+    return bulk_dir, id_maps
+
+
+def test_only_relationships_with_both_endpoints_are_exported(exported):
+    bulk_dir, _ = exported
+    for file, (_, _, complete) in reference_counts().items():
+        assert len(pd.read_csv(os.path.join(bulk_dir, file), dtype=str)) == complete, file
+
+
+def test_strict_reports_the_dangling_counts(exported, tmp_path):
+    _, id_maps = exported
+    expected = reference_counts()
+    assert expected['rel_related.csv'][1] > 0
+    with pytest.raises(ValueError) as error:
+        bi.export_relationships(DATA_DIR, tmp_path, id_maps, strict=True)
+    for _, file, (start, start_label), (end, end_label), _ in bi.RELATIONSHIPS:
+        missing_start, missing_end, _ = expected[file]
+        problem = (f"{file}: {missing_start} rows without their {start_label} ({start}), "
+                   f"{missing_end} without their {end_label} ({end})")
+        assert (problem in str(error.value)) == bool(missing_start or missing_end), file
+
+
+def test_node_files_have_one_row_per_import_id(exported):
+    bulk_dir, _ = exported
+    for label, (file, _, _) in bi.NODES.items():
+        ids = pd.read_csv(os.path.join(bulk_dir, file), dtype=str)[f':ID({label})']
+        assert ids.notna().all() and ids.is_unique, file
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_generation as dg
+
+# Stub of the Semantic Scholar API: N_PAPERS papers citing each other, the bulk search returns the papers of the
+# requested year and the first batch request is throttled once (429 without Retry-After, so the backoff jitter runs)
+N_PAPERS = 60
+
+
+def paper_id(i):
+    return hashlib.sha1(str(i).encode()).hexdigest()
+
+
+def paper(i):
+    kind = 'journal' if i % 3 == 0 else 'conference'
+    return {'paperId': paper_id(i), 'title': f'Title {i}', 'year': 2020 + i % 6,
+            'authors': [{'authorId': str(1000 + (i * 7 + j) % 40), 'name': f'Author {(i * 7 + j) % 40}'}
+                        for j in range(1 + i % 3)],
+            'externalIds': {'DOI': f'10.1/{i}'}, 'venue': f'Venue {i % 5}',
+            'publicationVenue': {'id': f'venue-{i % 5}', 'type': kind},
+            'citations': [{'paperId': paper_id((i * 11 + j) % N_PAPERS), 'title': 'cited'} for j in range(12)],
+            'fieldsOfStudy': ['Computer Science'], 'publicationTypes': ['Conference'],
+            'journal': {'volume': str(i % 4)} if kind == 'journal' else {}, 'abstract': f'Abstract {i}'}
+
+
+PAPERS = {paper_id(i): paper(i) for i in range(N_PAPERS)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    throttled = False
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        year = parse_qs(urlparse(self.path).query).get('year', ['2019-'])[0]
+        self.send(200, {'data': [{'paperId': paper_id(i)} for i in range(N_PAPERS)
+                                 if year.endswith('-') or str(2020 + i % 6) == year]})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if not StubHandler.throttled:
+            StubHandler.throttled = True
+            return self.send(429, {})
+        self.send(200, [PAPERS.get(i) for i in body['ids']])
+
+
+@pytest.fixture
+def stub_url():
+    StubHandler.throttled = False
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dg, 'BACKOFF_BASE', 0.01)
+    os.makedirs('data')
+    return tmp_path
+
+
+def harvest(fixture_mode, fixture_dir, api_url, seed=7):
+    dg.main(workers=4, rate=1000, api_url=api_url, batch_size=5, fixture_mode=fixture_mode,
+            fixture_dir=str(fixture_dir), seed=seed, cache_path=None)
+    with open(dg.OUTPUT_JSONL_PATH, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_replay_gives_the_recorded_output(stub_url, workdir):
+    recorded = harvest('record', workdir / 'fixtures', stub_url)
+    assert StubHandler.throttled
+    assert len(recorded.splitlines()) > 10
+    # Nothing listens on the discard port: every response has to come from the fixtures
+    replayed = harvest('replay', workdir / 'fixtures', 'http://127.0.0.1:9')
+    assert replayed == recorded
+
+
+def test_replay_fails_on_a_missing_fixture(stub_url, workdir):
+    fixture_dir = workdir / 'fixtures'
+    harvest('record', fixture_dir, stub_url)
+    batches = [path for path in fixture_dir.iterdir() if isinstance(json.loads(path.read_text()), list)]
+    batches[0].unlink()
+    with pytest.raises(dg.MissingFixture):
+        harvest('replay', fixture_dir, 'http://127.0.0.1:9')
+
+
+# A harvest that crashes after its last sync: the papers written since are in the output file but not in the
+# checkpoint, so resuming truncates them away and downloads them again
+@pytest.mark.parametrize('output_format', ['jsonl', 'csv'])
+def test_resume_truncates_the_output_to_the_checkpoint(workdir, output_format):
+    checkpoint_path = str(workdir / 'data' / 'checkpoint.json')
+    checkpoint = dg.HarvestCheckpoint(output_format, checkpoint_path)
+    for i in range(3):
+        checkpoint.write_paper(paper(i))
+    checkpoint.mark_done('search')
+    with open(checkpoint.output_path, encoding='utf-8') as f:
+        synced = f.read()
+    for i in range(3, 6):
+        checkpoint.write_paper(paper(i))
+    checkpoint.output.close()
+    with open(checkpoint.output_path, encoding='utf-8') as f:
+        assert len(f.read()) > len(synced)
+
+    resumed = dg.HarvestCheckpoint(output_format, checkpoint_path, resume=True)
+    assert resumed.is_done('search')
+    assert [resumed.is_written(paper_id(i)) for i in range(6)] == [True] * 3 + [False] * 3
+    with open(resumed.output_path, encoding='utf-8') as f:
+        assert f.read() == synced
+    for i in range(3, 6):
+        resumed.write_paper(paper(i))
+    resumed.close()
+    with open(resumed.output_path, encoding='utf-8') as f:
+        resumed_output = f.read()
+
+    # Same output as a harvest that never crashed
+    fresh = dg.HarvestCheckpoint(output_format, str(workdir / 'data' / 'fresh.json'))
+    for i in range(6):
+        fresh.write_paper(paper(i))
+    fresh.close()
+    with open(fresh.output_path, encoding='utf-8') as f:
+        assert f.read() == resumed_output
+
+
+def test_resume_refuses_a_checkpoint_of_another_format(workdir):
+    checkpoint_path = str(workdir / 'data' / 'checkpoint.json')
+    checkpoint = dg.HarvestCheckpoint('csv', checkpoint_path)
+    checkpoint.write_paper(paper(0))
+    checkpoint.close()
+    open(dg.OUTPUT_JSONL_PATH, 'w').close()
+    with pytest.raises(ValueError, match='csv output'):
+        dg.HarvestCheckpoint('jsonl', checkpoint_path, resume=True)
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import sys
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import data_preprocessing as dp
+
+DATA_DIR = os.path.join(ROOT, 'data')
+# The last papers are harvested twice, like papers found by two searches
+REPEATED = 40
+
+
+def read(file):
+    return pd.read_csv(os.path.join(DATA_DIR, file), dtype=str, keep_default_na=False)
+
+
+# Raw harvest (papers.jsonl records) of the shipped graph: every paper with its venue edition, its authors (the
+# corresponding author first) and its references
+def raw_records():
+    papers = read('nodes_papers.csv').drop_duplicates('PaperID')
+    venues = {}
+    for kind, key in [('conference', 'ConferenceID'), ('workshop', 'WorkshopID'), ('journal', 'JournalID')]:
+        editions = read(f'nodes_{kind}.csv').drop_duplicates(key).set_index(key)
+        for paper_id, edition in read(f'rel_published_in_{kind}.csv').itertuples(index=False):
+            if edition in editions.index:
+                venues[paper_id] = (kind, editions.loc[edition])
+    names = read('nodes_authors.csv').drop_duplicates('AuthorID').set_index('AuthorID')['Name']
+    main_authors = dict(read('rel_corresponding_author.csv')[['PaperID', 'AuthorID']].itertuples(index=False))
+    authors = read('rel_author_of.csv').groupby('PaperID')['AuthorID'].apply(list)
+    references = read('rel_related.csv').groupby('PaperID')['RelatedToPaperID'].apply(list)
+    records = []
+    for paper in papers.itertuples(index=False):
+        kind, edition = venues.get(paper.PaperID, ('conference', {'VenueID': '', 'Venue': '', 'Volume': ''}))
+        paper_authors = sorted(authors.get(paper.PaperID, []), key=lambda a: a != main_authors.get(paper.PaperID))
+        records.append({
+            'PaperId': paper.PaperID, 'Title': paper.Title, 'Year': int(paper.Year) if paper.Year else None,
+            'DOI': paper.DOI, 'Venue': edition['Venue'], 'VenueID': edition['VenueID'],
+            'Type': 'journal' if kind == 'journal' else 'conference', 'FieldOfStudy': 'Computer Science',
+            'Volume': edition.get('Volume') or '<no_volume_data>', 'Abstract': paper.Abstract,
+            'Authors': [{'AuthorId': a, 'Author': names.get(a, '')} for a in paper_authors],
+            'References': [{'ReferenceId': r, 'Reference Name': ''} for r in references.get(paper.PaperID, [])]})
+    return records + records[-REPEATED:]
+
+
+@pytest.fixture(scope='module')
+def raw_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('raw')
+    with open(path / 'papers.jsonl', 'w', encoding='utf-8') as f:
+        for record in raw_records():
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return path
+
+
+def preprocess(raw_dir, out_dir, **options):
+    os.makedirs(out_dir)
+    shutil.copy(raw_dir / 'papers.jsonl', out_dir)
+    dp.main(str(out_dir), **options)
+    outputs = {}
+    for name in dp.OUTPUT_COLUMNS:
+        with open(out_dir / name, 'rb') as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+@pytest.fixture(scope='module')
+def in_memory(raw_dir, tmp_path_factory):
+    return preprocess(raw_dir, tmp_path_factory.mktemp('out') / 'in_memory', workers=1)
+
+
+def test_shipped_harvest_is_preprocessed(in_memory):
+    assert all(output.count(b'\n') > 1 for output in in_memory.values())
+
+
+@pytest.mark.parametrize('chunk_size', [53, 997])
+def test_streaming_output_is_byte_identical(raw_dir, tmp_path, in_memory, chunk_size):
+    streamed = preprocess(raw_dir, tmp_path / 'streaming', streaming=True, chunk_size=chunk_size)
+    assert [name for name in dp.OUTPUT_COLUMNS if streamed[name] != in_memory[name]] == []
+
+
+def test_output_does_not_depend_on_the_workers(raw_dir, tmp_path, in_memory):
+    parallel = preprocess(raw_dir, tmp_path / 'parallel', workers=4)
+    assert [name for name in dp.OUTPUT_COLUMNS if parallel[name] != in_memory[name]] == []
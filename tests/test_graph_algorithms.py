@@ -0,0 +1,106 @@
+import collections
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import analytics_engine as ae
+import graph_algorithms as ga
+
+DATA_DIR = os.path.join(ROOT, 'data')
+
+# Pure-Python references of the GDS definitions: Brandes' algorithm on adjacency lists, and the power iteration of
+# PageRank one edge at a time
+
+
+def adjacency(sources, targets, n, undirected):
+    neighbours = [[] for _ in range(n)]
+    for source, target in zip(sources, targets):
+        neighbours[source].append(target)
+        if undirected:
+            neighbours[target].append(source)
+    return neighbours
+
+
+def brandes(neighbours, undirected):
+    n = len(neighbours)
+    scores = [0.0] * n
+    for source in range(n):
+        order, parents = [], [[] for _ in range(n)]
+        paths, distance = [0] * n, [-1] * n
+        paths[source], distance[source] = 1, 0
+        queue = collections.deque([source])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for neighbour in neighbours[node]:
+                if distance[neighbour] < 0:
+                    distance[neighbour] = distance[node] + 1
+                    queue.append(neighbour)
+                if distance[neighbour] == distance[node] + 1:
+                    paths[neighbour] += paths[node]
+                    parents[neighbour].append(node)
+        dependency = [0.0] * n
+        for node in reversed(order):
+            for parent in parents[node]:
+                dependency[parent] += paths[parent] / paths[node] * (1 + dependency[node])
+            if node != source:
+                scores[node] += dependency[node]
+    return [score / (2 if undirected else 1) for score in scores]
+
+
+def pagerank(sources, targets, n, damping=0.85, iterations=20, tolerance=1e-7):
+    out_degrees = [0] * n
+    for source in sources:
+        out_degrees[source] += 1
+    scores = [1 - damping] * n
+    for _ in range(iterations):
+        updated = [1 - damping] * n
+        for source, target in zip(sources, targets):
+            updated[target] += damping * scores[source] / out_degrees[source]
+        delta = max((abs(new - old) for new, old in zip(updated, scores)), default=0)
+        scores = updated
+        if delta < tolerance:
+            break
+    return scores
+
+
+def random_graph(seed, n=60, m=150):
+    rng = np.random.default_rng(seed)
+    sources, targets = rng.integers(n, size=m), rng.integers(n, size=m)
+    keep = sources != targets
+    return sources[keep].tolist(), targets[keep].tolist(), n
+
+
+def shipped_graph():
+    graph = ga.PaperGraph(DATA_DIR)
+    return graph.cites.rows().tolist(), graph.cites.indices.tolist(), graph.cites.n
+
+
+GRAPHS = {
+    'empty': lambda: ([], [], 0),
+    'isolated nodes': lambda: ([], [], 5),
+    'random 1': lambda: random_graph(1),
+    'random 2': lambda: random_graph(2, n=30, m=90),
+    'shipped': shipped_graph,
+}
+
+
+@pytest.mark.parametrize('graph', GRAPHS.values(), ids=GRAPHS.keys())
+@pytest.mark.parametrize('undirected', [True, False], ids=['undirected', 'directed'])
+def test_betweenness_matches_brandes(graph, undirected):
+    sources, targets, n = graph()
+    csr = ae.CSR(sources, targets, n)
+    if undirected:
+        csr = ga.undirected(csr)
+    expected = brandes(adjacency(sources, targets, n, undirected), undirected)
+    np.testing.assert_allclose(ga.betweenness(csr, undirected_graph=undirected), expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('graph', GRAPHS.values(), ids=GRAPHS.keys())
+def test_pagerank_matches_the_power_iteration(graph):
+    sources, targets, n = graph()
+    scores, _ = ga.pagerank(ae.CSR(sources, targets, n))
+    np.testing.assert_allclose(scores, pagerank(sources, targets, n), rtol=1e-9, atol=1e-12)